@@ -0,0 +1,186 @@
+"""
+编译解码基准 - Compiled Decode Benchmark
+比较普通生成（动态KV缓存）与编译解码（静态KV缓存 + torch.compile）的单token解码延迟
+
+单token延迟 = (生成 N 个token的耗时 - 生成1个token的耗时) / (N - 1)，
+扣除预填充与首个token，只反映解码步本身；两种方式均为贪心解码、强制生成满 N 个token。
+默认使用随机初始化的微型语言模型，无需GPU与模型权重即可在CPU上运行；
+--model 指定本地模型目录时以纯文本提示测试真实模型。
+
+用法：
+    python benchmarks/compiled_decode.py
+    python benchmarks/compiled_decode.py --tokens 64 --repeats 5 --json
+    python benchmarks/compiled_decode.py --model /path/to/Qwen3-VL-2B-Instruct --device cuda
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.config import COMPILE_LENGTH_BUCKETS, MODEL_DTYPE, TRUST_REMOTE_CODE
+from src.models.compiled_decode import CompiledDecoder
+
+# 微型模型的结构（层数与宽度足以体现每步的调度开销）
+TINY_MODEL_CONFIG = {
+    "vocab_size": 4096,
+    "hidden_size": 256,
+    "intermediate_size": 688,
+    "num_hidden_layers": 8,
+    "num_attention_heads": 8,
+    "num_key_value_heads": 4,
+    "max_position_embeddings": 8192,
+}
+
+# 测试提示（真实模型按对话模板渲染）
+PROMPT = "请以“秋山晚照”为题，写一首七言绝句。"
+
+
+def tiny_model(device: str) -> Tuple[Any, Dict[str, torch.Tensor]]:
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    torch.manual_seed(0)
+    model = LlamaForCausalLM(LlamaConfig(**TINY_MODEL_CONFIG)).to(device).eval()
+    input_ids = torch.randint(0, TINY_MODEL_CONFIG["vocab_size"], (1, 48), device=device)
+    return model, {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+
+
+def local_model(path: str, device: str) -> Tuple[Any, Dict[str, torch.Tensor]]:
+    from transformers import AutoModelForImageTextToText, AutoProcessor
+
+    processor = AutoProcessor.from_pretrained(path, trust_remote_code=TRUST_REMOTE_CODE)
+    model = AutoModelForImageTextToText.from_pretrained(
+        path,
+        torch_dtype=getattr(torch, MODEL_DTYPE),
+        device_map=device,
+        trust_remote_code=TRUST_REMOTE_CODE,
+    ).eval()
+    inputs = processor.apply_chat_template(
+        [{"role": "user", "content": [{"type": "text", "text": PROMPT}]}],
+        tokenize=True,
+        add_generation_prompt=True,
+        return_dict=True,
+        return_tensors="pt",
+    )
+    return model, dict(inputs.to(model.device))
+
+
+def timed_generate(model: Any, inputs: Dict[str, torch.Tensor], tokens: int, cache_kwargs: Dict[str, Any]) -> float:
+    if model.device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    with torch.inference_mode():
+        model.generate(
+            **inputs,
+            max_new_tokens=tokens,
+            min_new_tokens=tokens,
+            do_sample=False,
+            pad_token_id=0,
+            **cache_kwargs,
+        )
+    if model.device.type == "cuda":
+        torch.cuda.synchronize()
+    return time.perf_counter() - start
+
+
+def per_token_ms(
+    model: Any,
+    inputs: Dict[str, torch.Tensor],
+    tokens: int,
+    repeats: int,
+    compiled: Optional[CompiledDecoder],
+) -> Dict[str, float]:
+    prompt_length = int(inputs["input_ids"].shape[1])
+
+    def cache_kwargs(count: int) -> Dict[str, Any]:
+        return compiled.cache_kwargs(1, prompt_length, count) if compiled else {}
+
+    # 预热（编译版本在 warmup 中已完成编译，这里只排除首次调用的分配开销）
+    timed_generate(model, inputs, tokens, cache_kwargs(tokens))
+    samples: List[float] = []
+    for _ in range(repeats):
+        full = timed_generate(model, inputs, tokens, cache_kwargs(tokens))
+        first = timed_generate(model, inputs, 1, cache_kwargs(tokens))
+        samples.append((full - first) / (tokens - 1) * 1000)
+    return {"median_ms": round(statistics.median(samples), 3), "min_ms": round(min(samples), 3)}
+
+
+def run(model_path: Optional[str], device: str, tokens: int, repeats: int) -> Dict[str, Any]:
+    model, inputs = local_model(model_path, device) if model_path else tiny_model(device)
+    prompt_length = int(inputs["input_ids"].shape[1])
+    # 只保留本次用到的档位，预热一次即可
+    buckets = [bucket for bucket in COMPILE_LENGTH_BUCKETS if bucket >= prompt_length + tokens][:1]
+    if not buckets:
+        raise SystemExit(f"提示长度 {prompt_length} + {tokens} 超出最大缓存档位 {max(COMPILE_LENGTH_BUCKETS)}")
+
+    print(f"普通生成：测量 {tokens} 个token × {repeats} 次…", file=sys.stderr)
+    eager = per_token_ms(model, inputs, tokens, repeats, None)
+
+    compiled = CompiledDecoder(model, buckets=buckets)
+    print(f"编译解码（{compiled.mode}）：预热…", file=sys.stderr)
+    start = time.perf_counter()
+    compiled.warmup(lambda batch_size: inputs, batch_sizes=[1])
+    warmup_seconds = time.perf_counter() - start
+    print(f"编译解码：测量 {tokens} 个token × {repeats} 次…", file=sys.stderr)
+    result = per_token_ms(model, inputs, tokens, repeats, compiled)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "device": str(model.device),
+            "processor": platform.processor() or platform.machine(),
+        },
+        "model": model_path or "tiny-llama（随机初始化）",
+        "prompt_tokens": prompt_length,
+        "tokens": tokens,
+        "cache_length": buckets[0],
+        "mode": compiled.mode,
+        "warmup_seconds": round(warmup_seconds, 2),
+        "eager": eager,
+        "compiled": result,
+        "speedup": round(eager["median_ms"] / result["median_ms"], 2) if result["median_ms"] else None,
+    }
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print("=" * 64)
+    print(f"模型: {results['model']}  设备: {results['environment']['device']}  torch {results['environment']['torch']}")
+    print(f"提示 {results['prompt_tokens']} token，生成 {results['tokens']} token，静态缓存 {results['cache_length']}")
+    print(f"{'方式':<24}{'中位数(ms/token)':>20}{'最小值(ms/token)':>20}")
+    print(f"{'普通生成（动态缓存）':<24}{results['eager']['median_ms']:>20.3f}{results['eager']['min_ms']:>20.3f}")
+    print(f"{'编译解码（静态缓存）':<24}{results['compiled']['median_ms']:>20.3f}{results['compiled']['min_ms']:>20.3f}")
+    print("-" * 64)
+    print(f"加速比 {results['speedup']}x，编译预热耗时 {results['warmup_seconds']}s（{results['mode']}）")
+    print("=" * 64)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="编译解码单token延迟基准")
+    parser.add_argument("--model", help="本地模型目录（默认使用随机初始化的微型模型）")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu", help="运行设备")
+    parser.add_argument("--tokens", type=int, default=64, help="每次生成的token数")
+    parser.add_argument("--repeats", type=int, default=5, help="重复测量次数")
+    parser.add_argument("--json", action="store_true", help="以JSON输出")
+    args = parser.parse_args(argv)
+    if args.tokens < 2:
+        parser.error("--tokens 至少为2")
+
+    results = run(args.model, args.device, args.tokens, args.repeats)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
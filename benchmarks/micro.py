@@ -0,0 +1,274 @@
+"""
+微基准 - Micro Benchmarks
+热路径函数的微基准，保存为基线并与之比较，超过阈值的变慢视为性能回退
+
+覆盖：
+- preprocess_image / analyze_image_profile / encode_image_to_data_uri：
+  图片边长 256~8000px，RGB / RGBA / L 三种像素模式
+  （后两者先经 preprocess_image 转换，与上传流程一致）
+- build_messages / render_recent_creations：对话历史 0~50 轮
+
+每个用例先预热一次，再重复执行至累计 --min-time 秒（至少3次），取中位数。
+
+用法：
+    python benchmarks/micro.py run                         # 运行并输出结果
+    python benchmarks/micro.py run --save-baseline         # 运行并保存为基线
+    python benchmarks/micro.py run --compare               # 运行并与基线比较（有回退时退出码为1）
+    python benchmarks/micro.py compare results.json --threshold 0.2
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import PIL
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.config import DEFAULT_FORMAT, DEFAULT_STYLE, MAX_RECENT_ENTRIES, RECENT_THUMBNAIL_SIZE
+from src.ui.components import render_recent_creations
+from src.utils.image_processor import analyze_image_profile, encode_image_to_data_uri, preprocess_image
+from src.utils.prompt_builder import build_messages
+
+# 默认基线文件（与机器相关，不纳入版本库）
+BASELINE_PATH = Path(__file__).parent / "baselines" / "micro.json"
+
+# 图片长边（短边按 4:3 计算）与像素模式
+IMAGE_SIDES = [256, 1024, 2048, 4000, 8000]
+QUICK_IMAGE_SIDES = [256, 1024, 2048]
+IMAGE_MODES = ["RGB", "RGBA", "L"]
+
+# 对话历史轮数
+HISTORY_TURNS = [0, 1, 10, 50]
+
+# 中位数相对基线增加超过该比例视为回退
+DEFAULT_THRESHOLD = 0.15
+
+# 绝对差低于该值（毫秒）时忽略，避免亚毫秒用例的计时抖动误报
+NOISE_FLOOR_MS = 0.05
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def synthetic_image(side: int, mode: str) -> Image.Image:
+    """渐变叠加轻微噪声的测试图（纯色图的编码与统计耗时不具代表性）"""
+    height = side * 3 // 4
+    rng = np.random.default_rng(side)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 255, side, dtype=np.float32)[None, :]
+    pixels = rng.integers(0, 12, size=(height, side, 3), dtype=np.uint8)
+    pixels[..., 0] += (0.6 * x + 0.3 * y).astype(np.uint8)
+    pixels[..., 1] += (0.3 * x + 0.5 * y).astype(np.uint8)
+    pixels[..., 2] += (240 - 0.45 * (x + y)).astype(np.uint8)
+    image = Image.fromarray(pixels, "RGB")
+    return image if mode == "RGB" else image.convert(mode)
+
+
+def sample_history(turns: int) -> List[Tuple[str, str]]:
+    poem = "山色空蒙雨亦奇，\n水光潋滟晴方好。\n欲把西湖比西子，\n淡妆浓抹总相宜。"
+    return [(f"第{i + 1}轮：请突出画面中的秋意与远山。", poem) for i in range(turns)]
+
+
+def image_cases(sides: List[int]) -> Iterator[Case]:
+    for side in sides:
+        for mode in IMAGE_MODES:
+            source = synthetic_image(side, mode)
+            rgb = preprocess_image(source)
+            prefix = f"{mode}/{side}px"
+            yield f"preprocess_image/{prefix}", lambda source=source: preprocess_image(source)
+            yield f"analyze_image_profile/{prefix}", lambda rgb=rgb: analyze_image_profile(rgb)
+            yield f"encode_image_to_data_uri/{prefix}", lambda rgb=rgb: encode_image_to_data_uri(rgb)
+
+
+def text_cases() -> Iterator[Case]:
+    image = synthetic_image(1024, "RGB")
+    thumbnail = image.copy()
+    thumbnail.thumbnail((RECENT_THUMBNAIL_SIZE, RECENT_THUMBNAIL_SIZE))
+    thumbnail_uri = encode_image_to_data_uri(thumbnail)
+    for turns in HISTORY_TURNS:
+        history = sample_history(turns)
+        yield (
+            f"build_messages/history={turns}",
+            lambda history=history: build_messages(image, DEFAULT_FORMAT, DEFAULT_STYLE, "突出秋景", history),
+        )
+        entries = [
+            {
+                "image": thumbnail_uri,
+                "format": DEFAULT_FORMAT,
+                "style": DEFAULT_STYLE,
+                "timestamp": "12:00:00",
+                "prompt": "请突出画面中的秋意与远山，并加入一句点题的结尾。",
+                "history": history,
+            }
+            for _ in range(MAX_RECENT_ENTRIES)
+        ]
+        yield f"render_recent_creations/history={turns}", lambda entries=entries: render_recent_creations(entries)
+
+
+def measure(fn: Callable[[], Any], min_time: float, min_repeats: int = 3, max_repeats: int = 200) -> Dict[str, Any]:
+    fn()  # 预热
+    samples: List[float] = []
+    total = 0.0
+    while len(samples) < min_repeats or (total < min_time and len(samples) < max_repeats):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        samples.append(elapsed)
+        total += elapsed
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "min_ms": round(min(samples) * 1000, 4),
+        "repeats": len(samples),
+    }
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "node": platform.node(),
+    }
+
+
+def run_suite(pattern: Optional[str], quick: bool, min_time: float) -> Dict[str, Any]:
+    cases: Dict[str, Dict[str, Any]] = {}
+    sides = QUICK_IMAGE_SIDES if quick else IMAGE_SIDES
+    for name, fn in _chain(image_cases(sides), text_cases()):
+        if pattern and pattern not in name:
+            continue
+        cases[name] = measure(fn, min_time)
+        print(f"  {name:<52}{cases[name]['median_ms']:>12.3f} ms", file=sys.stderr)
+    return {"environment": environment(), "cases": cases}
+
+
+def _chain(*iterators: Iterator[Case]) -> Iterator[Case]:
+    for iterator in iterators:
+        yield from iterator
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> Dict[str, Any]:
+    """
+    逐用例比较中位数
+
+    Returns:
+        {"rows": [...], "regressions": [用例名], "missing": [基线中有、本次未运行的用例]}
+    """
+    rows = []
+    regressions = []
+    for name, result in current["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            rows.append({"case": name, "baseline_ms": None, "current_ms": result["median_ms"], "change": None, "status": "new"})
+            continue
+        change = result["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+        delta = result["median_ms"] - base["median_ms"]
+        if change > threshold and delta > NOISE_FLOOR_MS:
+            status = "regression"
+            regressions.append(name)
+        elif change < -threshold and -delta > NOISE_FLOOR_MS:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({
+            "case": name,
+            "baseline_ms": base["median_ms"],
+            "current_ms": result["median_ms"],
+            "change": round(change, 4),
+            "status": status,
+        })
+    missing = [name for name in baseline["cases"] if name not in current["cases"]]
+    return {"threshold": threshold, "rows": rows, "regressions": regressions, "missing": missing}
+
+
+def print_comparison(report: Dict[str, Any], baseline_env: Dict[str, str]) -> None:
+    print("=" * 96)
+    print(f"基线: {baseline_env.get('timestamp')}  {baseline_env.get('node')}  "
+          f"Python {baseline_env.get('python')} / numpy {baseline_env.get('numpy')} / Pillow {baseline_env.get('pillow')}")
+    print(f"{'用例':<52}{'基线(ms)':>12}{'本次(ms)':>12}{'变化':>10}  状态")
+    for row in report["rows"]:
+        baseline_ms = "-" if row["baseline_ms"] is None else f"{row['baseline_ms']:.3f}"
+        change = "-" if row["change"] is None else f"{row['change']:+.1%}"
+        marker = {"regression": "⚠️ 回退", "faster": "✓ 变快", "new": "新增", "ok": ""}[row["status"]]
+        print(f"{row['case']:<52}{baseline_ms:>12}{row['current_ms']:>12.3f}{change:>10}  {marker}")
+    if report["missing"]:
+        print(f"本次未运行的基线用例: {len(report['missing'])} 个")
+    print("-" * 96)
+    if report["regressions"]:
+        print(f"❌ {len(report['regressions'])} 个用例变慢超过 {report['threshold']:.0%}")
+    else:
+        print(f"✓ 无超过 {report['threshold']:.0%} 的回退")
+    print("=" * 96)
+
+
+def load_results(path: Path) -> Dict[str, Any]:
+    with path.open(encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_results(results: Dict[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        json.dump(results, fh, ensure_ascii=False, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="热路径函数微基准")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="运行基准")
+    run.add_argument("-k", "--filter", help="只运行名称包含该子串的用例")
+    run.add_argument("--quick", action="store_true", help=f"只测试边长 {QUICK_IMAGE_SIDES} 的图片")
+    run.add_argument("--min-time", type=float, default=0.3, help="每个用例的最短累计计时（秒）")
+    run.add_argument("-o", "--output", type=Path, help="结果写入的JSON文件")
+    run.add_argument("--save-baseline", action="store_true", help="将结果保存为基线")
+    run.add_argument("--compare", action="store_true", help="运行后与基线比较")
+    run.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="基线文件")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定回退的相对变慢比例")
+
+    cmp = subparsers.add_parser("compare", help="比较已保存的结果与基线")
+    cmp.add_argument("results", type=Path, help="run -o 保存的结果文件")
+    cmp.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="基线文件")
+    cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定回退的相对变慢比例")
+    cmp.add_argument("--json", action="store_true", help="以JSON输出比较结果")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_suite(args.filter, args.quick, args.min_time)
+        if args.output:
+            save_results(results, args.output)
+        if args.save_baseline:
+            save_results(results, args.baseline)
+            print(f"✓ 已保存基线：{args.baseline}（{len(results['cases'])} 个用例）")
+        if not args.compare:
+            if not args.output and not args.save_baseline:
+                print(json.dumps(results, ensure_ascii=False, indent=2))
+            return 0
+    else:
+        results = load_results(args.results)
+
+    if not args.baseline.exists():
+        print(f"❌ 基线文件不存在：{args.baseline}（先运行 run --save-baseline）")
+        return 2
+    baseline = load_results(args.baseline)
+    report = compare(results, baseline, args.threshold)
+    if getattr(args, "json", False):
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_comparison(report, baseline["environment"])
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
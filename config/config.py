@@ -10,14 +10,134 @@ EXAMPLES_DIR = PROJECT_ROOT / "examples"
 
 MODEL_PATH = os.getenv("MODEL_PATH", "/home/jsj/llms/Qwen3-VL-8B-Instruct")
 
+# 推理后端："transformers" 加载真实模型；"stub" 为无需GPU的模拟后端（开发与压测用）
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "transformers")
+
+# 风格LoRA适配器：目录下每个风格一个子目录（PEFT保存格式），加载到同一基座模型上，
+# 按请求的风格路由；批量生成时不同风格的请求在同一次前向中各用各的适配器
+STYLE_ADAPTER_DIR = os.getenv("STYLE_ADAPTER_DIR")  # None 表示不使用适配器
+STYLE_ADAPTERS = {  # 风格 → 子目录名（同时作为适配器名）；缺失的子目录按基座模型生成
+    "婉约抒情风": "wanyue",
+    "豪放壮阔风": "haofang",
+    "田园归隐风": "tianyuan",
+    "禅意空灵风": "chanyi",
+    "边塞苍茫风": "biansai",
+}
+STYLE_ADAPTER_MAX_LOADED = 3  # 同时驻留在模型上的适配器数，超出时卸载最久未使用的
+
+# 模型注册表：多个模型共用一个进程，按需加载，超出内存预算时卸载最久未使用的模型
+# 每项可选：label 界面显示名、device_map（"cpu" 时不要求GPU）、memory_gb 无法从权重文件估算时的内存占用、
+# adapter_dir 该基座模型的风格适配器目录
+# 只有一项时等同于单模型；配置多副本（REPLICA_DEVICE_GROUPS）时只使用默认模型
+MODEL_REGISTRY = {
+    "qwen3-vl-8b": {"path": MODEL_PATH, "label": "品质 · 8B", "memory_gb": 18, "adapter_dir": STYLE_ADAPTER_DIR},
+}
+FAST_MODEL_PATH = os.getenv("FAST_MODEL_PATH")  # 极速2B模型路径；设置后加入注册表供按请求选择
+if FAST_MODEL_PATH:
+    MODEL_REGISTRY["qwen3-vl-2b"] = {"path": FAST_MODEL_PATH, "label": "极速 · 2B", "memory_gb": 5}
+DEFAULT_MODEL = "qwen3-vl-8b"  # 默认模型（启动时加载）
+MODEL_PIN_DEFAULT = True  # 默认模型常驻，不参与淘汰
+MODEL_MEMORY_BUDGET_GB = None  # 已加载模型的内存预算；None 表示全部GPU显存的 MODEL_MEMORY_BUDGET_FRACTION
+MODEL_MEMORY_BUDGET_FRACTION = 0.85  # 自动预算占显存的比例（其余留给KV缓存与激活）
+
 # 模型加载配置
 DEVICE_MAP = "auto"  
+
+# 快速冷启动
+PROCESSOR_CACHE_ENABLED = True  # 处理器（分词器 + 图像处理器）保存到本地缓存目录，重启时从该目录加载
+PROCESSOR_CACHE_DIR = PROJECT_ROOT / "cache" / "processor"  # 按模型目录、文件修改时间与 transformers 版本区分
+# MODEL_PATH 为 scripts/shard_checkpoint.py 生成的按设备分片目录时，各设备的分片由线程并行内存映射加载
+
+# 多副本数据并行：每个设备组加载一个完整副本，请求按最少在途工作量分发
+REPLICA_DEVICE_GROUPS = None  # 例如 [[0], [1], [2, 3]]；None 表示单模型按 DEVICE_MAP 加载
+REPLICA_FAILURE_THRESHOLD = 3  # 连续失败多少次后暂停向该副本分发
+REPLICA_RECOVERY_SECONDS = 30  # 暂停后多久允许重新试探
+
+# 推理进程：>0 时界面进程只负责UI与预处理，模型推理在独立子进程中执行
+INFERENCE_WORKERS = 0  # 推理进程数（配合 REPLICA_DEVICE_GROUPS 时每个进程使用一个设备组）
+WORKER_START_TIMEOUT = 600  # 等待推理进程加载模型的超时（秒）
+WORKER_RESTART_DELAY = 2  # 推理进程崩溃后重启前的等待（秒），连续失败时按2倍递增
+WORKER_RESTART_BACKOFF_MAX = 60  # 重启等待的上限（秒）
+WORKER_MAX_START_FAILURES = 5  # 推理进程连续未能就绪即退出的次数上限，达到后停止重启并标记为失败
+WORKER_RESPONSE_GRACE = 30  # 请求截止时间过后仍等待推理进程响应的秒数（停止解码并返回已生成部分所需的时间）
+WORKER_RESPONSE_TIMEOUT = 600  # 不限截止时间的请求等待推理进程下一条响应的上限（秒）
+
+# 并发通道：图像分析等CPU轻任务与模型生成分开排队
+ANALYSIS_LANE_CONCURRENCY = 8  # 分析通道同时执行的任务数
+ANALYSIS_LANE_QUEUE_SLOTS = 8  # 分析通道内可等待的任务数
+GENERATION_LANE_CONCURRENCY = None  # 生成通道并发数；None 表示按副本数/推理进程数
+GENERATION_LANE_QUEUE_SLOTS = 16  # 生成通道内可等待的任务数
+LANE_METRICS_WINDOW = 200  # 通道耗时统计的滑动窗口（任务数）
+
+# 生成通道调度：按预计耗时短者优先，等待越久优先级越高
+SCHEDULER_POLICY = "sjf"  # "sjf" 短任务优先 / "fifo" 先到先服务
+SCHEDULER_AGING_RATE = 0.1  # 每等待1秒，有效预计耗时减少的秒数（防止长任务饿死）
+SCHEDULER_TOKENS_PER_CHAR = 1.6  # 无观测数据时，每个诗句汉字折算的生成token数（含标点换行）
+SCHEDULER_DEFAULT_TOKENS_PER_SECOND = 25.0  # 无观测数据时假定的生成速度
+SCHEDULER_PREFILL_SECONDS_PER_CHAR = 0.0005  # 对话历史每个字的预填充耗时
+SCHEDULER_MIN_SAMPLES = 5  # 某格式观测样本达到该数后改用观测均值
+
+# 准入控制：生成请求超出队列深度、预计等待或客户端频率上限时立即拒绝并提示排队时间
+ADMISSION_ENABLED = True
+ADMISSION_MAX_QUEUE_DEPTH = 12  # 生成通道内等待的任务数上限（不超过 GENERATION_LANE_QUEUE_SLOTS）
+ADMISSION_MAX_WAIT_SECONDS = 120  # 预计排队时间上限（秒）；0 表示不限
+ADMISSION_RATE_LIMIT = 6  # 每个客户端在窗口内最多受理的生成请求数；0 表示不限
+ADMISSION_RATE_WINDOW_SECONDS = 60  # 频率限制的滑动窗口（秒）
+# 按 X-Forwarded-For 识别客户端：仅在服务只能经可信代理（如分享链接的隧道）访问时开启，否则客户端可伪造该头绕过频率限制
+ADMISSION_TRUST_FORWARDED_FOR = os.getenv("ADMISSION_TRUST_FORWARDED_FOR", "0") == "1"
+ADMISSION_TRUSTED_PROXY_COUNT = 1  # 可信代理层数：取 X-Forwarded-For 从右数第N项（由最外层可信代理写入）
+ADMISSION_HEADROOM_SLOTS = 8  # 通道满时仍能立即执行拒绝逻辑的Gradio并发名额
+
+# 生成请求的截止时间（秒，自受理起计，含排队）；到时停止解码并返回已生成的部分，0 表示不限
+GENERATION_DEADLINE_SECONDS = 180
+
+# 视觉token预算：按生成通道排队深度与诗词格式为每个请求选择图片像素上下限，
+# 短篇幅格式与高负载时使用更少的视觉token，降低预填充耗时
+VISION_BUDGET_ENABLED = True
+VISION_TOKEN_SIDE = 32  # 每个视觉token对应的像素边长（Qwen3-VL 为32，Qwen2/2.5-VL 为28）
+VISION_MAX_TOKENS = 1280  # 空闲时单张图片的视觉token上限
+VISION_FLOOR_TOKENS = 192  # 高负载时上限不低于该值
+VISION_MIN_TOKENS = 4  # 下限（更小的图片放大到该值）
+VISION_LOAD_HALF_DEPTH = 4  # 生成通道排队数达到该值时预算减半
+VISION_FORMAT_SCALE = {  # 各格式相对预算：篇幅越短，所需的画面细节越少
+    "五言绝句": 0.5,
+    "七言绝句": 0.6,
+    "五言律诗": 0.75,
+    "七言律诗": 0.85,
+    "词（自动匹配词牌）": 1.0,
+}
+# 多图请求：一组照片共用一份视觉token总预算，按各图原始面积自动分配每张的分辨率
+VISION_MULTI_IMAGE_SCALE = 2.5  # 一组照片的总预算最多为单张预算的倍数
+VISION_MULTI_IMAGE_FLOOR_TOKENS = 64  # 每张照片至少保留的视觉token数
+
+# 过载降级：生成通道排队越深，启用越高的降级档位（以稍差的结果换取更快的响应）
+# 每档的动作：cap_tokens 把 max_new_tokens 降到格式篇幅所需，greedy 改用贪心解码，
+# history_turns 只保留最近几轮对话，fallback 改由备用小模型生成（未配置备用模型时跳过该档）
+DEGRADATION_ENABLED = True
+DEGRADATION_TIERS = [
+    {"name": "精简长度", "queue_depth": 3, "cap_tokens": True},
+    {"name": "贪心解码", "queue_depth": 5, "cap_tokens": True, "greedy": True},
+    {"name": "精简历史", "queue_depth": 7, "cap_tokens": True, "greedy": True, "history_turns": 1},
+    {"name": "备用模型", "queue_depth": 9, "cap_tokens": True, "greedy": True, "history_turns": 1, "fallback": True},
+]
+DEGRADATION_HYSTERESIS = 2  # 排队深度低于当前档位阈值该数量后才回落，避免在阈值附近反复切换
+DEGRADATION_TOKEN_HEADROOM = 1.25  # 限制长度时在格式预计token数之上保留的余量
+DEGRADATION_TOKEN_PERCENTILE = 95  # 某格式观测样本足够时，按实际生成token数的该分位数（而非字数估计）限制长度
+DEGRADATION_MIN_TOKENS = 96  # 限制后的生成长度下限：容纳标题行与模板开销，避免诗句截断在中途
+DEGRADATION_EVENT_WINDOW = 100  # 保留的最近档位切换事件数
+FALLBACK_MODEL_PATH = os.getenv("FALLBACK_MODEL_PATH")  # 备用小模型路径；None 表示不启用备用模型档位
+FALLBACK_DEVICE_MAP = "auto"
+
+# 模拟后端耗时参数
+STUB_PREFILL_SECONDS = 0.2  # 预填充耗时（秒）
+STUB_SECONDS_PER_TOKEN = 0.02  # 每个生成token耗时（秒）
 MODEL_DTYPE = "bfloat16"  
 TRUST_REMOTE_CODE = True  
 
 DEFAULT_MAX_TOKENS = 512  
 DEFAULT_TOP_P = 0.8  
 DEFAULT_TEMPERATURE = 0.7  # 温度参数（控制随机性）
+DEFAULT_SEED = None  # 固定随机种子（None 表示每次随机；固定后结果可复现并可被缓存）
 
 # 生成参数范围
 MAX_TOKENS_MIN = 128
@@ -34,19 +154,67 @@ DEFAULT_STYLE = "婉约抒情风"
 
 # 界面参数
 MAX_RECENT_ENTRIES = 6  
+RECENT_HISTORY_TURNS = 10  # 每条创作记录保留的对话轮数
+RECENT_THUMBNAIL_SIZE = 320  # 创作记录卡片缩略图的最长边（像素）
 IMAGE_UPLOAD_HEIGHT = 360  
 CHATBOT_HEIGHT = 360  
 POEM_OUTPUT_LINES = 6  
 
+# 会话内存：对话与创作记录按会话集中存放，超出预算时淘汰最旧的内容，闲置会话定期回收
+SESSION_MAX_BYTES = 4 * 1024 * 1024  # 单个会话的内存预算（字节）
+SESSION_IDLE_SECONDS = 2 * 3600  # 会话闲置超过该时长即回收
+SESSION_REAP_INTERVAL = 300  # 回收检查间隔（秒）
 
 SERVER_NAME = "0.0.0.0"  
 SERVER_PORT = 7860  
 SHARE = True  
 
+# 程序化推理接口（与Gradio界面共用同一服务器）
+API_ENABLED = True  # 是否挂载 JSON/SSE 接口
+API_PREFIX = "/v1"  # 接口路径前缀
+
+# 静态资源（scripts/build_static_assets.py 构建，离线可用）
+STATIC_ASSETS_DIR = PROJECT_ROOT / "static" / "dist"  # 构建产物目录
+STATIC_URL_PREFIX = "/ui-static"  # 访问路径前缀（/static 与 /assets 已被Gradio占用）
+STATIC_CACHE_MAX_AGE = 365 * 24 * 3600  # 带内容哈希的文件缓存时长（秒）
+FONT_SOURCE_DIR = PROJECT_ROOT / "fonts"  # 字体源文件目录（需自行放入）
+FONT_FAMILIES = {  # CSS字体名 → 源文件名前缀
+    "Noto Serif SC": "NotoSerifSC",
+    "Inter": "Inter",
+}
+
 # 图像分析参数
 IMAGE_ANALYSIS_SIZE = (256, 256)  
+MULTI_IMAGE_MAX = 9  # 一次创作最多上传的照片数（组图写成一首）
 IMAGE_SAVE_QUALITY = 85  # JPEG保存质量（1-100）
 
+# 上传校验（仅读取文件头，解码像素前执行）
+UPLOAD_MAX_BYTES = 20 * 1024 * 1024  # 上传文件大小上限
+IMAGE_MIN_SIDE = 32  # 短边下限（像素）
+IMAGE_MAX_PIXELS = 40_000_000  # 像素总数上限，防止解压炸弹
+IMAGE_MAX_DECODED_MB = 256  # 预估解码后内存上限（MB）
+IMAGE_SUPPORTED_FORMATS = ("JPEG", "PNG", "WEBP", "BMP")  # 允许的容器格式
+IMAGE_SUPPORTED_MODES = ("1", "L", "LA", "P", "RGB", "RGBA", "CMYK", "YCbCr", "I;16")  # 允许的像素模式
+
+# 内容寻址图片库：原始文件按SHA-256去重存放，解码后的RGB像素缓存为 .npy 并以内存映射读取
+IMAGE_STORE_DIR = PROJECT_ROOT / "cache" / "images"  # 存放目录（按摘要前4位分两级子目录）
+IMAGE_STORE_MAX_BYTES = 4 * 1024 ** 3  # 总大小上限，超出时按最近访问时间回收
+IMAGE_STORE_GC_TARGET = 0.8  # 回收后保留的比例
+IMAGE_STORE_TOUCH_INTERVAL = 60  # 访问时间的最小更新间隔（秒），减少元数据写入
+
+# 短视频与动图：逐帧流式解码，按场景变化挑选关键帧，只有关键帧进入图片分析与模型
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".webm", ".mkv", ".avi")  # 按视频解码的文件后缀（需要 PyAV）
+VIDEO_MAX_BYTES = 200 * 1024 * 1024  # 视频/动图文件大小上限
+VIDEO_MAX_SECONDS = 120  # 时长上限（秒）
+VIDEO_KEYFRAMES = 4  # 每段挑选的关键帧数（送入分析与生成）
+VIDEO_SAMPLE_FPS = 2.0  # 候选帧的采样率上限（每秒），解码后未采样的帧直接丢弃
+VIDEO_DECODE_SECONDS = 15  # 解码时限（秒），到时以已取得的候选帧挑选关键帧
+VIDEO_SCENE_SIZE = (64, 64)  # 场景检测使用的缩略尺寸
+VIDEO_HIST_BINS = 16  # 每个颜色通道的直方图分箱数
+VIDEO_SCENE_DIFF_WEIGHT = 0.5  # 场景变化分数中帧差的权重（其余为直方图距离）
+VIDEO_FRAME_MAX_SIDE = 1280  # 关键帧的长边上限（像素）
+VIDEO_CACHE_ENTRIES = 64  # 进程内缓存的片段数（分析与生成复用同一组关键帧）
+
 # 色调判断阈值
 BRIGHTNESS_HIGH_THRESHOLD = 0.62  # 高亮度阈值
 BRIGHTNESS_LOW_THRESHOLD = 0.38  # 低亮度阈值
@@ -57,9 +225,35 @@ COLOR_DOMINANCE_THRESHOLD = 1.05  # 颜色主导阈值
 ENABLE_TF32 = True  # 启用TF32加速（适用于Ampere及以上架构）
 CUDNN_BENCHMARK = True  # 启用CUDNN benchmark
 
+# 编译解码：静态KV缓存 + torch.compile 的单步解码，减少每个解码步的Python开销
+COMPILE_DECODE = os.getenv("COMPILE_DECODE", "0") == "1"  # 默认关闭（首次编译耗时较长）
+COMPILE_MODE = None  # torch.compile 模式；None 表示GPU用 "reduce-overhead"（CUDA Graphs），CPU用 "default"
+COMPILE_LENGTH_BUCKETS = [512, 1024, 2048]  # 静态缓存长度档位（提示长度 + 生成上限向上取档），超出最大档时按普通方式生成
+COMPILE_WARMUP_BATCH_SIZES = [1]  # 启动时预热的批大小（每个批大小 × 长度档位编译一次）；None 表示 1 到 BATCH_SIZE，未预热的批大小按普通方式生成
+COMPILE_CACHE_MAX_MB = 2048  # 静态KV缓存总占用上限（MB），超出时释放最久未用的缓存，下次使用时重新分配；None 表示不限制
+
 MIN_GPU_COUNT = 1  
 
 
+# 用量统计配置（每次生成的token与显存记录）
+USAGE_LOG_ENABLED = True  # 是否写入用量日志
+USAGE_LOG_PATH = PROJECT_ROOT / "logs" / "usage.jsonl"  # 用量日志路径（JSONL）
+USAGE_LOG_MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件上限，超过后滚动
+USAGE_LOG_BACKUP_COUNT = 5  # 保留的历史日志文件数量
+USAGE_TOKEN_SAMPLES = 200  # 每种格式保留最近多少次自然结束的生成token数（用于分位数统计）
+
+# 结果缓存配置（仅对固定随机种子的请求生效）
+RESULT_CACHE_ENABLED = False  # 是否启用生成结果缓存
+RESULT_CACHE_MAX_ENTRIES = 256  # 内存LRU缓存条目上限
+RESULT_CACHE_TTL_SECONDS = 24 * 3600  # 缓存有效期（秒）
+RESULT_CACHE_DIR = None  # 磁盘持久化目录（None 表示仅内存），如 PROJECT_ROOT / "cache" / "results"
+
+# 批量创作配置（python run.py batch）
+BATCH_SIZE = 4  # 每次送入模型的请求数
+BATCH_DECODE_WORKERS = None  # 图片解码与分析的进程数（None 表示CPU核数）
+BATCH_MAX_IMAGE_SIDE = 1280  # 送入模型前图片长边上限，避免原图产生过多视觉token
+BATCH_REPORT_INTERVAL = 20  # 每完成多少条结果打印一次吞吐
+
 DEBUG_MODE = False  # 调试模式
 VERBOSE_LOGGING = False  # 详细日志输出
 
@@ -1,7 +1,12 @@
 """
 应用启动脚本 - Run Script
-启动Gradio Web应用
+启动Gradio Web应用，或执行批量创作
+
+用法：
+    python run.py                      # 启动Web应用
+    python run.py batch <图片目录> -o results.jsonl
 """
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -14,10 +19,22 @@ from config.config import (
     SERVER_NAME,
     SERVER_PORT,
     SHARE,
+    API_ENABLED,
+    API_PREFIX,
+    INFERENCE_WORKERS,
+    ADMISSION_HEADROOM_SLOTS,
     EXAMPLES_DIR,
+    BATCH_SIZE,
+    BATCH_DECODE_WORKERS,
+    DEFAULT_FORMAT,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_TOP_P,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_SEED,
 )
+from src.constants.templates import FORMAT_GUIDE, STYLE_GUIDE
 from src.app import create_gradio_app
-from src.models.model_manager import initialize_model
+from src.models.model_manager import initialize_fallback_model, initialize_model
 
 
 def ensure_directories():
@@ -43,9 +60,85 @@ def print_startup_banner():
     print(banner)
 
 
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="AI诗意镜")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("serve", help="启动Web应用（默认）")
+
+    batch = subparsers.add_parser("batch", help="为图片目录批量创作诗词")
+    batch.add_argument("input_dir", type=Path, help="图片目录（递归遍历）")
+    batch.add_argument(
+        "-o", "--output", type=Path, default=Path("batch_results.jsonl"),
+        help="输出JSONL路径（已存在时断点续跑）",
+    )
+    batch.add_argument(
+        "--formats", default=DEFAULT_FORMAT,
+        help=f"逗号分隔的诗词格式，或 all。可选：{','.join(FORMAT_GUIDE)}",
+    )
+    batch.add_argument(
+        "--styles", default="auto",
+        help=f"逗号分隔的风格，auto 表示使用图像分析推荐，或 all。可选：{','.join(STYLE_GUIDE)}",
+    )
+    batch.add_argument("--instruction", default="", help="统一的灵感提示")
+    batch.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="每批请求数")
+    batch.add_argument("--workers", type=int, default=BATCH_DECODE_WORKERS, help="解码进程数")
+    batch.add_argument("--max-new-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    batch.add_argument("--top-p", type=float, default=DEFAULT_TOP_P)
+    batch.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    batch.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    return parser.parse_args()
+
+
+def split_choices(value: str, all_choices) -> list:
+    if value == "all":
+        return list(all_choices)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def run_batch_command(args: argparse.Namespace):
+    """执行批量创作子命令"""
+    from src.batch import run_batch
+
+    print_startup_banner()
+    print("正在初始化模型...")
+    print("=" * 80)
+    model_manager = initialize_model()
+    print("=" * 80)
+    print()
+
+    print(f"开始批量创作：{args.input_dir} → {args.output}")
+    stats = run_batch(
+        model_manager,
+        input_dir=args.input_dir,
+        output_path=args.output,
+        formats=split_choices(args.formats, FORMAT_GUIDE),
+        styles=split_choices(args.styles, STYLE_GUIDE),
+        instruction=args.instruction,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        max_new_tokens=args.max_new_tokens,
+        top_p=args.top_p,
+        temperature=args.temperature,
+        seed=args.seed,
+    )
+    print("=" * 80)
+    print("批量创作完成：")
+    print(f"  - 耗时: {stats['elapsed_seconds']:.1f}s")
+    print(f"  - 图片吞吐: {stats['images_per_second']:.2f} 张/s")
+    print(f"  - 生成吞吐: {stats['tokens_per_second']:.1f} tokens/s")
+    print(f"  - 失败: {stats['failures']}")
+    print("=" * 80)
+
+
 def main():
     """主函数"""
+    args = parse_args()
     try:
+        if args.command == "batch":
+            run_batch_command(args)
+            return
+
         # 打印启动横幅
         print_startup_banner()
         
@@ -54,10 +147,19 @@ def main():
         ensure_directories()
         print()
         
-        # 初始化模型
+        # 初始化模型（启用推理进程时由子进程加载，本进程只负责界面）
         print("正在初始化模型...")
         print("=" * 80)
-        model_manager = initialize_model()
+        if INFERENCE_WORKERS > 0:
+            from src.serving.workers import WorkerPool
+            print(f"正在启动 {INFERENCE_WORKERS} 个推理进程...")
+            model_manager = WorkerPool(INFERENCE_WORKERS).start()
+        else:
+            model_manager = initialize_model()
+        # 备用小模型（过载降级的最高档位）在启动时加载，避免高负载时才加载
+        fallback = initialize_fallback_model(model_manager.usage_tracker)
+        if fallback is not None:
+            print(f"✓ 备用模型已加载：{fallback.model_path}")
         print()
         
         # 打印模型信息
@@ -70,7 +172,7 @@ def main():
         
         # 创建Gradio应用
         print("正在构建Web界面...")
-        app = create_gradio_app()
+        app = create_gradio_app(model_manager)
         print("✓ Web界面构建完成")
         print()
         
@@ -80,14 +182,29 @@ def main():
         print(f"  - 服务器地址: {SERVER_NAME}")
         print(f"  - 端口: {SERVER_PORT}")
         print(f"  - 公共链接: {'已启用' if SHARE else '未启用'}")
+        print(f"  - 推理接口: {API_PREFIX + '/poems' if API_ENABLED else '未启用'}")
         print("=" * 80)
         print()
         
+        # 静态资源与推理接口路由在创建服务器时一并注册，与界面共用端口
+        from src.ui.assets import create_static_router
+        routes = list(create_static_router().routes)
+        if API_ENABLED:
+            from src.api import create_api_router
+            routes += create_api_router(model_manager).routes
+        app_kwargs = {"routes": routes}
+        
+        # 工作线程数需容纳各通道的全部名额，否则请求会在准入检查之前卡在线程池
+        from src.serving.lanes import get_lanes
+        max_threads = sum(lane.gradio_limit for lane in get_lanes().values()) + ADMISSION_HEADROOM_SLOTS
+        
         # 启动应用
         app.launch(
             server_name=SERVER_NAME,
             server_port=SERVER_PORT,
             share=SHARE,
+            max_threads=max(40, max_threads),
+            app_kwargs=app_kwargs,
         )
         
     except KeyboardInterrupt:
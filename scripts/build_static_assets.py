@@ -0,0 +1,223 @@
+"""
+静态资源构建脚本 - Static Asset Builder
+把界面样式与本地字体打包为可离线部署的静态文件：
+
+- 从 FONT_SOURCE_DIR 读取字体（Noto Serif SC、Inter），按界面文案与常用汉字子集化
+- 压缩 CUSTOM_CSS，并在开头写入指向本地字体的 @font-face
+- 文件名带内容哈希，生成 gzip / brotli 预压缩版本与清单 manifest.json
+
+全程不访问网络。字体子集化依赖 fonttools（输出woff2还需要 brotli）。
+
+用法：
+    python scripts/build_static_assets.py
+    python scripts/build_static_assets.py --font-dir /opt/fonts --glyphs gb2312
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.config import STATIC_ASSETS_DIR, FONT_SOURCE_DIR, FONT_FAMILIES
+from src.ui.assets import MANIFEST_NAME
+from src.ui.styles import CUSTOM_CSS
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：缺失时只生成gzip版本，字体输出woff
+    brotli = None
+
+# 字体源文件扩展名
+FONT_EXTENSIONS = {".ttf", ".otf", ".woff", ".woff2"}
+
+# 扫描界面文案的源文件
+GLYPH_SOURCES = ["src/**/*.py", "config/*.py"]
+
+# 诗句常用标点
+POETRY_PUNCTUATION = "，。、；：？！“”‘’《》〈〉（）【】—…·「」『』"
+
+# 预压缩的文件类型（字体本身已压缩，不再处理）
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".json", ".svg"}
+
+
+def minify_css(css: str) -> str:
+    """去除注释与多余空白（不改变选择器与取值的语义）"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+
+def common_hanzi(levels: int) -> str:
+    """GB2312一级（3755字）或一、二级（6763字）汉字，由编码表直接生成"""
+    last_row = 0xD7 if levels == 1 else 0xF7
+    chars = []
+    for row in range(0xB0, last_row + 1):
+        for cell in range(0xA1, 0xFF):
+            try:
+                chars.append(bytes([row, cell]).decode("gb2312"))
+            except UnicodeDecodeError:
+                continue
+    return "".join(chars)
+
+
+def collect_glyphs(mode: str) -> str:
+    """
+    汇总需要保留的字形
+
+    Args:
+        mode: ui（仅界面文案）/ common（再加GB2312一级汉字）/ gb2312（一、二级汉字）
+
+    Returns:
+        去重后的字符集
+    """
+    glyphs: Set[str] = {chr(code) for code in range(0x20, 0x7F)}
+    glyphs.update(POETRY_PUNCTUATION)
+    for pattern in GLYPH_SOURCES:
+        for path in PROJECT_ROOT.glob(pattern):
+            glyphs.update(ch for ch in path.read_text(encoding="utf-8") if ord(ch) > 0x7F and ch.isprintable())
+    # 生成的诗句可能用到界面文案以外的字，按常用字表补齐
+    if mode == "common":
+        glyphs.update(common_hanzi(1))
+    elif mode == "gb2312":
+        glyphs.update(common_hanzi(2))
+    return "".join(sorted(glyphs))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def font_face_info(path: Path) -> Dict[str, str]:
+    """读取字重（可变字体取wght轴范围）与字形样式"""
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(str(path), lazy=True)
+    if "fvar" in font:
+        axis = next((a for a in font["fvar"].axes if a.axisTag == "wght"), None)
+        weight = f"{int(axis.minValue)} {int(axis.maxValue)}" if axis else "400"
+    else:
+        weight = str(font["OS/2"].usWeightClass)
+    italic = bool(font["OS/2"].fsSelection & 1)
+    font.close()
+    return {"weight": weight, "style": "italic" if italic else "normal"}
+
+
+def subset_font(path: Path, glyphs: str, flavor: str) -> bytes:
+    """按字符集子集化字体，去掉hinting以减小体积"""
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = flavor
+    options.hinting = False
+    options.desubroutinize = True
+    options.layout_features = ["*"]
+    font = subset.load_font(str(path), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=glyphs)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    subset.save_font(font, buffer, options)
+    return buffer.getvalue()
+
+
+def find_fonts(font_dir: Path) -> Dict[str, List[Path]]:
+    found: Dict[str, List[Path]] = {}
+    if not font_dir.is_dir():
+        return found
+    for family, prefix in FONT_FAMILIES.items():
+        found[family] = sorted(
+            path for path in font_dir.iterdir()
+            if path.suffix.lower() in FONT_EXTENSIONS and path.name.startswith(prefix)
+        )
+    return found
+
+
+def write_asset(out_dir: Path, name: str, data: bytes, files: Dict[str, Any]) -> None:
+    """写入文件，按类型生成预压缩版本并登记到清单"""
+    target = out_dir / name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(data)
+    encodings = []
+    if target.suffix in COMPRESSIBLE_SUFFIXES:
+        # mtime=0 保证相同内容的构建结果逐字节一致
+        Path(f"{target}.gz").write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        encodings.append("gzip")
+        if brotli is not None:
+            Path(f"{target}.br").write_bytes(brotli.compress(data, quality=11))
+            encodings.append("br")
+    files[name] = {"hash": content_hash(data), "size": len(data), "encodings": encodings}
+
+
+def build(out_dir: Path, font_dir: Path, glyph_mode: str) -> Dict[str, Any]:
+    files: Dict[str, Any] = {}
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+
+    font_faces = []
+    fonts = find_fonts(font_dir)
+    if any(fonts.values()):
+        try:
+            import fontTools  # noqa: F401
+        except ImportError:
+            raise SystemExit("字体子集化需要 fonttools：pip install fonttools brotli")
+        flavor = "woff2" if brotli is not None else "woff"
+        glyphs = collect_glyphs(glyph_mode)
+        print(f"字符集：{len(glyphs)} 个字符，输出格式 {flavor}")
+        for family, paths in fonts.items():
+            for path in paths:
+                info = font_face_info(path)
+                data = subset_font(path, glyphs, flavor)
+                name = f"fonts/{path.stem}.{content_hash(data)}.{flavor}"
+                write_asset(out_dir, name, data, files)
+                print(f"  {path.name} → {name}（{path.stat().st_size // 1024}KB → {len(data) // 1024}KB）")
+                font_faces.append(
+                    f"@font-face{{font-family:'{family}';font-style:{info['style']};"
+                    f"font-weight:{info['weight']};font-display:swap;"
+                    f"src:url({name}) format('{flavor}')}}"
+                )
+    for family in FONT_FAMILIES:
+        if not fonts.get(family):
+            print(f"⚠️ 未在 {font_dir} 找到 {family} 字体，页面将使用系统已安装的字体")
+
+    css = "".join(font_faces) + minify_css(CUSTOM_CSS)
+    css_bytes = css.encode("utf-8")
+    css_name = f"app.{content_hash(css_bytes)}.css"
+    write_asset(out_dir, css_name, css_bytes, files)
+    print(f"  样式表 → {css_name}（{len(CUSTOM_CSS.encode('utf-8')) // 1024}KB → {len(css_bytes) // 1024}KB）")
+
+    manifest = {"css": css_name, "files": files}
+    (out_dir / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="构建离线静态资源（字体子集 + 压缩样式）")
+    parser.add_argument("--out", type=Path, default=STATIC_ASSETS_DIR, help="输出目录（会先清空）")
+    parser.add_argument("--font-dir", type=Path, default=FONT_SOURCE_DIR, help="字体源文件目录")
+    parser.add_argument(
+        "--glyphs", choices=["ui", "common", "gb2312"], default="common",
+        help="保留的字形：界面文案 / 加GB2312一级汉字 / 加GB2312全部汉字",
+    )
+    args = parser.parse_args(argv)
+
+    if brotli is None:
+        print("⚠️ 未安装 brotli，仅生成gzip预压缩文件")
+    manifest = build(args.out, args.font_dir, args.glyphs)
+    print(f"✓ 已写入 {args.out / MANIFEST_NAME}（{len(manifest['files'])} 个文件）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
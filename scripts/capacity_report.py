@@ -0,0 +1,344 @@
+"""
+容量测试脚本 - Capacity Report
+通过Gradio客户端协议模拟多名用户同时使用界面，逐级提高并发用户数，
+统计各类事件的吞吐、延迟（P50/P99）、排队与执行耗时，并找出延迟失控的并发水平
+
+每名模拟用户按真实操作顺序执行一次会话：
+    上传图片（分析）→ 提交创作 → 2~3 次优化建议追问 → 清除对话
+两步之间随机停顿（--think），每次会话使用不同的图片与客户端地址
+（X-Forwarded-For；对 --url 指定的服务施压时，该服务需以 ADMISSION_TRUST_FORWARDED_FOR=1 启动）。
+
+排队时间为客户端从提交到收到 process_starts 的间隔（Gradio队列），
+执行时间为其后到返回结果的间隔（含生成通道内的等待与模型生成）；
+服务端通道的等待/执行统计取自 {API_PREFIX}/lanes（推理接口未启用时省略）。
+
+用法：
+    python scripts/capacity_report.py --stub --users 1,2,4,8,16
+    python scripts/capacity_report.py --url http://127.0.0.1:7860 --users 1,4,8 --sessions 2 --json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# 模拟用户以 X-Forwarded-For 区分，--stub 在本进程内启动的服务需信任该头
+os.environ.setdefault("ADMISSION_TRUST_FORWARDED_FOR", "1")
+
+from config.config import ADMISSION_HEADROOM_SLOTS, API_PREFIX, FOLLOW_UP_SUGGESTIONS
+from src.constants.templates import FORMAT_GUIDE, STYLE_GUIDE
+from scripts.load_test import percentile
+
+# 轮询任务状态的间隔（秒）：短于该间隔的排队无法区分，记为未观测
+POLL_INTERVAL = 0.02
+
+# 事件类型（与界面事件的 api_name 对应）及报告中的顺序
+EVENTS = ["analyze", "generate", "follow_up", "clear"]
+
+# 准入控制拒绝提示的共同结尾，用于区分“被拒绝”与其他错误
+REJECTION_HINT = "后再试"
+
+
+def session_image(seed: int, directory: Path, size: int = 512) -> Path:
+    """生成一张带随机色块的测试图并写入目录，不同会话的图片内容互不相同"""
+    rng = np.random.default_rng(seed)
+    base = np.asarray(Image.linear_gradient("L").resize((size, size)).convert("RGB"), dtype=np.float32)
+    tint = rng.uniform(0.4, 1.0, size=3)
+    blocks = rng.integers(0, 256, size=(8, 8, 3)).astype(np.float32)
+    noise = np.kron(blocks, np.ones((size // 8, size // 8, 1), dtype=np.float32))
+    pixels = np.clip(base * tint * 0.7 + noise * 0.3, 0, 255).astype(np.uint8)
+    path = directory / f"session-{seed}.jpg"
+    Image.fromarray(pixels).save(path, format="JPEG", quality=85)
+    return path
+
+
+def start_stub_app() -> str:
+    """在本进程内以模拟后端启动完整的Gradio应用（含推理接口），返回其地址"""
+    from src.api import create_api_router
+    from src.app import create_gradio_app
+    from src.models.stub_backend import StubModelManager
+    from src.serving.lanes import get_lanes
+
+    model_manager = StubModelManager()
+    app = create_gradio_app(model_manager)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    max_threads = sum(lane.gradio_limit for lane in get_lanes().values()) + ADMISSION_HEADROOM_SLOTS
+    app.launch(
+        server_name="127.0.0.1",
+        server_port=port,
+        max_threads=max(40, max_threads),
+        prevent_thread_lock=True,
+        quiet=True,
+        app_kwargs={"routes": list(create_api_router(model_manager).routes)},
+    )
+    return f"http://127.0.0.1:{port}"
+
+
+def timed_call(client, event: str, api_name: str, *args) -> Dict[str, Any]:
+    """提交一次事件并等待完成，记录排队、执行与总耗时"""
+    from gradio_client.utils import Status
+
+    submitted = time.perf_counter()
+    job = client.submit(*args, api_name=api_name)
+    processing_at: Optional[float] = None
+    while not job.done():
+        if processing_at is None and job.status().code in (Status.PROCESSING, Status.ITERATING):
+            processing_at = time.perf_counter()
+        time.sleep(POLL_INTERVAL)
+    finished = time.perf_counter()
+
+    record: Dict[str, Any] = {
+        "event": event,
+        "status": "ok",
+        "seconds": finished - submitted,
+        "queue_seconds": None if processing_at is None else processing_at - submitted,
+        "service_seconds": None if processing_at is None else finished - processing_at,
+    }
+    try:
+        job.result()
+    except Exception as exc:
+        message = str(exc)
+        record["status"] = "rejected" if REJECTION_HINT in message else "error"
+        record["detail"] = message
+    return record
+
+
+def run_user_session(
+    base_url: str,
+    session_id: int,
+    image_path: Path,
+    think: float,
+    rng: random.Random,
+    records: List[Dict[str, Any]],
+) -> bool:
+    """
+    执行一次完整的用户会话
+
+    Returns:
+        会话中的创作请求是否全部成功
+    """
+    from gradio_client import Client, handle_file
+
+    headers = {"X-Forwarded-For": f"10.{session_id // 65536 % 256}.{session_id // 256 % 256}.{session_id % 256}"}
+    client = Client(base_url, verbose=False, headers=headers, download_files=False)
+
+    def pause() -> None:
+        if think:
+            time.sleep(rng.uniform(0.5, 1.5) * think)
+
+    def record(result: Dict[str, Any]) -> bool:
+        result["session"] = session_id
+        records.append(result)
+        return result["status"] == "ok"
+
+    # 上传组件为组图，单张照片也以列表传入
+    image = [{"image": handle_file(str(image_path)), "caption": None}]
+    format_choice = rng.choice(list(FORMAT_GUIDE))
+    style_choice = rng.choice(list(STYLE_GUIDE))
+    completed = True
+    try:
+        record(timed_call(client, "analyze", "/analyze", image))
+        pause()
+        instructions = [""] + [text for _, text in rng.sample(FOLLOW_UP_SUGGESTIONS, rng.choice([2, 3]))]
+        for turn, instruction in enumerate(instructions):
+            event = "generate" if turn == 0 else "follow_up"
+            if not record(timed_call(client, event, "/generate", image, format_choice, style_choice, instruction)):
+                # 被拒绝或出错后不再追问，直接清除对话
+                completed = False
+                break
+            pause()
+        record(timed_call(client, "clear", "/clear"))
+    finally:
+        client.close()
+    return completed
+
+
+def fetch_lane_stats(base_url: str) -> Optional[Dict[str, Any]]:
+    try:
+        response = httpx.get(f"{base_url}{API_PREFIX}/lanes", timeout=10)
+        return response.json() if response.status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
+
+def run_level(
+    base_url: str,
+    users: int,
+    sessions: int,
+    think: float,
+    seed: int,
+    image_dir: Path,
+) -> Dict[str, Any]:
+    """以给定并发用户数运行：每名用户连续完成 sessions 次会话"""
+    records: List[Dict[str, Any]] = []
+    completed: List[bool] = []
+
+    def user(index: int) -> None:
+        rng = random.Random(seed * 100003 + users * 1009 + index)
+        for n in range(sessions):
+            session_id = users * 10007 + index * sessions + n
+            image_path = session_image(seed + session_id, image_dir)
+            completed.append(run_user_session(base_url, session_id, image_path, think, rng, records))
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = summarize_level(records, elapsed)
+    summary["users"] = users
+    summary["sessions_completed"] = sum(completed)
+    summary["sessions_per_minute"] = round(sum(completed) / elapsed * 60, 2) if elapsed else 0.0
+    summary["lanes"] = fetch_lane_stats(base_url)
+    return summary
+
+
+def _stats(values: List[float]) -> Dict[str, float]:
+    return {"p50": round(percentile(values, 50), 3), "p99": round(percentile(values, 99), 3)}
+
+
+def summarize_level(records: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    by_event: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        by_event[record["event"]].append(record)
+
+    events = {}
+    for event in EVENTS:
+        items = by_event.get(event, [])
+        ok = [r for r in items if r["status"] == "ok"]
+        events[event] = {
+            "count": len(items),
+            "rejected": sum(r["status"] == "rejected" for r in items),
+            "errors": sum(r["status"] == "error" for r in items),
+            "per_second": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+            "latency": _stats([r["seconds"] for r in ok]),
+            "queue": _stats([r["queue_seconds"] for r in ok if r["queue_seconds"] is not None]),
+            "service": _stats([r["service_seconds"] for r in ok if r["service_seconds"] is not None]),
+        }
+    failed = [r for r in records if r["status"] != "ok"]
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": len(records),
+        "failure_rate": round(len(failed) / len(records), 4) if records else 0.0,
+        "sample_failure": failed[0].get("detail") if failed else None,
+        "events": events,
+    }
+
+
+def find_breakdown(levels: List[Dict[str, Any]], factor: float, max_failure_rate: float) -> Dict[str, Any]:
+    """
+    找出延迟失控的并发水平
+
+    以最低并发下创作请求的 P50 延迟为基线，某一水平的 P99 超过基线的 factor 倍，
+    或失败（含被拒绝）比例超过 max_failure_rate 时视为失控；其前一水平即为可承载的并发用户数。
+    """
+    generate_p50 = [level["events"]["generate"]["latency"]["p50"] for level in levels]
+    baseline = next((value for value in generate_p50 if value > 0), 0.0)
+    result = {"baseline_generate_p50": baseline, "breakdown_users": None, "capacity_users": None, "reason": None}
+    for index, level in enumerate(levels):
+        generate_p99 = max(level["events"][event]["latency"]["p99"] for event in ("generate", "follow_up"))
+        reason = None
+        if level["failure_rate"] > max_failure_rate:
+            reason = f"失败比例 {level['failure_rate']:.1%} 超过 {max_failure_rate:.0%}"
+        elif baseline and generate_p99 > baseline * factor:
+            reason = f"创作 P99 {generate_p99:.2f}s 超过基线 {baseline:.2f}s 的 {factor:g} 倍"
+        if reason:
+            result.update(
+                breakdown_users=level["users"],
+                capacity_users=levels[index - 1]["users"] if index else None,
+                reason=reason,
+            )
+            return result
+    result["capacity_users"] = levels[-1]["users"] if levels else None
+    return result
+
+
+def print_report(levels: List[Dict[str, Any]], breakdown: Dict[str, Any]) -> None:
+    print("=" * 96)
+    for level in levels:
+        print(
+            f"并发用户 {level['users']:>3}    耗时 {level['elapsed_seconds']}s    "
+            f"完成会话 {level['sessions_completed']}（{level['sessions_per_minute']}/分钟）    "
+            f"失败比例 {level['failure_rate']:.1%}"
+        )
+        print(f"  {'事件':<10}{'次数':>6}{'拒绝':>6}{'错误':>6}{'吞吐/s':>9}"
+              f"{'延迟P50':>10}{'延迟P99':>10}{'排队P50':>10}{'排队P99':>10}{'执行P50':>10}{'执行P99':>10}")
+        for event in EVENTS:
+            stats = level["events"][event]
+            print(
+                f"  {event:<10}{stats['count']:>6}{stats['rejected']:>6}{stats['errors']:>6}{stats['per_second']:>9}"
+                f"{stats['latency']['p50']:>10}{stats['latency']['p99']:>10}"
+                f"{stats['queue']['p50']:>10}{stats['queue']['p99']:>10}"
+                f"{stats['service']['p50']:>10}{stats['service']['p99']:>10}"
+            )
+        if level["lanes"]:
+            for name, lane in level["lanes"].items():
+                if name != "admission":
+                    print(
+                        f"  通道 {name}: 等待 P50 {lane['wait_seconds_p50']}s / P95 {lane['wait_seconds_p95']}s，"
+                        f"执行 P50 {lane['service_seconds_p50']}s / P95 {lane['service_seconds_p95']}s"
+                    )
+        if level["sample_failure"]:
+            print(f"  失败示例: {level['sample_failure']}")
+        print("-" * 96)
+    if breakdown["breakdown_users"] is None:
+        print(f"在测试范围内未出现延迟失控，最高测试并发 {breakdown['capacity_users']} 名用户")
+    else:
+        print(f"并发 {breakdown['breakdown_users']} 名用户时延迟失控：{breakdown['reason']}")
+        print(f"可承载并发用户数：{breakdown['capacity_users'] or '不足最低测试水平'}")
+    print("=" * 96)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="界面容量测试")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://127.0.0.1:7860", help="服务地址")
+    target.add_argument("--stub", action="store_true", help="在本进程内以模拟后端启动应用并对其施压")
+    parser.add_argument("--users", default="1,2,4,8,16", help="逗号分隔的并发用户数，依次测试")
+    parser.add_argument("--sessions", type=int, default=1, help="每名用户在每个水平连续完成的会话数")
+    parser.add_argument("--think", type=float, default=1.0, help="两步操作之间的平均停顿（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（图片、格式风格与追问的选择）")
+    parser.add_argument("--breakdown-factor", type=float, default=3.0, help="P99 超过基线 P50 的倍数视为失控")
+    parser.add_argument("--max-failure-rate", type=float, default=0.05, help="失败比例超过该值视为失控")
+    parser.add_argument("--json", action="store_true", help="以JSON输出")
+    args = parser.parse_args(argv)
+
+    base_url = start_stub_app() if args.stub else args.url
+    user_levels = [int(value) for value in args.users.split(",") if value.strip()]
+
+    levels = []
+    with tempfile.TemporaryDirectory(prefix="capacity-") as image_dir:
+        for users in user_levels:
+            if not args.json:
+                print(f"正在以 {users} 名并发用户测试...")
+            levels.append(run_level(base_url, users, args.sessions, args.think, args.seed, Path(image_dir)))
+    breakdown = find_breakdown(levels, args.breakdown_factor, args.max_failure_rate)
+
+    if args.json:
+        print(json.dumps({"levels": levels, "breakdown": breakdown}, ensure_ascii=False, indent=2))
+    else:
+        print_report(levels, breakdown)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
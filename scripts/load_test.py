@@ -0,0 +1,189 @@
+"""
+负载测试脚本 - Load Generator
+模拟大量用户同时调用推理接口，统计受理/拒绝情况与延迟，
+用于验证准入控制在突发流量下能立即返回排队提示而不是一直挂起
+
+每个模拟用户使用不同的 X-Forwarded-For，相当于经分享链接访问的不同客户端；
+对 --url 指定的服务施压时，该服务需以 ADMISSION_TRUST_FORWARDED_FOR=1 启动。
+
+用法：
+    python scripts/load_test.py --stub --clients 100
+    python scripts/load_test.py --url http://127.0.0.1:7860 --clients 50 --requests 3 --json
+"""
+import argparse
+import io
+import json
+import math
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# 模拟用户以 X-Forwarded-For 区分，--stub 在本进程内启动的服务需信任该头
+os.environ.setdefault("ADMISSION_TRUST_FORWARDED_FOR", "1")
+
+from config.config import API_PREFIX, DEFAULT_FORMAT
+
+# 单个请求的超时（秒）：准入控制生效时被拒绝的请求应远早于此返回
+REQUEST_TIMEOUT = 600
+
+
+def synthetic_image(size: int = 512) -> bytes:
+    """生成一张渐变测试图（JPEG字节）"""
+    image = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def start_stub_server() -> str:
+    """在后台线程中启动只含推理接口的服务（模拟后端），返回其地址"""
+    import uvicorn
+    from fastapi import FastAPI
+
+    from src.api import create_api_router
+    from src.models.stub_backend import StubModelManager
+
+    app = FastAPI()
+    app.include_router(create_api_router(StubModelManager()))
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def run_client(
+    base_url: str,
+    client_id: int,
+    image: bytes,
+    format_choice: str,
+    requests: int,
+    interval: float,
+    results: List[Dict[str, Any]],
+) -> None:
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "X-Forwarded-For": f"10.{client_id // 65536 % 256}.{client_id // 256 % 256}.{client_id % 256}",
+    }
+    with httpx.Client(base_url=base_url, timeout=REQUEST_TIMEOUT) as http:
+        for _ in range(requests):
+            started = time.perf_counter()
+            try:
+                response = http.post(
+                    f"{API_PREFIX}/poems", content=image, headers=headers, params={"format": format_choice}
+                )
+                status = response.status_code
+                detail = response.json().get("detail") if status != 200 else None
+            except httpx.HTTPError as exc:
+                status, detail = "error", str(exc)
+            results.append({
+                "client": client_id,
+                "status": status,
+                "detail": detail,
+                "seconds": time.perf_counter() - started,
+            })
+            if interval:
+                time.sleep(interval)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    accepted = [r["seconds"] for r in results if r["status"] == 200]
+    rejected = [r for r in results if r["status"] in (429, 503)]
+    reasons = Counter(
+        r["detail"]["reason"] if isinstance(r["detail"], dict) else "other" for r in rejected
+    )
+    messages = [r["detail"]["message"] for r in rejected if isinstance(r["detail"], dict)]
+    return {
+        "requests": len(results),
+        "elapsed_seconds": round(elapsed, 2),
+        "status": {str(k): v for k, v in Counter(r["status"] for r in results).items()},
+        "rejection_reasons": dict(reasons),
+        "accepted_seconds_p50": round(percentile(accepted, 50), 3),
+        "accepted_seconds_p95": round(percentile(accepted, 95), 3),
+        "rejected_seconds_p95": round(percentile([r["seconds"] for r in rejected], 95), 3),
+        "sample_rejection": messages[0] if messages else None,
+    }
+
+
+def print_report(summary: Dict[str, Any], server_stats: Optional[Dict[str, Any]]) -> None:
+    print("=" * 60)
+    print(f"请求总数: {summary['requests']}    总耗时: {summary['elapsed_seconds']}s")
+    print(f"状态码分布: {summary['status']}")
+    print(f"拒绝原因: {summary['rejection_reasons'] or '无'}")
+    print(f"受理请求延迟: P50 {summary['accepted_seconds_p50']}s / P95 {summary['accepted_seconds_p95']}s")
+    print(f"拒绝请求延迟: P95 {summary['rejected_seconds_p95']}s")
+    if summary["sample_rejection"]:
+        print(f"拒绝提示示例: {summary['sample_rejection']}")
+    if server_stats:
+        print(f"服务端准入统计: {server_stats.get('admission')}")
+    print("=" * 60)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="推理接口负载测试")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://127.0.0.1:7860", help="服务地址")
+    target.add_argument("--stub", action="store_true", help="在本进程内启动模拟后端服务并对其施压")
+    parser.add_argument("--clients", type=int, default=100, help="同时访问的模拟用户数")
+    parser.add_argument("--requests", type=int, default=1, help="每个用户连续发送的请求数")
+    parser.add_argument("--interval", type=float, default=0.0, help="同一用户两次请求的间隔（秒）")
+    parser.add_argument("--image", type=Path, help="上传的图片（默认使用合成测试图）")
+    parser.add_argument("--format", default=DEFAULT_FORMAT, help="诗词格式")
+    parser.add_argument("--json", action="store_true", help="以JSON输出")
+    args = parser.parse_args(argv)
+
+    base_url = start_stub_server() if args.stub else args.url
+    image = args.image.read_bytes() if args.image else synthetic_image()
+
+    results: List[Dict[str, Any]] = []
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(base_url, i, image, args.format, args.requests, args.interval, results),
+        )
+        for i in range(args.clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = summarize(results, time.perf_counter() - started)
+
+    try:
+        server_stats = httpx.get(f"{base_url}{API_PREFIX}/lanes", timeout=10).json()
+    except httpx.HTTPError:
+        server_stats = None
+
+    if args.json:
+        print(json.dumps({"summary": summary, "server": server_stats}, ensure_ascii=False, indent=2))
+    else:
+        print_report(summary, server_stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+按设备分片脚本 - Shard Checkpoint
+按本机的设备映射加载一次模型，再把各设备上的参数分别写成一个 safetensors 文件，
+并复制配置、分词器等文件。把 MODEL_PATH 指向输出目录后，启动时各设备的分片
+由多个线程并行内存映射加载，跳过设备映射的计算与参数的跨设备搬运。
+
+设备数量或显存变化后需要重新分片（加载时检查所需设备是否存在）。
+
+用法：
+    python scripts/shard_checkpoint.py --output /data/llms/Qwen3-VL-8B-sharded
+    python scripts/shard_checkpoint.py --model /path/to/model --output /path/to/sharded --device-map cpu
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import torch
+from transformers import AutoModelForImageTextToText
+
+from config.config import DEVICE_MAP, MODEL_DTYPE, MODEL_PATH, TRUST_REMOTE_CODE
+from src.models.fast_load import is_sharded_checkpoint, write_sharded_checkpoint
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="把模型按设备写成分片目录，加快冷启动")
+    parser.add_argument("--model", default=MODEL_PATH, help="源模型目录")
+    parser.add_argument("--output", type=Path, required=True, help="分片目录")
+    parser.add_argument("--device-map", default=DEVICE_MAP, help='设备映射（"auto"、"cpu"，或JSON）')
+    args = parser.parse_args()
+
+    if is_sharded_checkpoint(args.model):
+        print(f"{args.model} 已是分片目录")
+        sys.exit(1)
+    device_map = json.loads(args.device_map) if args.device_map.startswith("{") else args.device_map
+
+    start = time.perf_counter()
+    print(f"正在加载模型：{args.model}（device_map={args.device_map}）")
+    model = AutoModelForImageTextToText.from_pretrained(
+        args.model,
+        torch_dtype=getattr(torch, MODEL_DTYPE),
+        device_map=device_map,
+        trust_remote_code=TRUST_REMOTE_CODE,
+    )
+    if "disk" in set(str(device) for device in (getattr(model, "hf_device_map", None) or {}).values()):
+        print("设备映射包含 disk 卸载，无法分片，请增加 max_memory 或改用 cpu")
+        sys.exit(1)
+
+    index = write_sharded_checkpoint(model, args.model, str(args.output))
+    print(f"✓ 已写出 {len(index['shards'])} 个分片到 {args.output}，耗时 {time.perf_counter() - start:.1f}s")
+    for device, filename in index["shards"].items():
+        size = (args.output / filename).stat().st_size
+        print(f"  - {device}: {filename}（{size / 1024 ** 3:.2f}GB）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+用量日志汇总脚本 - Usage Summarizer
+离线读取滚动的用量日志（JSONL），按格式/风格统计token与显存，
+并给出每种格式的 max_new_tokens 建议值
+
+用法：
+    python scripts/summarize_usage.py
+    python scripts/summarize_usage.py --log logs/usage.jsonl --by format --json
+"""
+import argparse
+import json
+import math
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.config import USAGE_LOG_PATH, MAX_TOKENS_MIN, MAX_TOKENS_MAX
+
+# 建议 max_new_tokens 时，在 p99 生成长度之上预留的余量
+TOKEN_HEADROOM = 1.25
+
+
+def iter_log_files(log_path: Path) -> List[Path]:
+    """按时间顺序（旧→新）列出滚动日志文件"""
+    rotated = sorted(
+        (p for p in log_path.parent.glob(f"{log_path.name}.*") if p.suffix[1:].isdigit()),
+        key=lambda p: int(p.suffix[1:]),
+        reverse=True,
+    )
+    return rotated + ([log_path] if log_path.exists() else [])
+
+
+def iter_records(files: List[Path]) -> Iterator[Dict[str, Any]]:
+    for path in files:
+        with path.open(encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return float(ordered[index])
+
+
+def group_key(record: Dict[str, Any], by: str) -> str:
+    format_name = record.get("format") or "未指定"
+    style_name = record.get("style") or "未指定"
+    if by == "format":
+        return format_name
+    if by == "style":
+        return style_name
+    return f"{format_name}|{style_name}"
+
+
+def summarize(records: Iterator[Dict[str, Any]], by: str) -> Dict[str, Dict[str, Any]]:
+    groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        groups[group_key(record, by)].append(record)
+
+    summary: Dict[str, Dict[str, Any]] = {}
+    for key, items in sorted(groups.items()):
+        generated = [float(r.get("generated_tokens") or 0) for r in items]
+        prompt = [float(r.get("prompt_tokens") or 0) for r in items]
+        image = [float(r.get("image_tokens") or 0) for r in items]
+        budget = [float(r["vision_max_pixels"]) for r in items if r.get("vision_max_pixels")]
+        speed = [float(r.get("tokens_per_second") or 0) for r in items]
+        latency = [float(r.get("latency_seconds") or 0) for r in items]
+        memory = [float(r["peak_memory_mb"]) for r in items if r.get("peak_memory_mb")]
+        suggested = math.ceil(percentile(generated, 99) * TOKEN_HEADROOM)
+
+        summary[key] = {
+            "requests": len(items),
+            "avg_prompt_tokens": round(sum(prompt) / len(items), 1),
+            "avg_image_tokens": round(sum(image) / len(items), 1),
+            "avg_vision_max_pixels": round(sum(budget) / len(budget)) if budget else None,
+            "avg_generated_tokens": round(sum(generated) / len(items), 1),
+            "p50_generated_tokens": percentile(generated, 50),
+            "p99_generated_tokens": percentile(generated, 99),
+            "avg_tokens_per_second": round(sum(speed) / len(items), 2),
+            "p95_latency_seconds": percentile(latency, 95),
+            "peak_memory_mb": max(memory) if memory else None,
+            "suggested_max_tokens": min(MAX_TOKENS_MAX, max(MAX_TOKENS_MIN, suggested)),
+        }
+    return summary
+
+
+def print_table(summary: Dict[str, Dict[str, Any]]) -> None:
+    header = (
+        f"{'分组':<24}{'请求数':>8}{'平均输入':>10}{'平均图像':>10}{'视觉预算K':>10}"
+        f"{'平均生成':>10}{'P99生成':>10}{'tok/s':>10}{'P95耗时':>10}"
+        f"{'显存峰值MB':>12}{'建议max_tokens':>16}"
+    )
+    print(header)
+    print("-" * len(header))
+    for key, row in summary.items():
+        memory = f"{row['peak_memory_mb']:.0f}" if row["peak_memory_mb"] else "-"
+        budget = f"{row['avg_vision_max_pixels'] / 1000:.0f}" if row["avg_vision_max_pixels"] else "-"
+        print(
+            f"{key:<24}{row['requests']:>8}{row['avg_prompt_tokens']:>10}"
+            f"{row['avg_image_tokens']:>10}{budget:>10}{row['avg_generated_tokens']:>10}"
+            f"{row['p99_generated_tokens']:>10.0f}{row['avg_tokens_per_second']:>10}"
+            f"{row['p95_latency_seconds']:>10.2f}{memory:>12}{row['suggested_max_tokens']:>16}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="汇总诗词生成用量日志")
+    parser.add_argument("--log", type=Path, default=USAGE_LOG_PATH, help="用量日志路径")
+    parser.add_argument(
+        "--by",
+        choices=["format", "style", "format_style"],
+        default="format_style",
+        help="聚合维度",
+    )
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args()
+
+    files = iter_log_files(args.log)
+    if not files:
+        print(f"未找到用量日志：{args.log}")
+        sys.exit(1)
+
+    summary = summarize(iter_records(files), args.by)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print_table(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+推理接口模块 - Inference API
+与Gradio界面共用同一服务器的轻量JSON/SSE接口，供移动端等程序化调用
+"""
+import json
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from PIL import Image
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.config import (
+    API_PREFIX,
+    DEFAULT_FORMAT,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_TOP_P,
+    DEFAULT_TEMPERATURE,
+    MAX_TOKENS_MIN,
+    MAX_TOKENS_MAX,
+    TOP_P_MIN,
+    TOP_P_MAX,
+    TEMPERATURE_MIN,
+    TEMPERATURE_MAX,
+    UPLOAD_MAX_BYTES,
+    MODEL_REGISTRY,
+    DEFAULT_MODEL,
+)
+from src.serving.admission import AdmissionRejected, client_key, get_admission_controller
+from src.serving.cancellation import new_generation_token
+from src.serving.sessions import get_session_store
+from src.serving.lanes import ANALYSIS_LANE, GENERATION_LANE, get_lanes
+from src.serving.scheduler import JobCostEstimator
+from src.serving.degradation import DegradationPlan, get_degradation_controller
+from src.models.model_manager import get_fallback_manager
+from src.utils.image_processor import ImageValidationError, analyze_image_profile, check_image_info, probe_image
+from src.utils.image_store import get_image_store
+from src.utils.prompt_builder import build_messages, validate_inputs
+
+
+def check_upload(data: bytes) -> None:
+    """
+    只解析文件头校验上传的图片（不解码像素）
+
+    在准入检查之前调用，空请求体或无效图片不消耗客户端的频率配额。
+
+    Raises:
+        HTTPException: 请求体为空，或图片无法识别/未通过校验
+    """
+    if not data:
+        raise HTTPException(status_code=400, detail="请求体为空，请以原始字节上传图片。")
+    try:
+        check_image_info(probe_image(data))
+    except ImageValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def decode_upload(data: bytes) -> Tuple[str, Image.Image]:
+    """
+    将请求体中的原始图片字节存入图片库并取出RGB图像
+
+    先只解析文件头校验尺寸、格式与预估内存，通过后才存入；
+    同一图片再次上传时直接复用已缓存的像素。
+
+    Returns:
+        (图片摘要, RGB图像)
+
+    Raises:
+        HTTPException: 请求体为空，或图片无法识别/未通过校验
+    """
+    if not data:
+        raise HTTPException(status_code=400, detail="请求体为空，请以原始字节上传图片。")
+    store = get_image_store()
+    try:
+        return store.load(data)
+    except ImageValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+async def read_body(request: Request) -> bytes:
+    """
+    读取原始请求体（图片字节）
+
+    声明的 Content-Length 超过上限时直接拒绝；未声明长度时边读边计数。
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="图片文件过大。")
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="图片文件过大。")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _prepare_request(
+    digest: str,
+    image: Image.Image,
+    format_choice: str,
+    style_choice: Optional[str],
+    instruction: str,
+) -> Dict[str, Any]:
+    profile = analyze_image_profile(image)
+    style = style_choice or profile["style"]
+    valid, message = validate_inputs(format_choice, style)
+    if not valid:
+        raise HTTPException(status_code=422, detail=message)
+    return {
+        "digest": digest,
+        "profile": profile,
+        "format": format_choice,
+        "style": style,
+        "messages": build_messages(image, format_choice, style, instruction, []),
+    }
+
+
+def admission_error(exc: AdmissionRejected) -> HTTPException:
+    """频率超限返回429，排队已满或等待过长返回503，均附带 Retry-After"""
+    status_code = 429 if exc.reason == "rate_limited" else 503
+    return HTTPException(
+        status_code=status_code,
+        detail={"message": str(exc), "reason": exc.reason, "retry_after": round(exc.retry_after, 1)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
+def _sse_event(event: str, payload: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def create_api_router(model_manager) -> APIRouter:
+    """
+    创建推理接口路由
+
+    接口：
+    - POST {API_PREFIX}/poems：请求体为原始图片字节，返回JSON
+    - POST {API_PREFIX}/poems/stream：同上，以SSE逐段返回生成内容
+    - GET  {API_PREFIX}/health：健康检查
+    - GET  {API_PREFIX}/models：可选模型及其加载状态（生成接口以 ?model= 选择）
+    - GET  {API_PREFIX}/lanes：各并发通道的排队与耗时统计，准入控制计数与降级档位切换
+    - GET  {API_PREFIX}/debug/sessions：界面会话的内存占用、淘汰与回收统计
+    - GET  {API_PREFIX}/debug/images：图片库的磁盘占用、像素缓存命中与回收统计
+
+    图片解码与分析走分析通道，模型生成走生成通道，与界面事件共用限流；
+    生成前经过准入控制，未受理的请求立即返回429/503与预计排队时间。
+    生成超过 GENERATION_DEADLINE_SECONDS 时返回已生成的部分（stop_reason 为 "deadline"），
+    流式连接断开时在下一个解码步停止生成。
+    高负载时按降级档位调整生成参数或改用备用模型，响应的 degradation 字段为所用档位。
+
+    Args:
+        model_manager: 模型管理器实例
+
+    Returns:
+        可挂载到Gradio服务器的FastAPI路由
+    """
+    router = APIRouter(prefix=API_PREFIX)
+    lanes = get_lanes(model_manager)
+    analysis_lane = lanes[ANALYSIS_LANE]
+    generation_lane = lanes[GENERATION_LANE]
+    admission = get_admission_controller(generation_lane)
+    usage_tracker = getattr(model_manager, "usage_tracker", None)
+    estimator = JobCostEstimator(usage_tracker)
+    degradation = get_degradation_controller(get_fallback_manager(usage_tracker), usage_tracker)
+
+    def admit(http_request: Request, cost: float) -> float:
+        """准入检查，返回预计排队时间（秒）"""
+        client = client_key(http_request.client.host if http_request.client else None, http_request.headers)
+        try:
+            return admission.admit(client, cost)
+        except AdmissionRejected as exc:
+            raise admission_error(exc) from exc
+
+    def prepare(body: bytes, format_choice: str, style_choice: Optional[str], instruction: str) -> Dict[str, Any]:
+        with analysis_lane.slot():
+            return _prepare_request(*decode_upload(body), format_choice, style_choice, instruction)
+
+    model_names = getattr(model_manager, "model_names", [])
+
+    def degrade(format_choice: str, sampling: Dict[str, Any]) -> Tuple[DegradationPlan, Dict[str, Any], Any]:
+        """选择降级档位，返回 (档位, 调整后的生成参数, 推理后端)；接口请求不带对话历史"""
+        plan = degradation.plan(format_choice, sampling["max_new_tokens"])
+        sampling = {**sampling, "max_new_tokens": plan.max_new_tokens, "do_sample": plan.do_sample}
+        backend = degradation.backend_for(plan, model_manager)
+        model = sampling.pop("model")
+        # 降级到备用模型时不再指定注册表中的模型
+        if model and backend is model_manager:
+            sampling["model"] = model
+        return plan, sampling, backend
+
+    def served_model(sampling: Dict[str, Any], backend: Any) -> Optional[str]:
+        """实际生成所用的模型：注册表中的模型名，或备用/单一模型的路径"""
+        if backend is model_manager and model_names:
+            return sampling.get("model") or DEFAULT_MODEL
+        return getattr(backend, "model_path", None)
+
+    def sampling_params(
+        max_new_tokens: int = Query(DEFAULT_MAX_TOKENS, ge=MAX_TOKENS_MIN, le=MAX_TOKENS_MAX),
+        top_p: float = Query(DEFAULT_TOP_P, ge=TOP_P_MIN, le=TOP_P_MAX),
+        temperature: float = Query(DEFAULT_TEMPERATURE, ge=TEMPERATURE_MIN, le=TEMPERATURE_MAX),
+        seed: Optional[int] = Query(None),
+        model: Optional[str] = Query(None),
+    ) -> Dict[str, Any]:
+        if model is not None and model not in model_names:
+            raise HTTPException(
+                status_code=422,
+                detail=f"未知模型：{model}，可选：{'、'.join(model_names) or '（仅默认模型）'}",
+            )
+        return {
+            "max_new_tokens": max_new_tokens,
+            "top_p": top_p,
+            "temperature": temperature,
+            "seed": seed,
+            "model": model,
+        }
+
+    @router.get("/health")
+    def health() -> Dict[str, Any]:
+        payload = {"status": "ok", "model_loaded": getattr(model_manager, "is_loaded", True)}
+        if hasattr(model_manager, "health"):
+            payload["replicas"] = model_manager.health()
+        return payload
+
+    @router.get("/lanes")
+    def lane_stats() -> Dict[str, Any]:
+        payload = {name: lane.stats() for name, lane in lanes.items()}
+        payload["admission"] = admission.stats()
+        payload["degradation"] = degradation.stats()
+        return payload
+
+    @router.get("/models")
+    def list_models() -> Dict[str, Any]:
+        # 模型注册表返回各模型的加载状态与内存占用；推理进程中的注册表只列出名称
+        if hasattr(model_manager, "stats") and model_names:
+            return model_manager.stats()
+        return {
+            "default": DEFAULT_MODEL if DEFAULT_MODEL in model_names else getattr(model_manager, "model_path", None),
+            "models": [{"name": name, "label": MODEL_REGISTRY[name].get("label", name)} for name in model_names],
+        }
+
+    @router.get("/debug/sessions")
+    def session_stats() -> Dict[str, Any]:
+        return get_session_store().stats()
+
+    @router.get("/debug/images")
+    def image_store_stats() -> Dict[str, Any]:
+        return get_image_store().stats()
+
+    # 同步函数由FastAPI在线程池中执行，不阻塞事件循环
+    @router.post("/poems")
+    def create_poem(
+        http_request: Request,
+        body: bytes = Depends(read_body),
+        format_choice: str = Query(DEFAULT_FORMAT, alias="format"),
+        style_choice: Optional[str] = Query(None, alias="style"),
+        instruction: str = Query(""),
+        sampling: Dict[str, Any] = Depends(sampling_params),
+    ) -> Dict[str, Any]:
+        # 先校验文件头再做准入检查：无效图片不消耗频率配额，未受理的请求不占用图片解码与分析
+        check_upload(body)
+        # 准入按请求的生成长度估算；降级档位在受理后才选择，被拒绝的请求不计入降级统计
+        cost = estimator.estimate(format_choice, [], sampling["max_new_tokens"])
+        token = new_generation_token()
+        admit(http_request, cost)
+        plan, sampling, backend = degrade(format_choice, sampling)
+        request = prepare(body, format_choice, style_choice, instruction)
+        try:
+            with generation_lane.slot(cost):
+                poem, usage = backend.generate(
+                    messages=request["messages"],
+                    format_choice=request["format"],
+                    style_choice=request["style"],
+                    cancel_token=token,
+                    **sampling,
+                )
+        except RuntimeError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        return {
+            "poem": poem,
+            "image_digest": request["digest"],
+            "format": request["format"],
+            "style": request["style"],
+            "profile": request["profile"],
+            "model": served_model(sampling, backend),
+            "stop_reason": usage.get("stop_reason"),
+            "degradation": plan.as_dict(),
+            "usage": usage,
+        }
+
+    @router.post("/poems/stream")
+    def stream_poem(
+        http_request: Request,
+        body: bytes = Depends(read_body),
+        format_choice: str = Query(DEFAULT_FORMAT, alias="format"),
+        style_choice: Optional[str] = Query(None, alias="style"),
+        instruction: str = Query(""),
+        sampling: Dict[str, Any] = Depends(sampling_params),
+    ) -> StreamingResponse:
+        # 在解码图片与开始流式响应之前做准入检查：未受理的请求不占用分析通道，且仍能返回正常的HTTP状态码；
+        # 文件头校验在准入之前，无效图片不消耗频率配额；降级档位在受理后才选择
+        check_upload(body)
+        cost = estimator.estimate(format_choice, [], sampling["max_new_tokens"])
+        token = new_generation_token()
+        wait = admit(http_request, cost)
+        plan, sampling, backend = degrade(format_choice, sampling)
+        request = prepare(body, format_choice, style_choice, instruction)
+
+        def generation_events() -> Iterator[str]:
+            with generation_lane.slot(cost):
+                try:
+                    for chunk in backend.generate_stream(
+                        messages=request["messages"],
+                        format_choice=request["format"],
+                        style_choice=request["style"],
+                        cancel_token=token,
+                        **sampling,
+                    ):
+                        if chunk["type"] == "delta":
+                            yield _sse_event("delta", {"text": chunk["text"]})
+                        else:
+                            yield _sse_event("done", {
+                                "poem": chunk["text"],
+                                "stop_reason": chunk["usage"].get("stop_reason"),
+                                "model": served_model(sampling, backend),
+                                "degradation": plan.as_dict(),
+                                "usage": chunk["usage"],
+                            })
+                except RuntimeError as exc:
+                    yield _sse_event("error", {"detail": str(exc)})
+                except GeneratorExit:
+                    # 连接断开时响应生成器被关闭，取消令牌使后端在下一个解码步停止
+                    token.cancel()
+                    raise
+
+        def events() -> Iterator[str]:
+            # 分析结果先行返回，排队等待生成通道期间客户端即可展示
+            yield _sse_event("profile", {
+                "image_digest": request["digest"],
+                "format": request["format"],
+                "style": request["style"],
+                "profile": request["profile"],
+                "estimated_wait_seconds": round(wait, 1),
+                "degradation": plan.as_dict(),
+            })
+            yield from generation_events()
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    return router
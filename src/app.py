@@ -2,7 +2,6 @@
 主应用模块 - Application
 构建Gradio Web应用界面
 """
-import functools
 import gradio as gr
 
 import sys
@@ -16,30 +15,43 @@ from config.config import (
     DEFAULT_MAX_TOKENS,
     DEFAULT_TOP_P,
     DEFAULT_TEMPERATURE,
+    DEFAULT_SEED,
     IMAGE_UPLOAD_HEIGHT,
+    ADMISSION_HEADROOM_SLOTS,
     CHATBOT_HEIGHT,
     POEM_OUTPUT_LINES,
     FOLLOW_UP_SUGGESTIONS,
+    MODEL_REGISTRY,
+    DEFAULT_MODEL,
 )
 from src.constants.templates import FORMAT_GUIDE, STYLE_GUIDE
 from src.ui.styles import CUSTOM_CSS
+from src.ui.assets import asset_head_tags, load_manifest
+from src.ui.scripts import build_apply_suggestion_js, build_lookup_js
+from src.ui.upload import UploadedGallery
 from src.ui.components import (
     create_hero_section,
     create_footer_section,
     handle_image_upload,
     chat_with_image,
+    merge_uploads,
     reset_conversation,
     render_recent_creations,
 )
 from src.utils.prompt_builder import (
     format_prompt_preview,
     style_prompt_preview,
-    apply_suggestion,
 )
-from src.models.model_manager import get_model_manager
+from src.models.model_manager import get_fallback_manager, get_model_manager
+from src.serving.admission import AdmissionRejected, client_key, get_admission_controller
+from src.serving.cancellation import get_cancellation_registry, new_generation_token
+from src.serving.sessions import get_session_store
+from src.serving.lanes import ANALYSIS_LANE, GENERATION_LANE, get_lanes
+from src.serving.scheduler import JobCostEstimator
+from src.serving.degradation import get_degradation_controller
 
 
-def create_gradio_app() -> gr.Blocks:
+def create_gradio_app(model_manager=None) -> gr.Blocks:
     """
     创建Gradio应用界面
     
@@ -50,16 +62,73 @@ def create_gradio_app() -> gr.Blocks:
     - 诗词生成与优化
     - 创作历史记录
     
+    Args:
+        model_manager: 推理后端（默认使用全局模型管理器；
+            启用推理进程时传入 WorkerPool）
+    
     Returns:
         Gradio Blocks应用实例
     """
     # 获取模型管理器
-    model_manager = get_model_manager()
+    model_manager = model_manager or get_model_manager()
+    
+    # 分析与生成事件分属两个并发通道，上传图片不必排在他人的生成之后
+    lanes = get_lanes(model_manager)
+    analysis_lane = lanes[ANALYSIS_LANE]
+    generation_lane = lanes[GENERATION_LANE]
+    admission = get_admission_controller(generation_lane)
+    cancellations = get_cancellation_registry()
+    sessions = get_session_store()
+    usage_tracker = getattr(model_manager, "usage_tracker", None)
+    estimator = JobCostEstimator(usage_tracker)
+    degradation = get_degradation_controller(get_fallback_manager(usage_tracker), usage_tracker)
+    # 后端为模型注册表时提供模型选项
+    model_names = getattr(model_manager, "model_names", [])
+    
+    def generate(
+        image, format_choice, style_choice, instruction, max_new_tokens,
+        top_p, temperature, seed, model_choice, clip, request: gr.Request,
+    ):
+        # 对话历史与创作记录按会话存放在服务端，不再经由 gr.State 传递
+        session = sessions.get(request.session_hash)
+        # 超出排队上限或请求过于频繁时立即提示预计排队时间，而不是一直等待；
+        # 准入按请求的参数估算，降级档位在受理后才选择，被拒绝的请求不计入降级统计
+        cost = estimator.estimate(format_choice, session.history_turns(), max_new_tokens)
+        client = client_key(getattr(request.client, "host", None), request.headers)
+        # 清除对话或关闭页面时取消该会话的生成；截止时间自受理起计
+        token = new_generation_token()
+        try:
+            with cancellations.track(request.session_hash, token), admission.enter(client, cost):
+                # 按当前排队深度选择降级档位
+                plan = degradation.plan(format_choice, max_new_tokens)
+                backend = degradation.backend_for(plan, model_manager)
+                return chat_with_image(
+                    merge_uploads(image, clip), format_choice, style_choice, instruction, max_new_tokens,
+                    top_p, temperature, seed, session, backend, token, plan,
+                    # 降级到备用模型时不再指定注册表中的模型
+                    model_choice if backend is model_manager else None,
+                )
+        except AdmissionRejected as exc:
+            raise gr.Error(str(exc)) from exc
+    
+    def analyze(image, clip):
+        return handle_image_upload(merge_uploads(image, clip))
+    
+    def cancel_generation(request: gr.Request):
+        cancellations.cancel(request.session_hash)
+    
+    def close_session(request: gr.Request):
+        cancellations.cancel(request.session_hash)
+        sessions.drop(request.session_hash)
+    
+    # 已构建静态资源时引用压缩后的样式文件，否则内联样式
+    manifest = load_manifest()
     
     with gr.Blocks(
         title=APP_TITLE,
         theme=gr.themes.Soft(),
-        css=CUSTOM_CSS
+        css=None if manifest else CUSTOM_CSS,
+        head=asset_head_tags(manifest) if manifest else None,
     ) as demo:
         
         create_hero_section()
@@ -72,11 +141,23 @@ def create_gradio_app() -> gr.Blocks:
                     with gr.Row():
                         # 图片上传区
                         with gr.Column(scale=7, elem_classes="image-frame"):
-                            image_input = gr.Image(
-                                type="numpy",
+                            # 原始文件直接交给图片库，由其校验文件头并缓存解码结果；
+                            # 可一次上传一组照片（如旅途组图），合写成一首
+                            image_input = UploadedGallery(
                                 label=None,
                                 height=IMAGE_UPLOAD_HEIGHT,
+                                columns=3,
+                                object_fit="cover",
+                                interactive=True,
                                 show_download_button=False,
+                                show_share_button=False,
+                            )
+                            # 短视频或动图：只取场景变化最大的几个关键帧参与分析与创作
+                            clip_input = gr.File(
+                                label="短视频 / 动图（可选）",
+                                file_count="single",
+                                file_types=["video", ".gif"],
+                                type="filepath",
                             )
                         
                         # AI分析显示区
@@ -138,6 +219,25 @@ def create_gradio_app() -> gr.Blocks:
                         elem_classes="card-hint"
                     )
                 
+                if model_names:
+                    with gr.Group(elem_classes="panel-card"):
+                        gr.Markdown("选择模型", elem_classes="section-title")
+                        gr.Markdown(
+                            "极速模型出诗更快，品质模型更讲究格律与意境；首次使用某个模型时需稍候加载。",
+                            elem_classes="section-subtitle"
+                        )
+                        model_selector = gr.Radio(
+                            choices=[
+                                (MODEL_REGISTRY.get(name, {}).get("label", name), name)
+                                for name in model_names
+                            ],
+                            value=DEFAULT_MODEL if DEFAULT_MODEL in model_names else model_names[0],
+                            label=None,
+                            elem_classes="card-radio",
+                        )
+                else:
+                    model_selector = gr.State(None)
+                
                 with gr.Group(elem_classes="panel-card"):
                     gr.Markdown("补充灵感", elem_classes="section-title")
                     prompt_box = gr.Textbox(
@@ -168,6 +268,7 @@ def create_gradio_app() -> gr.Blocks:
                         show_copy_button=True,
                         elem_classes="poem-output",
                     )
+                    cache_badge = gr.Markdown("", elem_classes="cache-badge")
                     
 
                     suggestion_group = gr.Group(
@@ -183,13 +284,13 @@ def create_gradio_app() -> gr.Blocks:
                             with gr.Row():
                                 for label, snippet in FOLLOW_UP_SUGGESTIONS[idx : idx + 3]:
                                     btn = gr.Button(label, size="sm")
+                                    # 在浏览器端拼接建议，不进入服务器队列
                                     btn.click(
-                                        functools.partial(
-                                            apply_suggestion,
-                                            snippet=snippet
-                                        ),
+                                        fn=None,
+                                        js=build_apply_suggestion_js(snippet),
                                         inputs=prompt_box,
                                         outputs=prompt_box,
+                                        show_progress="hidden",
                                     )
                     
                     # --- 操作按钮 ---
@@ -219,17 +320,16 @@ def create_gradio_app() -> gr.Blocks:
                         "<div class='recent-empty'>暂无创作记录。</div>"
                     )
 
-        history_state = gr.State([])  # 对话历史
-        recent_state = gr.State([])   # 创作记录
         max_tokens_state = gr.State(DEFAULT_MAX_TOKENS)
         top_p_state = gr.State(DEFAULT_TOP_P)
         temperature_state = gr.State(DEFAULT_TEMPERATURE)
+        seed_state = gr.State(DEFAULT_SEED)
         
 
         
         # 提交按钮 - 生成诗词
         submit_btn.click(
-            fn=lambda *args: chat_with_image(*args, model_manager),
+            fn=generate,
             inputs=[
                 image_input,
                 format_selector,
@@ -238,53 +338,73 @@ def create_gradio_app() -> gr.Blocks:
                 max_tokens_state,
                 top_p_state,
                 temperature_state,
-                history_state,
-                recent_state,
+                seed_state,
+                model_selector,
+                clip_input,
             ],
             outputs=[
                 chatbot,
                 prompt_box,
-                history_state,
                 poem_output,
+                cache_badge,
                 suggestion_group,
-                recent_state,
                 recent_panel,
             ],
+            api_name="generate",
+            concurrency_id=generation_lane.name,
+            # 额外的名额用于在通道排满时仍能立即执行准入检查并返回拒绝提示
+            concurrency_limit=generation_lane.gradio_limit + ADMISSION_HEADROOM_SLOTS,
         )
         
-        # 清除按钮 - 重置对话
+        # 清除按钮 - 先在队列之外立即取消该会话的生成（分析通道被视频解码等占满时也不等待），
+        # 再经分析通道重置对话
         clear_btn.click(
-            fn=reset_conversation,
-            inputs=[recent_state],
+            fn=cancel_generation,
+            inputs=None,
+            outputs=None,
+            queue=False,
+            show_progress="hidden",
+            api_name=False,
+        )
+        clear_btn.click(
+            fn=analysis_lane.wrap(reset_conversation),
+            inputs=None,
             outputs=[
                 chatbot,
                 prompt_box,
-                history_state,
                 poem_output,
+                cache_badge,
                 suggestion_group,
-                recent_state,
                 recent_panel,
             ],
+            api_name="clear",
+            concurrency_id=analysis_lane.name,
+            concurrency_limit=analysis_lane.gradio_limit,
         )
         
-        # 格式选择变化 - 更新提示
+        # 格式选择变化 - 更新提示（预览文本构建时预先计算，在浏览器端查表）
         format_selector.change(
-            fn=lambda choice: format_prompt_preview(choice),
+            fn=None,
+            js=build_lookup_js(format_prompt_preview, FORMAT_GUIDE.keys()),
             inputs=format_selector,
             outputs=format_hint,
+            show_progress="hidden",
         )
         
         # 风格选择变化 - 更新提示
         style_selector.change(
-            fn=lambda choice: style_prompt_preview(choice),
+            fn=None,
+            js=build_lookup_js(style_prompt_preview, STYLE_GUIDE.keys()),
             inputs=style_selector,
             outputs=style_hint,
+            show_progress="hidden",
         )
         
-        # 图片上传 - 分析并推荐
-        image_input.change(
-            fn=handle_image_upload,
-            inputs=image_input,
+        # 图片、视频上传 - 分析并推荐（组图与视频关键帧一起汇总）
+        gr.on(
+            triggers=[image_input.change, clip_input.change],
+            fn=analysis_lane.wrap(analyze),
+            inputs=[image_input, clip_input],
             outputs=[
                 style_selector,
                 style_hint,
@@ -293,8 +413,14 @@ def create_gradio_app() -> gr.Blocks:
                 mood_chip,
                 recommend_chip,
             ],
+            api_name="analyze",
+            concurrency_id=analysis_lane.name,
+            concurrency_limit=analysis_lane.gradio_limit,
         )
         
         create_footer_section()
+        
+        # 关闭或刷新页面 - 取消该会话进行中的生成并释放会话内存
+        demo.unload(close_session)
     
     return demo
\ No newline at end of file
@@ -0,0 +1,331 @@
+"""
+批量创作模块 - Batch Runner
+遍历图片目录，按格式×风格组合批量生成诗词并写入JSONL
+"""
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+from config.config import (
+    BATCH_SIZE,
+    BATCH_DECODE_WORKERS,
+    BATCH_MAX_IMAGE_SIDE,
+    BATCH_REPORT_INTERVAL,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_TOP_P,
+    DEFAULT_TEMPERATURE,
+)
+from src.constants.templates import FORMAT_GUIDE, STYLE_GUIDE
+from src.utils.image_processor import analyze_image_profile
+from src.utils.image_store import get_image_store
+from src.utils.prompt_builder import build_messages
+
+# 支持的图片扩展名
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+# 风格取值为该值时使用图像分析推荐的风格
+AUTO_STYLE = "auto"
+
+# 断点续跑时用于识别已完成任务的键：(图片相对路径, 格式, 风格)
+JobKey = Tuple[str, str, str]
+
+
+def discover_images(input_dir: Path) -> List[Path]:
+    """递归列出目录下的图片文件（按路径排序，保证多次运行顺序一致）"""
+    return sorted(
+        path for path in input_dir.rglob("*")
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def load_and_analyze(path: str) -> Dict[str, Any]:
+    """
+    把单张图片存入图片库、解码并分析（在子进程中执行）
+
+    像素写入图片库的缓存文件，主进程按摘要以内存映射读取，
+    不经进程间管道传递；再次运行同一相册时直接命中缓存，无需重新解码。
+
+    Args:
+        path: 图片路径
+
+    Returns:
+        包含图片摘要与分析结果的字典；失败时包含 error 字段
+    """
+    try:
+        store = get_image_store()
+        digest = store.put(path)
+        return {
+            "path": path,
+            "digest": digest,
+            "profile": analyze_image_profile(store.image(digest, max_side=BATCH_MAX_IMAGE_SIDE)),
+        }
+    except Exception as exc:  # 单张图片损坏不应中断整个批次
+        return {"path": path, "error": str(exc)}
+
+
+def load_checkpoint(output_path: Path) -> Set[JobKey]:
+    """读取已有输出文件，返回已完成的任务键集合"""
+    done: Set[JobKey] = set()
+    if not output_path.exists():
+        return done
+    with output_path.open(encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 上次中断时可能留下半行
+            if "poem" in record:
+                done.add((record["image"], record["format"], record["style_choice"]))
+    return done
+
+
+def iter_decoded(
+    paths: List[Path],
+    workers: int,
+) -> Iterator[Dict[str, Any]]:
+    """
+    在进程池中预取解码结果
+
+    在途任务数有上限，GPU生成期间子进程持续解码下一批图片，
+    同时避免一次性把整个相册的像素读入内存。
+    """
+    window = max(2, workers * 2)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Future] = deque()
+        path_iter = iter(paths)
+        for path in path_iter:
+            pending.append(executor.submit(load_and_analyze, str(path)))
+            if len(pending) >= window:
+                break
+        while pending:
+            yield pending.popleft().result()
+            next_path = next(path_iter, None)
+            if next_path is not None:
+                pending.append(executor.submit(load_and_analyze, str(next_path)))
+
+
+class BatchRunner:
+    """
+    批量创作执行器
+
+    同一格式的请求聚合成批次送入模型（生成长度相近，减少填充浪费），
+    每批完成后立即写入输出文件，支持中断后断点续跑。
+    一张图片的所有任务都写入输出后才计入已完成的图片数。
+    """
+
+    def __init__(
+        self,
+        model_manager,
+        batch_size: int = BATCH_SIZE,
+        max_new_tokens: int = DEFAULT_MAX_TOKENS,
+        top_p: float = DEFAULT_TOP_P,
+        temperature: float = DEFAULT_TEMPERATURE,
+        seed: Optional[int] = None,
+    ):
+        self.model_manager = model_manager
+        self.batch_size = batch_size
+        self.max_new_tokens = max_new_tokens
+        self.top_p = top_p
+        self.temperature = temperature
+        self.seed = seed
+        self._buckets: Dict[str, List[Dict[str, Any]]] = {}
+        # 图片 → 尚未写入输出的任务数
+        self._pending_jobs: Dict[str, int] = {}
+        self.images_done = 0
+        self.results_done = 0
+        self.generated_tokens = 0
+        self.failures = 0
+        self._start = time.perf_counter()
+
+    def submit(self, jobs: List[Dict[str, Any]], out_fh) -> None:
+        """提交一张图片的全部任务（先登记再入队，避免前几个任务写入后就计为完成）"""
+        for job in jobs:
+            image_key = job["record"]["image"]
+            self._pending_jobs[image_key] = self._pending_jobs.get(image_key, 0) + 1
+        for job in jobs:
+            bucket = self._buckets.setdefault(job["format"], [])
+            bucket.append(job)
+            if len(bucket) >= self.batch_size:
+                self._flush(job["format"], out_fh)
+
+    def flush_all(self, out_fh) -> None:
+        for format_choice in list(self._buckets):
+            self._flush(format_choice, out_fh)
+
+    def _flush(self, format_choice: str, out_fh) -> None:
+        jobs = self._buckets.pop(format_choice, [])
+        if not jobs:
+            return
+
+        conversations = [
+            build_messages(job["image"], job["format"], job["style"], job["instruction"], [])
+            for job in jobs
+        ]
+        try:
+            outputs = self.model_manager.generate_batch(
+                conversations,
+                max_new_tokens=self.max_new_tokens,
+                top_p=self.top_p,
+                temperature=self.temperature,
+                format_choices=[job["format"] for job in jobs],
+                style_choices=[job["style"] for job in jobs],
+                seed=self.seed,
+            )
+        except Exception as exc:  # 单个批次失败只记录错误，不中断整个运行
+            self.failures += len(jobs)
+            for job in jobs:
+                out_fh.write(json.dumps(
+                    {**job["record"], "error": str(exc)}, ensure_ascii=False
+                ) + "\n")
+            out_fh.flush()
+            self._complete(jobs)
+            return
+
+        for job, (poem, usage) in zip(jobs, outputs):
+            out_fh.write(json.dumps(
+                {**job["record"], "poem": poem, "usage": usage}, ensure_ascii=False
+            ) + "\n")
+            self.generated_tokens += int(usage.get("generated_tokens") or 0)
+        out_fh.flush()
+        os.fsync(out_fh.fileno())
+        self._complete(jobs)
+
+        previous = self.results_done
+        self.results_done += len(jobs)
+        if self.results_done // BATCH_REPORT_INTERVAL > previous // BATCH_REPORT_INTERVAL:
+            self.report()
+
+    def _complete(self, jobs: List[Dict[str, Any]]) -> None:
+        """任务已写入输出：图片的全部任务都写入后计入已完成的图片数"""
+        for job in jobs:
+            image_key = job["record"]["image"]
+            self._pending_jobs[image_key] -= 1
+            if not self._pending_jobs[image_key]:
+                del self._pending_jobs[image_key]
+                self.images_done += 1
+
+    def throughput(self) -> Dict[str, float]:
+        elapsed = max(time.perf_counter() - self._start, 1e-9)
+        return {
+            "elapsed_seconds": elapsed,
+            "images_per_second": self.images_done / elapsed,
+            "results_per_second": self.results_done / elapsed,
+            "tokens_per_second": self.generated_tokens / elapsed,
+        }
+
+    def report(self) -> None:
+        stats = self.throughput()
+        print(
+            f"  已完成 {self.results_done} 条（{self.images_done} 张图片）"
+            f" | {stats['images_per_second']:.2f} 张/s"
+            f" | {stats['tokens_per_second']:.1f} tokens/s"
+        )
+
+
+def run_batch(
+    model_manager,
+    input_dir: Path,
+    output_path: Path,
+    formats: List[str],
+    styles: List[str],
+    instruction: str = "",
+    batch_size: int = BATCH_SIZE,
+    workers: Optional[int] = BATCH_DECODE_WORKERS,
+    max_new_tokens: int = DEFAULT_MAX_TOKENS,
+    top_p: float = DEFAULT_TOP_P,
+    temperature: float = DEFAULT_TEMPERATURE,
+    seed: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+    对目录中的所有图片执行批量创作
+
+    Args:
+        model_manager: 已加载模型的管理器
+        input_dir: 图片目录（递归遍历）
+        output_path: 输出JSONL路径，已存在时跳过已完成的任务
+        formats: 诗词格式列表（FORMAT_GUIDE 的键）
+        styles: 风格列表（STYLE_GUIDE 的键，或 "auto" 使用推荐风格）
+        instruction: 统一的灵感提示
+        batch_size: 每批请求数
+        workers: 解码进程数
+        max_new_tokens: 最大生成token数
+        top_p: Top-p采样参数
+        temperature: 温度参数
+        seed: 随机种子
+
+    Returns:
+        吞吐统计（图片/秒、tokens/秒等）
+
+    Raises:
+        ValueError: 格式或风格无效
+    """
+    invalid_formats = [f for f in formats if f not in FORMAT_GUIDE]
+    invalid_styles = [s for s in styles if s != AUTO_STYLE and s not in STYLE_GUIDE]
+    if invalid_formats or invalid_styles:
+        raise ValueError(f"无效的格式或风格：{invalid_formats + invalid_styles}")
+
+    paths = discover_images(input_dir)
+    done = load_checkpoint(output_path)
+    workers = workers or os.cpu_count() or 1
+    print(f"共发现 {len(paths)} 张图片，已完成 {len(done)} 条结果，将跳过。")
+
+    def pending_jobs(rel_path: str) -> List[Tuple[str, str]]:
+        return [
+            (format_choice, style_choice)
+            for format_choice in formats
+            for style_choice in styles
+            if (rel_path, format_choice, style_choice) not in done
+        ]
+
+    # 已全部完成的图片无需再解码
+    todo = [p for p in paths if pending_jobs(str(p.relative_to(input_dir)))]
+
+    runner = BatchRunner(
+        model_manager,
+        batch_size=batch_size,
+        max_new_tokens=max_new_tokens,
+        top_p=top_p,
+        temperature=temperature,
+        seed=seed,
+    )
+    store = get_image_store()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("a", encoding="utf-8") as out_fh:
+        for decoded in iter_decoded(todo, workers):
+            rel_path = str(Path(decoded["path"]).relative_to(input_dir))
+            if "error" in decoded:
+                runner.failures += 1
+                print(f"  ⚠️ 跳过无法解码的图片 {rel_path}：{decoded['error']}")
+                continue
+
+            image = store.image(decoded["digest"], max_side=BATCH_MAX_IMAGE_SIDE)
+            profile = decoded["profile"]
+            jobs = []
+            for format_choice, style_choice in pending_jobs(rel_path):
+                style = profile["style"] if style_choice == AUTO_STYLE else style_choice
+                jobs.append({
+                    "image": image,
+                    "format": format_choice,
+                    "style": style,
+                    "instruction": instruction,
+                    "record": {
+                        "image": rel_path,
+                        "digest": decoded["digest"],
+                        "format": format_choice,
+                        "style_choice": style_choice,
+                        "style": style,
+                        "profile": profile,
+                    },
+                })
+            runner.submit(jobs, out_fh)
+        runner.flush_all(out_fh)
+
+    stats = runner.throughput()
+    stats["failures"] = runner.failures
+    return stats
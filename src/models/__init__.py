@@ -0,0 +1,46 @@
+"""模型管理模块"""
+from .model_manager import (
+    ModelManager,
+    create_model_manager,
+    get_model_manager,
+    initialize_model,
+    get_fallback_manager,
+    initialize_fallback_model,
+)
+from .usage import UsageTracker
+from .result_cache import ResultCache, build_cache_key, get_result_cache
+from .replica_pool import BackendFailure, ReplicaPool, create_replica_pool
+from .stub_backend import StubModelManager
+from .vision_budget import VisionBudget, VisionBudgetPolicy
+from .registry import ModelRegistry, create_model_registry
+from .adapters import AdapterCache, discover_style_adapters
+from .compiled_decode import CompiledDecoder
+from .fast_load import PhaseTimer, load_processor, load_sharded_checkpoint, write_sharded_checkpoint
+
+__all__ = [
+    "ModelManager",
+    "create_model_manager",
+    "get_model_manager",
+    "initialize_model",
+    "get_fallback_manager",
+    "initialize_fallback_model",
+    "UsageTracker",
+    "ResultCache",
+    "build_cache_key",
+    "get_result_cache",
+    "BackendFailure",
+    "ReplicaPool",
+    "create_replica_pool",
+    "StubModelManager",
+    "VisionBudget",
+    "VisionBudgetPolicy",
+    "ModelRegistry",
+    "create_model_registry",
+    "AdapterCache",
+    "discover_style_adapters",
+    "CompiledDecoder",
+    "PhaseTimer",
+    "load_processor",
+    "load_sharded_checkpoint",
+    "write_sharded_checkpoint",
+]
@@ -0,0 +1,140 @@
+"""
+风格适配器模块 - Style Adapters
+把各风格的LoRA适配器加载到同一个基座模型上，按请求的风格路由：
+一批请求各行通过 adapter_names 使用各自的适配器，在同一次前向中完成，
+无需逐个切换激活的适配器；驻留的适配器数有上限，超出时卸载最久未使用的
+"""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    STYLE_ADAPTERS,
+    STYLE_ADAPTER_MAX_LOADED,
+)
+
+# PEFT 混合批次中表示“不使用适配器”的行
+BASE_ADAPTER = "__base__"
+
+# PEFT 适配器目录的标志文件
+ADAPTER_CONFIG_NAME = "adapter_config.json"
+
+
+def discover_style_adapters(
+    adapter_dir: Optional[str],
+    mapping: Optional[Dict[str, str]] = None,
+) -> Dict[str, Path]:
+    """
+    在适配器目录中查找各风格的适配器
+
+    Args:
+        adapter_dir: 适配器根目录（None 表示不使用适配器）
+        mapping: 风格 → 子目录名，默认 STYLE_ADAPTERS
+
+    Returns:
+        风格 → 适配器目录（只包含含有 adapter_config.json 的子目录）
+    """
+    if not adapter_dir:
+        return {}
+    root = Path(adapter_dir)
+    mapping = STYLE_ADAPTERS if mapping is None else mapping
+    return {
+        style: root / subdir
+        for style, subdir in mapping.items()
+        if (root / subdir / ADAPTER_CONFIG_NAME).exists()
+    }
+
+
+class AdapterCache:
+    """
+    风格适配器缓存
+
+    只负责路由与驻留管理，实际的加载与卸载由 load / unload 回调完成
+    （ModelManager 中为 PEFT 的 load_adapter / delete_adapter）。
+    调用方须在持有模型生成锁时调用 acquire，保证卸载不会发生在其他请求的生成中途。
+    同一批次用到的适配器不会被卸载，因此批内风格数超过上限时暂时多驻留几个。
+
+    Example:
+        >>> cache = AdapterCache({"婉约抒情风": Path("adapters/wanyue")}, load=load, unload=unload)
+        >>> cache.acquire(["婉约抒情风", "豪放壮阔风"])
+        ['wanyue', '__base__']
+    """
+
+    def __init__(
+        self,
+        adapters: Dict[str, Path],
+        load: Callable[[str, Path], None],
+        unload: Callable[[str], None],
+        max_loaded: int = STYLE_ADAPTER_MAX_LOADED,
+    ):
+        self.paths: Dict[str, Path] = {Path(path).name: Path(path) for path in adapters.values()}
+        self.styles: Dict[str, str] = {style: Path(path).name for style, path in adapters.items()}
+        self.max_loaded = max(1, max_loaded)
+        self._load = load
+        self._unload = unload
+        self._lock = threading.Lock()
+        self._loaded: "OrderedDict[str, None]" = OrderedDict()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.paths)
+
+    def adapter_for(self, style_choice: Optional[str]) -> Optional[str]:
+        """风格对应的适配器名（没有适配器时为None）"""
+        return self.styles.get(style_choice or "")
+
+    def acquire(self, style_choices: Sequence[Optional[str]]) -> Optional[List[str]]:
+        """
+        确保本批次需要的适配器已加载，返回每行的适配器名
+
+        Returns:
+            与 style_choices 对应的适配器名列表（无适配器的行为 BASE_ADAPTER）；
+            模型上尚未加载任何适配器且本批次也不需要时返回None（直接使用基座模型）
+        """
+        wanted = list(dict.fromkeys(
+            name for name in (self.adapter_for(style) for style in style_choices) if name is not None
+        ))
+        with self._lock:
+            for name in wanted:
+                if name in self._loaded:
+                    self._loaded.move_to_end(name)
+                    self.hits += 1
+                    continue
+                print(f"[adapters] 加载风格适配器 {name}（{self.paths[name]}）")
+                self._load(name, self.paths[name])
+                self._loaded[name] = None
+                self.loads += 1
+            # 先加载后卸载：PEFT 模型上至少保留一个适配器
+            for name in list(self._loaded):
+                if len(self._loaded) <= self.max_loaded:
+                    break
+                if name in wanted:
+                    continue
+                self._unload(name)
+                del self._loaded[name]
+                self.evictions += 1
+            if not self._loaded:
+                return None
+        return [self.adapter_for(style) or BASE_ADAPTER for style in style_choices]
+
+    def clear(self) -> None:
+        """模型被卸载后清空记录（适配器随模型一同释放）"""
+        with self._lock:
+            self._loaded.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "available": dict(self.styles),
+                "loaded": list(self._loaded),
+                "max_loaded": self.max_loaded,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,248 @@
+"""
+编译解码模块 - Compiled Decode
+诗词输出很短，每个解码步的Python与算子调度开销占比很高。
+启用后解码步改用静态KV缓存并经 torch.compile 编译：缓存按长度档位预分配，
+单步解码的输入形状固定，编译结果可在请求间复用；预填充仍按普通方式执行
+（图片数量与尺寸各异，不适合编译）。GPU 与 CPU 均可使用，但收益主要在GPU上：
+CPU上用微型模型实测单token延迟 8.27ms 对 8.26ms，基本没有提速
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import torch
+import torch.nn.functional as F
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    COMPILE_MODE,
+    COMPILE_LENGTH_BUCKETS,
+    COMPILE_WARMUP_BATCH_SIZES,
+    COMPILE_CACHE_MAX_MB,
+    BATCH_SIZE,
+)
+
+_MB = 1024 ** 2
+
+
+def bucket_length(length: int, buckets: List[int]) -> Optional[int]:
+    """
+    不小于 length 的最小档位（超出最大档位时为None）
+
+    Example:
+        >>> bucket_length(700, [512, 1024, 2048])
+        1024
+    """
+    for bucket in sorted(buckets):
+        if length <= bucket:
+            return bucket
+    return None
+
+
+def static_cache_bytes(config: Any, batch_size: int, length: int, dtype: torch.dtype) -> int:
+    """
+    静态KV缓存的占用（字节）：层数 × 2（K、V）× 批大小 × KV头数 × 长度 × 头维度 × 元素字节数
+
+    Example:
+        >>> static_cache_bytes(llama_8b_config, 1, 4096, torch.bfloat16) // 1024 ** 2
+        512
+    """
+    heads = getattr(config, "num_key_value_heads", None) or config.num_attention_heads
+    head_dim = getattr(config, "head_dim", None) or config.hidden_size // config.num_attention_heads
+    element = torch.empty((), dtype=dtype).element_size()
+    return config.num_hidden_layers * 2 * batch_size * heads * length * head_dim * element
+
+
+class CompiledDecoder:
+    """
+    编译的单步解码
+
+    替换模型的 forward：使用静态缓存的单token解码步走编译版本，其余调用
+    （预填充、未使用静态缓存的生成）走原始 forward。静态缓存按
+    (批大小, 长度档位) 预分配并在请求间复用，编译图的数量不超过
+    批大小数 × 档位数。只有预热过的 (批大小, 档位) 走编译路径：编译时不使用动态形状，
+    未预热的组合若在请求中编译，会让该请求承担编译耗时并长期占用一份静态缓存；
+    这类请求与提示长度 + 生成上限超出最大档位的请求一样按普通方式生成。
+
+    静态缓存总占用不超过 max_cache_bytes：分配新缓存前释放最久未用的缓存（编译结果保留，
+    下次使用时重新分配）；单份缓存就超出上限的组合按普通方式生成。
+
+    Example:
+        >>> compiled = CompiledDecoder(model)
+        >>> compiled.warmup(lambda batch_size: inputs_for(batch_size))
+        >>> model.generate(**inputs, **compiled.cache_kwargs(1, prompt_length, 512))
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        buckets: Optional[List[int]] = None,
+        mode: Optional[str] = COMPILE_MODE,
+        max_cache_bytes: Optional[int] = None if COMPILE_CACHE_MAX_MB is None else int(COMPILE_CACHE_MAX_MB * _MB),
+    ):
+        self.model = model
+        self.max_cache_bytes = max_cache_bytes
+        self.buckets = sorted(COMPILE_LENGTH_BUCKETS if buckets is None else buckets)
+        self.mode = mode or ("reduce-overhead" if model.device.type == "cuda" else "default")
+        self._eager = model.forward
+        self._compiled = torch.compile(self._eager, mode=self.mode, dynamic=False)
+        # (批大小, 长度) → (静态缓存, 占用字节)，按最近使用排序
+        self._caches: "OrderedDict[Tuple[int, int], Tuple[Any, int]]" = OrderedDict()
+        self.cache_evictions = 0
+        # 已预热（已编译）的 (批大小, 档位)
+        self._warmed: Set[Tuple[int, int]] = set()
+        self.requests = 0
+        self.fallbacks = 0
+        self.compiled_steps = 0
+        self.warmup_seconds: Dict[str, float] = {}
+        model.forward = self._forward
+
+    @staticmethod
+    def supported(model: Any) -> bool:
+        """静态缓存需要模型位于单个设备上（多卡切分时不启用）"""
+        devices = set(str(device) for device in (getattr(model, "hf_device_map", None) or {}).values())
+        return len(devices) <= 1
+
+    def _forward(self, *args, **kwargs):
+        cache = kwargs.get("past_key_values")
+        input_ids = kwargs.get("input_ids")
+        decode_step = (
+            self._is_static(cache)
+            and input_ids is not None
+            and input_ids.shape[1] == 1
+            and kwargs.get("pixel_values") is None
+        )
+        if not decode_step:
+            return self._eager(*args, **kwargs)
+        # 二维注意力掩码随解码步增长，补齐到缓存长度使每步形状相同（补齐部分本就被因果掩码遮住）
+        mask = kwargs.get("attention_mask")
+        if mask is not None and mask.dim() == 2 and mask.shape[1] < cache.max_cache_len:
+            kwargs["attention_mask"] = F.pad(mask, (0, cache.max_cache_len - mask.shape[1]))
+        self.compiled_steps += 1
+        return self._compiled(*args, **kwargs)
+
+    @staticmethod
+    def _is_static(cache: Any) -> bool:
+        from transformers import StaticCache
+        return isinstance(cache, StaticCache)
+
+    def _text_config(self) -> Any:
+        config = self.model.config
+        return config.get_text_config() if hasattr(config, "get_text_config") else config
+
+    def cache_bytes(self) -> int:
+        """当前静态缓存的总占用（字节）"""
+        return sum(size for _, size in self._caches.values())
+
+    def _fits(self, batch_size: int, length: int) -> bool:
+        if self.max_cache_bytes is None:
+            return True
+        return static_cache_bytes(self._text_config(), batch_size, length, self.model.dtype) <= self.max_cache_bytes
+
+    @torch.inference_mode()
+    def _static_cache(self, batch_size: int, length: int) -> Any:
+        """
+        取出 (批大小, 长度) 的静态缓存并清零；与生成一样在推理模式下分配与修改
+
+        生成在模型的生成锁内串行执行，释放其他缓存时它们不会正被使用。
+        """
+        key = (batch_size, length)
+        if key in self._caches:
+            self._caches.move_to_end(key)
+            cache, _ = self._caches[key]
+            cache.reset()
+            return cache
+        from transformers import StaticCache
+        config = self._text_config()
+        size = static_cache_bytes(config, batch_size, length, self.model.dtype)
+        # 先释放最久未用的缓存再分配，避免峰值占用超出上限
+        while self._caches and self.max_cache_bytes is not None and self.cache_bytes() + size > self.max_cache_bytes:
+            (old_batch, old_length), _ = self._caches.popitem(last=False)
+            self.cache_evictions += 1
+            print(f"[compile] 释放最久未用的静态缓存 批大小 {old_batch} × {old_length}")
+        cache = StaticCache(
+            config=config,
+            max_batch_size=batch_size,
+            max_cache_len=length,
+            device=self.model.device,
+            dtype=self.model.dtype,
+        )
+        self._caches[key] = (cache, size)
+        return cache
+
+    def cache_kwargs(self, batch_size: int, prompt_length: int, max_new_tokens: int) -> Dict[str, Any]:
+        """
+        本次生成传给 generate 的缓存参数
+
+        Returns:
+            {"past_key_values": 静态缓存}；超出最大档位或未预热时为空字典（按普通方式生成）；
+            预热过的组合其缓存可能已被释放，此时重新分配
+        """
+        self.requests += 1
+        bucket = bucket_length(int(prompt_length) + int(max_new_tokens), self.buckets)
+        if bucket is None or (batch_size, bucket) not in self._warmed:
+            self.fallbacks += 1
+            return {}
+        return {"past_key_values": self._static_cache(batch_size, bucket)}
+
+    def warmup(
+        self,
+        make_inputs: Callable[[int], Dict[str, Any]],
+        batch_sizes: Optional[List[int]] = None,
+        steps: int = 3,
+    ) -> Dict[str, float]:
+        """
+        为每个批大小与长度档位各生成几个token，触发编译并分配静态缓存
+
+        单份缓存超出 max_cache_bytes 的组合不预热；预热中分配的缓存受总占用上限约束，
+        最近预热的保留，较早的在下次使用时重新分配。
+
+        Args:
+            make_inputs: 批大小 → 模型输入（短的纯文本提示即可）
+            batch_sizes: 预热的批大小，默认 COMPILE_WARMUP_BATCH_SIZES（默认只预热批大小1；None 时为 1 到 BATCH_SIZE）
+            steps: 每次预热生成的token数（CUDA Graphs 需要多跑几步才会录制）
+
+        Returns:
+            "批大小x档位" → 预热耗时（秒）
+        """
+        if batch_sizes is None:
+            batch_sizes = COMPILE_WARMUP_BATCH_SIZES or list(range(1, BATCH_SIZE + 1))
+        for batch_size in batch_sizes:
+            inputs = make_inputs(batch_size)
+            for bucket in self.buckets:
+                if int(inputs["input_ids"].shape[1]) + steps > bucket:
+                    continue
+                if not self._fits(batch_size, bucket):
+                    print(f"[compile] 批大小 {batch_size} × 缓存 {bucket} 超出静态缓存上限，不预热")
+                    continue
+                start = time.perf_counter()
+                with torch.inference_mode():
+                    self.model.generate(
+                        **inputs,
+                        max_new_tokens=steps,
+                        min_new_tokens=steps,
+                        do_sample=False,
+                        past_key_values=self._static_cache(batch_size, bucket),
+                    )
+                seconds = time.perf_counter() - start
+                self._warmed.add((batch_size, bucket))
+                self.warmup_seconds[f"{batch_size}x{bucket}"] = round(seconds, 2)
+                print(f"[compile] 预热 批大小 {batch_size} × 缓存 {bucket}，耗时 {seconds:.1f}s")
+        return dict(self.warmup_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "buckets": self.buckets,
+            "caches": [f"{batch_size}x{length}" for batch_size, length in self._caches],
+            "cache_mb": round(self.cache_bytes() / _MB, 1),
+            "max_cache_mb": None if self.max_cache_bytes is None else round(self.max_cache_bytes / _MB, 1),
+            "cache_evictions": self.cache_evictions,
+            "warmed": [f"{batch_size}x{length}" for batch_size, length in sorted(self._warmed)],
+            "requests": self.requests,
+            "fallbacks": self.fallbacks,
+            "compiled_steps": self.compiled_steps,
+            "warmup_seconds": dict(self.warmup_seconds),
+        }
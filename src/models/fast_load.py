@@ -0,0 +1,255 @@
+"""
+快速加载模块 - Fast Load
+缩短服务重启时的模型冷启动：
+
+- 处理器（分词器 + 图像处理器）首次加载后保存到本地缓存目录，之后从该目录加载，
+  不再转换分词器、解析远程代码
+- 权重从 safetensors 内存映射，按需拷贝到目标设备（不在CPU内存中完整展开一份）
+- 可选的按设备分片目录（scripts/shard_checkpoint.py 生成）：每个设备一个分片文件，
+  由多个线程并行加载后直接放到各自的设备上
+- 各阶段耗时分别记录，随加载结果输出
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import torch
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    PROCESSOR_CACHE_ENABLED,
+    PROCESSOR_CACHE_DIR,
+    TRUST_REMOTE_CODE,
+)
+
+# 分片目录的索引文件
+SHARD_INDEX_NAME = "shard_index.json"
+
+# 复制到分片目录的非权重文件（配置、分词器、图像处理器、对话模板）
+SIDECAR_SUFFIXES = (".json", ".txt", ".model", ".jinja", ".py", ".tiktoken")
+
+# 不参与处理器缓存键的文件后缀（权重变化不影响处理器）
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".pth")
+
+
+class PhaseTimer:
+    """
+    分阶段计时（可在多个线程中分别计时）
+
+    Example:
+        >>> timer = PhaseTimer()
+        >>> with timer.phase("处理器"):
+        ...     load_processor(path)
+        >>> timer.summary()
+        '处理器 0.4s'
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = round(self.phases.get(name, 0.0) + time.perf_counter() - start, 3)
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.phases)
+
+    def summary(self) -> str:
+        return "、".join(f"{name} {seconds:.1f}s" for name, seconds in self.as_dict().items())
+
+
+def processor_cache_key(model_path: str) -> str:
+    """处理器缓存键：模型目录、其中非权重文件的大小与修改时间、transformers 版本"""
+    import transformers
+
+    path = Path(model_path)
+    parts = [str(path.resolve()) if path.exists() else str(model_path), transformers.__version__]
+    if path.is_dir():
+        for file in sorted(path.iterdir()):
+            if file.is_file() and file.suffix not in WEIGHT_SUFFIXES:
+                stat = file.stat()
+                parts.append(f"{file.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:24]
+
+
+def load_processor(
+    model_path: str,
+    cache_dir: Optional[Path] = PROCESSOR_CACHE_DIR,
+    enabled: bool = PROCESSOR_CACHE_ENABLED,
+) -> Tuple[Any, bool]:
+    """
+    加载处理器，优先从本地缓存目录加载
+
+    首次加载后用 save_pretrained 写入 cache_dir/<缓存键>/，之后从该目录 from_pretrained：
+    分词器已保存为 tokenizer.json，不再转换慢速分词器或解析模型目录中的远程代码。
+    缓存只含配置与词表文件，不经 pickle 反序列化，读取时不会执行其中的内容；
+    缓存目录创建时仅当前用户可访问。读取失败时按原方式加载并重写缓存。
+
+    Returns:
+        (处理器, 是否命中缓存)
+    """
+    from transformers import AutoProcessor
+
+    cache_path = Path(cache_dir) / processor_cache_key(model_path) if enabled and cache_dir else None
+    if cache_path is not None and cache_path.is_dir():
+        try:
+            return AutoProcessor.from_pretrained(str(cache_path), trust_remote_code=TRUST_REMOTE_CODE), True
+        except Exception as exc:
+            print(f"⚠️ 处理器缓存读取失败，重新加载：{exc}")
+
+    processor = AutoProcessor.from_pretrained(model_path, trust_remote_code=TRUST_REMOTE_CODE)
+    if cache_path is not None:
+        # 先写入本进程的临时目录再改名，多个推理进程同时加载时不会读到写了一半的缓存
+        tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            cache_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            processor.save_pretrained(str(tmp))
+            shutil.rmtree(cache_path, ignore_errors=True)
+            tmp.rename(cache_path)
+        except Exception as exc:
+            # 无法保存的处理器照常使用，只是不缓存
+            print(f"⚠️ 处理器无法缓存：{exc}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return processor, False
+
+
+def is_sharded_checkpoint(model_path: str) -> bool:
+    """模型目录是否为按设备分片的布局"""
+    return (Path(model_path) / SHARD_INDEX_NAME).exists()
+
+
+def _device_name(device: Any) -> str:
+    """hf_device_map 中的设备（整数为GPU序号）→ torch 设备名"""
+    return f"cuda:{device}" if isinstance(device, int) else str(device)
+
+
+def write_sharded_checkpoint(model: Any, source_dir: str, output_dir: str) -> Dict[str, Any]:
+    """
+    把已加载的模型按参数所在设备写成分片目录
+
+    每个设备一个 safetensors 文件；共享存储的参数（如绑定的词嵌入）只写一次，
+    加载时由 tie_weights 恢复。配置、分词器等非权重文件从 source_dir 复制。
+
+    Returns:
+        写入的分片索引
+    """
+    from safetensors.torch import save_file
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    for file in Path(source_dir).iterdir():
+        if file.is_file() and file.suffix in SIDECAR_SUFFIXES and file.name != SHARD_INDEX_NAME:
+            shutil.copy2(file, output / file.name)
+
+    groups: Dict[str, Dict[str, torch.Tensor]] = {}
+    seen = set()
+    for name, tensor in model.state_dict().items():
+        if tensor.device.type == "meta":
+            raise RuntimeError(f"参数 {name} 未加载（位于 meta 设备），无法写出分片")
+        key = (tensor.untyped_storage().data_ptr(), tensor.storage_offset(), tuple(tensor.shape))
+        if key in seen:
+            continue
+        seen.add(key)
+        groups.setdefault(str(tensor.device), {})[name] = tensor.detach().contiguous()
+
+    shards = {}
+    for device, tensors in groups.items():
+        filename = f"shard-{device.replace(':', '_')}.safetensors"
+        save_file(tensors, str(output / filename), metadata={"format": "pt"})
+        shards[device] = filename
+
+    device_map = getattr(model, "hf_device_map", None) or {"": next(iter(groups))}
+    index = {
+        "format": 1,
+        "dtype": str(model.dtype).replace("torch.", ""),
+        "device_map": {module: _device_name(device) for module, device in device_map.items()},
+        "shards": shards,
+    }
+    with (output / SHARD_INDEX_NAME).open("w", encoding="utf-8") as fh:
+        json.dump(index, fh, ensure_ascii=False, indent=2)
+    return index
+
+
+def single_device(device_map: Any) -> Optional[str]:
+    """device_map 把整个模型放在一个设备上时返回该设备（"cpu" 或 {"": "cuda:1"}），否则为None"""
+    if isinstance(device_map, dict) and set(device_map) == {""}:
+        return _device_name(device_map[""])
+    if device_map == "cpu":
+        return "cpu"
+    return None
+
+
+def load_sharded_checkpoint(
+    model_path: str,
+    model_class: Any,
+    dtype: torch.dtype,
+    timer: Optional[PhaseTimer] = None,
+    device: Optional[str] = None,
+) -> Any:
+    """
+    并行加载按设备分片的模型
+
+    先在 meta 设备上按配置构建模型（不分配内存），再由每个设备一个线程把
+    该设备的分片内存映射并直接加载到该设备，最后按写出时的设备映射分发。
+    指定 device 时（如各副本各占一块卡）所有分片都加载到该设备。
+
+    Raises:
+        RuntimeError: 分片所需的设备不存在或分片缺少参数
+    """
+    from accelerate import dispatch_model, init_empty_weights
+    from safetensors.torch import load_file
+    from transformers import AutoConfig
+
+    timer = timer or PhaseTimer()
+    root = Path(model_path)
+    with (root / SHARD_INDEX_NAME).open(encoding="utf-8") as fh:
+        index = json.load(fh)
+    targets = {shard: device or shard for shard in index["shards"]}
+    for target in set(targets.values()):
+        if target.startswith("cuda") and int(target.split(":")[1]) >= torch.cuda.device_count():
+            raise RuntimeError(f"分片目录需要设备 {target}，当前只有 {torch.cuda.device_count()} 块GPU，请重新分片。")
+
+    with timer.phase("构建"):
+        config = AutoConfig.from_pretrained(model_path, trust_remote_code=TRUST_REMOTE_CODE)
+        with init_empty_weights():
+            model = model_class.from_config(config, torch_dtype=dtype, trust_remote_code=TRUST_REMOTE_CODE)
+
+    with timer.phase("权重"):
+        def load_shard(item: Tuple[str, str]) -> Dict[str, torch.Tensor]:
+            shard, filename = item
+            return load_file(str(root / filename), device=targets[shard])
+
+        state: Dict[str, torch.Tensor] = {}
+        with ThreadPoolExecutor(max_workers=len(index["shards"])) as pool:
+            for tensors in pool.map(load_shard, index["shards"].items()):
+                state.update(tensors)
+        model.load_state_dict(state, strict=False, assign=True)
+        model.tie_weights()
+
+    missing = [name for name, param in model.named_parameters() if param.device.type == "meta"]
+    if missing:
+        raise RuntimeError(f"分片目录缺少 {len(missing)} 个参数（如 {missing[0]}），请重新分片。")
+
+    with timer.phase("分发"):
+        device_map = {"": device} if device else index["device_map"]
+        if len(set(device_map.values())) > 1:
+            model = dispatch_model(model, device_map=device_map)
+        else:
+            model = model.to(next(iter(device_map.values())))
+    return model
@@ -0,0 +1,745 @@
+"""
+模型管理模块 - Model Manager
+负责多模态模型的加载、推理与用量统计
+"""
+import gc
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import torch
+from PIL import Image
+from transformers import (
+    AutoModelForImageTextToText,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
+)
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    MODEL_PATH,
+    MODEL_BACKEND,
+    DEVICE_MAP,
+    REPLICA_DEVICE_GROUPS,
+    MODEL_DTYPE,
+    TRUST_REMOTE_CODE,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_TOP_P,
+    DEFAULT_TEMPERATURE,
+    ENABLE_TF32,
+    CUDNN_BENCHMARK,
+    MIN_GPU_COUNT,
+    VERBOSE_LOGGING,
+    MODEL_REGISTRY,
+    FALLBACK_MODEL_PATH,
+    FALLBACK_DEVICE_MAP,
+    STUB_SECONDS_PER_TOKEN,
+    STYLE_ADAPTER_DIR,
+    COMPILE_DECODE,
+)
+from src.models.adapters import AdapterCache, discover_style_adapters
+from src.models.compiled_decode import CompiledDecoder
+from src.models.replica_pool import BackendFailure
+from src.models.fast_load import (
+    PhaseTimer,
+    is_sharded_checkpoint,
+    load_processor,
+    load_sharded_checkpoint,
+    single_device,
+)
+from src.models.usage import UsageTracker
+from src.models.vision_budget import VisionBudgetPolicy
+from src.serving.cancellation import CancellationToken
+
+# 对话消息类型别名
+Messages = List[Dict[str, Any]]
+
+
+class CancellationCriteria(StoppingCriteria):
+    """
+    每个解码步检查取消令牌，被取消或到达截止时间时停止整批生成，
+    已生成的token照常解码返回；stop_reason 记录触发的原因
+    """
+
+    def __init__(self, token: CancellationToken):
+        self.token = token
+        self.stop_reason: Optional[str] = None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        reason = self.token.stop_reason()
+        if reason is not None:
+            self.stop_reason = reason
+        return torch.full((input_ids.shape[0],), reason is not None, dtype=torch.bool, device=input_ids.device)
+
+    def as_kwargs(self) -> Dict[str, Any]:
+        return {"stopping_criteria": StoppingCriteriaList([self])}
+
+
+def sampling_kwargs(do_sample: bool, top_p: float, temperature: float) -> Dict[str, Any]:
+    """generate 的解码参数；贪心解码时清空模型默认的采样参数，避免无效参数警告"""
+    if not do_sample:
+        return {"do_sample": False, "top_p": None, "top_k": None, "temperature": None}
+    return {"do_sample": True, "top_p": float(top_p), "temperature": float(temperature)}
+
+
+# 设备故障的异常信息特征（区别于提示过长等请求错误，副本池据此暂停故障副本）
+DEVICE_ERROR_MARKERS = ("CUDA error", "CUBLAS_STATUS", "cuDNN error", "NCCL", "device-side assert")
+
+
+def inference_error(exc: Exception) -> RuntimeError:
+    """
+    推理异常统一转为 RuntimeError，由界面与接口给出提示
+
+    显存不足与处理器报错（如提示过长）属于请求本身的问题；设备错误转为
+    BackendFailure，副本池据此判断副本健康。
+    """
+    if isinstance(exc, torch.cuda.OutOfMemoryError):
+        return RuntimeError("显存不足，请缩短对话或降低生成长度后重试。")
+    if isinstance(exc, BackendFailure):
+        return exc
+    if any(marker in str(exc) for marker in DEVICE_ERROR_MARKERS):
+        return BackendFailure(str(exc))
+    if isinstance(exc, RuntimeError):
+        return exc
+    return RuntimeError(str(exc))
+
+
+class ModelManager:
+    """
+    多模态模型管理器
+
+    封装模型与处理器的加载、对话模板渲染和文本生成。
+    每次调用 generate 都会返回生成文本及对应的用量记录。
+    """
+
+    def __init__(
+        self,
+        model_path: str = MODEL_PATH,
+        device_map: Any = DEVICE_MAP,
+        usage_tracker: Optional[UsageTracker] = None,
+        max_memory: Optional[Dict[Any, int]] = None,
+        adapter_dir: Optional[str] = STYLE_ADAPTER_DIR,
+        compile_decode: bool = COMPILE_DECODE,
+    ):
+        self.model_path = model_path
+        self.device_map = device_map
+        self.max_memory = max_memory
+        self.compile_decode = compile_decode
+        # 启用编译解码时在模型加载后创建
+        self.compiled: Optional[CompiledDecoder] = None
+        # 最近一次加载的各阶段耗时（秒）
+        self.load_timings: Dict[str, float] = {}
+        self.dtype = getattr(torch, MODEL_DTYPE)
+        self.model = None
+        self.processor = None
+        self.usage_tracker = usage_tracker or UsageTracker()
+        self.vision_budget = VisionBudgetPolicy()
+        # 各风格的LoRA适配器，首次请求该风格时加载到基座模型上
+        self.adapters = AdapterCache(
+            discover_style_adapters(adapter_dir),
+            load=self._load_adapter,
+            unload=self._unload_adapter,
+        )
+        # 单个模型实例不支持并发生成，串行化推理调用
+        self._generate_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None and self.processor is not None
+
+    def load_model(self) -> None:
+        """
+        加载模型与处理器
+
+        Raises:
+            RuntimeError: GPU数量不足或模型加载失败
+        """
+        gpu_count = torch.cuda.device_count()
+        # 显式加载到CPU的（小）模型不要求GPU
+        if self.device_map != "cpu" and gpu_count < MIN_GPU_COUNT:
+            raise RuntimeError(
+                f"检测到 {gpu_count} 块GPU，至少需要 {MIN_GPU_COUNT} 块。"
+            )
+
+        if torch.cuda.is_available():
+            torch.backends.cuda.matmul.allow_tf32 = ENABLE_TF32
+            torch.backends.cudnn.allow_tf32 = ENABLE_TF32
+            torch.backends.cudnn.benchmark = CUDNN_BENCHMARK
+
+        print(f"正在加载模型：{self.model_path}")
+        start = time.perf_counter()
+        timer = PhaseTimer()
+        # 处理器在后台线程加载，与权重加载重叠
+        processor_result: Dict[str, Any] = {}
+
+        def load_processor_in_background() -> None:
+            try:
+                with timer.phase("处理器"):
+                    processor_result["value"] = load_processor(self.model_path)
+            except Exception as exc:
+                processor_result["error"] = exc
+
+        processor_thread = threading.Thread(target=load_processor_in_background, daemon=True)
+        processor_thread.start()
+        if is_sharded_checkpoint(self.model_path):
+            # 按设备分片的目录：各设备的分片并行加载，设备映射以分片时为准（整模型放在单个设备上时除外）
+            self.model = load_sharded_checkpoint(
+                self.model_path,
+                AutoModelForImageTextToText,
+                self.dtype,
+                timer,
+                device=single_device(self.device_map),
+            )
+        else:
+            with timer.phase("权重"):
+                # safetensors 以内存映射读取，low_cpu_mem_usage 下逐个参数拷贝到目标设备
+                self.model = AutoModelForImageTextToText.from_pretrained(
+                    self.model_path,
+                    torch_dtype=self.dtype,
+                    device_map=self.device_map,
+                    max_memory=self.max_memory,
+                    low_cpu_mem_usage=True,
+                    trust_remote_code=TRUST_REMOTE_CODE,
+                )
+        processor_thread.join()
+        if "error" in processor_result:
+            self.model = None
+            raise processor_result["error"]
+        self.processor, processor_cached = processor_result["value"]
+        # 批量生成时左填充，保证各行生成内容紧接在提示之后
+        self.processor.tokenizer.padding_side = "left"
+        self.model.eval()
+        if self.compile_decode:
+            with timer.phase("编译预热"):
+                self._enable_compiled_decode()
+        self.load_timings = {**timer.as_dict(), "总计": round(time.perf_counter() - start, 3)}
+        print(
+            f"✓ 模型加载完成，耗时 {time.perf_counter() - start:.1f}s"
+            f"（{timer.summary()}{'，处理器来自缓存' if processor_cached else ''}）"
+        )
+
+    def _enable_compiled_decode(self) -> None:
+        """编译解码步并预热各长度档位，避免首批请求承担编译耗时"""
+        if not CompiledDecoder.supported(self.model):
+            print("⚠️ 模型切分在多个设备上，不启用编译解码")
+            return
+        if self.adapters.enabled:
+            # 适配器按请求加载与卸载，PeftModel 包装和 LoRA 层的增删都会使编译结果失效并触发重新编译
+            print("⚠️ 已配置风格适配器，不启用编译解码")
+            return
+        self.compiled = CompiledDecoder(self.model)
+        warmup_messages = [{"role": "user", "content": [{"type": "text", "text": "预热"}]}]
+        self.compiled.warmup(lambda batch_size: self._prepare_inputs([warmup_messages] * batch_size))
+
+    def unload_model(self) -> None:
+        """释放模型与处理器占用的内存（等待进行中的生成结束）"""
+        with self._generate_lock:
+            self.model = None
+            self.processor = None
+            self.compiled = None
+            self.adapters.clear()
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _load_adapter(self, name: str, path: Path) -> None:
+        """把LoRA适配器加载到基座模型上（首个适配器时将模型包装为 PeftModel）"""
+        try:
+            from peft import PeftModel
+        except ImportError as exc:
+            raise RuntimeError("加载风格适配器需要 peft：pip install peft") from exc
+        if isinstance(self.model, PeftModel):
+            self.model.load_adapter(str(path), adapter_name=name, is_trainable=False)
+        else:
+            self.model = PeftModel.from_pretrained(self.model, str(path), adapter_name=name, is_trainable=False)
+        self.model.eval()
+
+    def _unload_adapter(self, name: str) -> None:
+        self.model.delete_adapter(name)
+
+    def memory_bytes(self) -> int:
+        """已加载模型的参数与缓冲区占用（字节），未加载时为0"""
+        return int(self.model.get_memory_footprint()) if self.model is not None else 0
+
+    def _prepare_inputs(self, conversations: List[Messages]) -> Dict[str, torch.Tensor]:
+        inputs = self.processor.apply_chat_template(
+            conversations,
+            tokenize=True,
+            add_generation_prompt=True,
+            return_dict=True,
+            return_tensors="pt",
+            padding=True,
+        )
+        return inputs.to(self.model.device)
+
+    def _count_image_tokens(self, input_ids: torch.Tensor) -> int:
+        image_token_id = getattr(self.model.config, "image_token_id", None)
+        if image_token_id is None:
+            return 0
+        return int((input_ids == image_token_id).sum().item())
+
+    @staticmethod
+    def _reset_peak_memory() -> None:
+        for device_index in range(torch.cuda.device_count()):
+            torch.cuda.reset_peak_memory_stats(device_index)
+
+    @staticmethod
+    def _peak_memory_mb() -> Optional[float]:
+        if not torch.cuda.is_available():
+            return None
+        total = sum(
+            torch.cuda.max_memory_allocated(device_index)
+            for device_index in range(torch.cuda.device_count())
+        )
+        return round(total / (1024 ** 2), 1)
+
+    def _record_usage(
+        self,
+        format_choice: Optional[str],
+        style_choice: Optional[str],
+        prompt_tokens: int,
+        image_tokens: int,
+        generated_tokens: int,
+        max_new_tokens: int,
+        seed: Optional[int],
+        batch_size: int,
+        latency: float,
+        peak_memory_mb: Optional[float],
+        stop_reason: Optional[str] = None,
+        vision_budget: Optional[Dict[str, int]] = None,
+        do_sample: bool = True,
+        adapter: Optional[str] = None,
+        compiled: bool = False,
+    ) -> Dict[str, Any]:
+        usage = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "model": self.model_path,
+            "format": format_choice,
+            "style": style_choice,
+            "prompt_tokens": prompt_tokens,
+            "image_tokens": image_tokens,
+            "generated_tokens": generated_tokens,
+            "max_new_tokens": int(max_new_tokens),
+            "do_sample": do_sample,
+            "adapter": adapter,
+            "compiled": compiled,
+            "seed": seed,
+            "batch_size": batch_size,
+            "latency_seconds": round(latency, 3),
+            "tokens_per_second": round(generated_tokens / latency, 2) if latency > 0 else 0.0,
+            "peak_memory_mb": peak_memory_mb,
+            "stop_reason": stop_reason,
+            **(vision_budget or {}),
+        }
+        self.usage_tracker.record(usage)
+        if VERBOSE_LOGGING:
+            print(f"[usage] {usage}")
+        return usage
+
+    def generate(
+        self,
+        messages: Messages,
+        image: Optional[Image.Image] = None,
+        max_new_tokens: int = DEFAULT_MAX_TOKENS,
+        top_p: float = DEFAULT_TOP_P,
+        temperature: float = DEFAULT_TEMPERATURE,
+        do_sample: bool = True,
+        format_choice: Optional[str] = None,
+        style_choice: Optional[str] = None,
+        seed: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        queue_depth: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        根据对话消息生成诗词
+
+        Args:
+            messages: build_messages 构建的多模态消息列表
+            image: 当前轮次的图像（已包含在messages中，仅作记录）
+            max_new_tokens: 最大生成token数
+            top_p: Top-p采样参数
+            temperature: 温度参数
+            do_sample: 为False时贪心解码（忽略 top_p 与 temperature，过载降级时使用）
+            format_choice: 诗词格式，用于用量聚合
+            style_choice: 创作风格，用于用量聚合
+            seed: 随机种子，指定后采样结果可复现
+            cancel_token: 取消令牌；被取消或到达截止时间时返回已生成的部分，
+                用量记录的 stop_reason 为 "cancelled" / "deadline"
+            queue_depth: 生成通道的排队深度，用于选择视觉token预算
+                （默认读取本进程的生成通道）
+
+        Returns:
+            (生成文本, 用量记录)
+
+        Raises:
+            RuntimeError: 模型未加载或推理失败
+        """
+        return self.generate_batch(
+            [messages],
+            max_new_tokens=max_new_tokens,
+            top_p=top_p,
+            temperature=temperature,
+            do_sample=do_sample,
+            format_choices=[format_choice],
+            style_choices=[style_choice],
+            seed=seed,
+            cancel_token=cancel_token,
+            queue_depth=queue_depth,
+        )[0]
+
+    def generate_batch(
+        self,
+        conversations: List[Messages],
+        max_new_tokens: int = DEFAULT_MAX_TOKENS,
+        top_p: float = DEFAULT_TOP_P,
+        temperature: float = DEFAULT_TEMPERATURE,
+        do_sample: bool = True,
+        format_choices: Optional[List[Optional[str]]] = None,
+        style_choices: Optional[List[Optional[str]]] = None,
+        seed: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        queue_depth: Optional[int] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        在一次前向批处理中为多组对话生成诗词
+
+        各组对话左填充到相同长度后共同解码，适合批量任务充分利用GPU。
+        不同风格的对话各自使用对应的LoRA适配器，仍在同一次前向中完成。
+
+        Args:
+            conversations: 多组 build_messages 构建的消息列表
+            max_new_tokens: 最大生成token数
+            top_p: Top-p采样参数
+            temperature: 温度参数
+            do_sample: 为False时贪心解码
+            format_choices: 每组对话对应的诗词格式
+            style_choices: 每组对话对应的创作风格
+            seed: 随机种子
+            cancel_token: 取消令牌，作用于整批
+            queue_depth: 生成通道的排队深度（见 generate）
+
+        Returns:
+            与输入顺序一致的 [(生成文本, 用量记录), ...]
+
+        Raises:
+            RuntimeError: 模型未加载或推理失败
+        """
+        if not self.is_loaded:
+            raise BackendFailure("模型尚未加载，请先调用 initialize_model()。")
+
+        batch_size = len(conversations)
+        format_choices = format_choices or [None] * batch_size
+        style_choices = style_choices or [None] * batch_size
+        criteria = CancellationCriteria(cancel_token) if cancel_token is not None else None
+        # 按排队深度与格式缩放图片，负载越高视觉token越少
+        conversations, budgets = self.vision_budget.prepare(conversations, format_choices, queue_depth)
+
+        with self._generate_lock:
+            try:
+                adapter_names = self.adapters.acquire(style_choices)
+                inputs = self._prepare_inputs(conversations)
+                prompt_length = int(inputs["input_ids"].shape[1])
+                cache_kwargs = (
+                    self.compiled.cache_kwargs(batch_size, prompt_length, max_new_tokens) if self.compiled else {}
+                )
+
+                if torch.cuda.is_available():
+                    self._reset_peak_memory()
+                if seed is not None:
+                    torch.manual_seed(int(seed))
+                start = time.perf_counter()
+                with torch.inference_mode():
+                    output_ids = self.model.generate(
+                        **inputs,
+                        max_new_tokens=int(max_new_tokens),
+                        **sampling_kwargs(do_sample, top_p, temperature),
+                        **(criteria.as_kwargs() if criteria else {}),
+                        **({"adapter_names": adapter_names} if adapter_names else {}),
+                        **cache_kwargs,
+                    )
+                latency = time.perf_counter() - start
+            except Exception as exc:
+                error = inference_error(exc)
+                if error is exc:
+                    raise
+                raise error from exc
+
+            generated_ids = output_ids[:, prompt_length:]
+            generated_texts = self.processor.batch_decode(
+                generated_ids,
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=False,
+            )
+
+        pad_token_id = self.processor.tokenizer.pad_token_id
+        peak_memory_mb = self._peak_memory_mb()
+        results: List[Tuple[str, Dict[str, Any]]] = []
+        for row, text in enumerate(generated_texts):
+            row_ids = generated_ids[row]
+            if pad_token_id is not None:
+                row_ids = row_ids[row_ids != pad_token_id]
+            usage = self._record_usage(
+                format_choices[row],
+                style_choices[row],
+                prompt_tokens=int(inputs["attention_mask"][row].sum().item()),
+                image_tokens=self._count_image_tokens(inputs["input_ids"][row]),
+                generated_tokens=int(row_ids.shape[0]),
+                max_new_tokens=max_new_tokens,
+                seed=seed,
+                batch_size=batch_size,
+                latency=latency,
+                peak_memory_mb=peak_memory_mb,
+                stop_reason=criteria.stop_reason if criteria else None,
+                vision_budget=budgets[row],
+                do_sample=do_sample,
+                adapter=adapter_names[row] if adapter_names else None,
+                compiled=bool(cache_kwargs),
+            )
+            results.append((text.strip(), usage))
+
+        return results
+
+    def generate_stream(
+        self,
+        messages: Messages,
+        max_new_tokens: int = DEFAULT_MAX_TOKENS,
+        top_p: float = DEFAULT_TOP_P,
+        temperature: float = DEFAULT_TEMPERATURE,
+        do_sample: bool = True,
+        format_choice: Optional[str] = None,
+        style_choice: Optional[str] = None,
+        seed: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        queue_depth: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        流式生成诗词
+
+        调用方提前关闭生成器（如连接断开）时取消令牌，生成线程在下一个解码步停止。
+
+        Args:
+            与 generate 相同
+
+        Yields:
+            {"type": "delta", "text": 新增文本}，
+            结束时 {"type": "done", "text": 完整文本, "usage": 用量记录}
+
+        Raises:
+            RuntimeError: 模型未加载或推理失败
+        """
+        if not self.is_loaded:
+            raise BackendFailure("模型尚未加载，请先调用 initialize_model()。")
+
+        streamer = TextIteratorStreamer(
+            self.processor.tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True,
+        )
+        outcome: Dict[str, Any] = {}
+        token = cancel_token or CancellationToken()
+        criteria = CancellationCriteria(token)
+        (messages,), (budget,) = self.vision_budget.prepare([messages], [format_choice], queue_depth)
+
+        def run_generation() -> None:
+            with self._generate_lock:
+                try:
+                    adapter_names = self.adapters.acquire([style_choice])
+                    outcome["adapter"] = adapter_names[0] if adapter_names else None
+                    inputs = self._prepare_inputs([messages])
+                    outcome["inputs"] = inputs
+                    cache_kwargs = (
+                        self.compiled.cache_kwargs(1, int(inputs["input_ids"].shape[1]), max_new_tokens)
+                        if self.compiled else {}
+                    )
+                    outcome["compiled"] = bool(cache_kwargs)
+                    if torch.cuda.is_available():
+                        self._reset_peak_memory()
+                    if seed is not None:
+                        torch.manual_seed(int(seed))
+                    start = time.perf_counter()
+                    with torch.inference_mode():
+                        outcome["output_ids"] = self.model.generate(
+                            **inputs,
+                            max_new_tokens=int(max_new_tokens),
+                            **sampling_kwargs(do_sample, top_p, temperature),
+                            streamer=streamer,
+                            **criteria.as_kwargs(),
+                            **({"adapter_names": adapter_names} if adapter_names else {}),
+                            **cache_kwargs,
+                        )
+                    outcome["latency"] = time.perf_counter() - start
+                    outcome["peak_memory_mb"] = self._peak_memory_mb()
+                except Exception as exc:
+                    outcome["error"] = exc
+                    streamer.end()
+
+        worker = threading.Thread(target=run_generation, daemon=True)
+        worker.start()
+
+        chunks: List[str] = []
+        try:
+            for delta in streamer:
+                if delta:
+                    chunks.append(delta)
+                    yield {"type": "delta", "text": delta}
+        except GeneratorExit:
+            token.cancel()
+            raise
+        worker.join()
+
+        error = outcome.get("error")
+        if error is not None:
+            converted = inference_error(error)
+            if converted is error:
+                raise error
+            raise converted from error
+
+        inputs = outcome["inputs"]
+        prompt_tokens = int(inputs["input_ids"].shape[1])
+        usage = self._record_usage(
+            format_choice,
+            style_choice,
+            prompt_tokens=prompt_tokens,
+            image_tokens=self._count_image_tokens(inputs["input_ids"]),
+            generated_tokens=int(outcome["output_ids"].shape[1]) - prompt_tokens,
+            max_new_tokens=max_new_tokens,
+            seed=seed,
+            batch_size=1,
+            latency=outcome["latency"],
+            peak_memory_mb=outcome["peak_memory_mb"],
+            stop_reason=criteria.stop_reason,
+            vision_budget=budget,
+            do_sample=do_sample,
+            adapter=outcome["adapter"],
+            compiled=outcome["compiled"],
+        )
+        yield {"type": "done", "text": "".join(chunks).strip(), "usage": usage}
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """
+        获取模型的静态信息
+
+        Returns:
+            包含模型路径、设备、精度和参数量等信息的字典
+        """
+        info: Dict[str, Any] = {
+            "模型路径": self.model_path,
+            "设备映射": self.device_map,
+            "精度": MODEL_DTYPE,
+            "GPU数量": torch.cuda.device_count(),
+            "已加载": self.is_loaded,
+        }
+        if self.is_loaded:
+            param_count = sum(p.numel() for p in self.model.parameters())
+            info["参数量"] = f"{param_count / 1e9:.2f}B"
+            info["显存占用"] = f"{self.model.get_memory_footprint() / (1024 ** 3):.2f}GB"
+        if self.load_timings:
+            info["加载耗时"] = "、".join(f"{name} {seconds:.1f}s" for name, seconds in self.load_timings.items())
+        if self.compiled is not None:
+            info["编译解码"] = f"{self.compiled.mode}，缓存档位 {self.compiled.buckets}"
+        if self.adapters.enabled:
+            info["风格适配器"] = "、".join(self.adapters.styles)
+        info["用量日志"] = str(self.usage_tracker.log_path or "未启用")
+        return info
+
+
+# 全局模型管理器实例（ModelManager、副本池或桩模型，接口一致）
+_model_manager: Optional[Any] = None
+
+# 过载降级使用的备用小模型（未配置 FALLBACK_MODEL_PATH 时为None）
+_fallback_manager: Optional[Any] = None
+
+
+def create_model_manager(
+    usage_tracker: Optional[UsageTracker] = None,
+    device_groups: Optional[List[List[int]]] = REPLICA_DEVICE_GROUPS,
+) -> Any:
+    """
+    按配置创建模型管理器
+
+    - device_groups 非空：每个设备组一个默认模型副本的副本池
+    - MODEL_REGISTRY 有多个模型：按需加载的模型注册表（模拟后端下为多个桩模型）
+    - MODEL_BACKEND = "stub"：模拟后端，无需GPU与权重
+    - 否则：按 DEVICE_MAP 加载单个模型
+
+    Args:
+        usage_tracker: 共享的用量记录器（默认按配置新建）
+        device_groups: 副本设备组，默认取 REPLICA_DEVICE_GROUPS
+    """
+    if device_groups and MODEL_BACKEND != "stub":
+        from src.models.replica_pool import create_replica_pool
+        return create_replica_pool(device_groups, usage_tracker=usage_tracker)
+    if len(MODEL_REGISTRY) > 1:
+        from src.models.registry import create_model_registry
+        return create_model_registry(usage_tracker=usage_tracker)
+    if MODEL_BACKEND == "stub":
+        from src.models.stub_backend import StubModelManager
+        return StubModelManager(usage_tracker=usage_tracker)
+    return ModelManager(usage_tracker=usage_tracker)
+
+
+def get_model_manager() -> Any:
+    """获取全局模型管理器（尚未创建时自动创建，但不加载模型）"""
+    global _model_manager
+    if _model_manager is None:
+        _model_manager = create_model_manager()
+    return _model_manager
+
+
+def get_fallback_manager(usage_tracker: Optional[UsageTracker] = None) -> Optional[Any]:
+    """
+    获取备用小模型管理器（尚未创建时自动创建，但不加载模型）
+
+    模拟后端下以生成速度加倍的桩模型代替。备用模型在界面进程中加载，
+    启用推理进程时也是如此。
+
+    Args:
+        usage_tracker: 共享的用量记录器（与主模型共用，便于对比）
+
+    Returns:
+        未配置 FALLBACK_MODEL_PATH 时返回None
+    """
+    global _fallback_manager
+    if _fallback_manager is None and FALLBACK_MODEL_PATH:
+        if MODEL_BACKEND == "stub":
+            from src.models.stub_backend import StubModelManager
+            _fallback_manager = StubModelManager(
+                name=f"stub:{FALLBACK_MODEL_PATH}",
+                seconds_per_token=STUB_SECONDS_PER_TOKEN / 2,
+                usage_tracker=usage_tracker,
+                adapter_dir=None,
+            )
+        else:
+            _fallback_manager = ModelManager(
+                model_path=FALLBACK_MODEL_PATH,
+                device_map=FALLBACK_DEVICE_MAP,
+                usage_tracker=usage_tracker,
+                # 风格适配器针对主模型训练，备用模型不加载
+                adapter_dir=None,
+            )
+    return _fallback_manager
+
+
+def initialize_model() -> Any:
+    """
+    初始化全局模型管理器并加载模型
+
+    Returns:
+        已加载模型的管理器实例
+    """
+    manager = get_model_manager()
+    if not manager.is_loaded:
+        manager.load_model()
+    return manager
+
+
+def initialize_fallback_model(usage_tracker: Optional[UsageTracker] = None) -> Optional[Any]:
+    """加载备用小模型（未配置时返回None）；应在服务启动时调用，避免过载时才加载"""
+    manager = get_fallback_manager(usage_tracker)
+    if manager is not None and not manager.is_loaded:
+        manager.load_model()
+    return manager
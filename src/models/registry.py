@@ -0,0 +1,349 @@
+"""
+模型注册表模块 - Model Registry
+在一个进程中提供多个模型（如极速2B与品质8B）：按请求选择模型，首次使用时加载，
+按权重大小估算并记录内存占用，超出预算时卸载最久未使用的模型；默认模型可常驻
+"""
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    MODEL_BACKEND,
+    DEVICE_MAP,
+    MODEL_REGISTRY,
+    DEFAULT_MODEL,
+    MODEL_PIN_DEFAULT,
+    MODEL_MEMORY_BUDGET_GB,
+    MODEL_MEMORY_BUDGET_FRACTION,
+    STUB_SECONDS_PER_TOKEN,
+)
+
+# 权重文件的后缀（估算加载前的内存占用）
+WEIGHT_SUFFIXES = (".safetensors", ".bin")
+
+_GB = 1024 ** 3
+
+
+def estimate_model_bytes(spec: Dict[str, Any]) -> int:
+    """
+    加载前估算模型的内存占用：本地目录取权重文件总大小，否则取 memory_gb
+
+    权重以相同精度加载时，内存占用与权重文件大小基本一致。
+    """
+    path = Path(str(spec.get("path", "")))
+    if path.is_dir():
+        total = sum(
+            weight.stat().st_size
+            for weight in path.iterdir()
+            if weight.suffix in WEIGHT_SUFFIXES
+        )
+        if total:
+            return total
+    return int(float(spec.get("memory_gb") or 0) * _GB)
+
+
+def default_memory_budget() -> Optional[int]:
+    """按配置计算内存预算（字节）；未配置且无GPU时为None（不限）"""
+    if MODEL_MEMORY_BUDGET_GB is not None:
+        return int(MODEL_MEMORY_BUDGET_GB * _GB)
+    if MODEL_BACKEND == "stub":
+        return None
+    import torch
+    if not torch.cuda.is_available():
+        return None
+    total = sum(torch.cuda.get_device_properties(index).total_memory for index in range(torch.cuda.device_count()))
+    return int(total * MODEL_MEMORY_BUDGET_FRACTION)
+
+
+@dataclass
+class RegisteredModel:
+    """注册表中的一个模型及其加载状态"""
+
+    name: str
+    spec: Dict[str, Any]
+    backend: Any
+    pinned: bool = False
+    estimated_bytes: int = 0
+    loaded_bytes: int = 0
+    reserved_bytes: int = 0
+    in_use: int = 0
+    last_used: float = 0.0
+    loads: int = 0
+    evictions: int = 0
+    requests: int = 0
+    load_seconds: float = 0.0
+    load_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(getattr(self.backend, "is_loaded", False))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "label": self.spec.get("label", self.name),
+            "path": str(self.spec.get("path")),
+            "loaded": self.is_loaded,
+            "pinned": self.pinned,
+            "in_use": self.in_use,
+            "memory_mb": round((self.loaded_bytes or self.estimated_bytes) / 1024 ** 2, 1),
+            "estimated": not self.loaded_bytes,
+            "requests": self.requests,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "last_load_seconds": round(self.load_seconds, 2),
+        }
+
+
+class ModelRegistry:
+    """
+    多模型注册表
+
+    对外提供与 ModelManager 相同的 generate / generate_batch / generate_stream
+    接口，额外的 model 参数选择模型（默认 default）。模型在首次请求时加载：
+    加载前按估算占用腾出空间，依次卸载最久未使用、未固定且没有进行中请求的模型；
+    加载后改用实测占用记账。同一模型的并发请求只加载一次。
+
+    后端由 factory(名称, 配置) 创建，需实现 load_model / unload_model / memory_bytes，
+    可以是 ModelManager（含 device_map="cpu" 的小模型）或 StubModelManager。
+
+    Example:
+        >>> registry = ModelRegistry(
+        ...     {"small": {"path": "s"}, "large": {"path": "l"}}, default="large",
+        ...     budget_bytes=16 * 1024 ** 3,
+        ...     factory=lambda name, spec: StubModelManager(name, memory_bytes=6 * 1024 ** 3),
+        ... )
+        >>> registry.load_model()                              # 加载默认模型
+        >>> poem, usage = registry.generate(messages, model="small")
+        >>> [m["name"] for m in registry.models() if m["loaded"]]
+        ['large', 'small']
+    """
+
+    def __init__(
+        self,
+        specs: Dict[str, Dict[str, Any]],
+        default: str,
+        factory: Callable[[str, Dict[str, Any]], Any],
+        budget_bytes: Optional[int] = None,
+        pin_default: bool = MODEL_PIN_DEFAULT,
+        usage_tracker: Any = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if default not in specs:
+            raise ValueError(f"默认模型 {default} 不在注册表中")
+        self.default = default
+        self.budget_bytes = budget_bytes
+        self.usage_tracker = usage_tracker
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[str, RegisteredModel] = {
+            name: RegisteredModel(
+                name=name,
+                spec=spec,
+                backend=factory(name, spec),
+                pinned=pin_default and name == default,
+                estimated_bytes=estimate_model_bytes(spec),
+            )
+            for name, spec in specs.items()
+        }
+        self.model_path = self._entries[default].spec.get("path")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    @property
+    def model_names(self) -> List[str]:
+        """可按请求选择的模型名（界面与接口据此展示模型选项）"""
+        return list(self._entries)
+
+    def label(self, name: str) -> str:
+        return self._entries[name].spec.get("label", name)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._entries[self.default].is_loaded
+
+    def load_model(self) -> None:
+        """加载默认模型"""
+        self._ensure_loaded(self._entries[self.default])
+
+    def resolve(self, name: Optional[str]) -> str:
+        """
+        请求使用的模型名（未指定时为默认模型）
+
+        Raises:
+            ValueError: 模型不在注册表中
+        """
+        name = name or self.default
+        if name not in self._entries:
+            raise ValueError(f"未知模型：{name}，可选：{'、'.join(self._entries)}")
+        return name
+
+    def pin(self, name: str, pinned: bool = True) -> None:
+        """固定（或取消固定）模型，固定的模型不会被淘汰"""
+        with self._lock:
+            self._entries[self.resolve(name)].pinned = pinned
+
+    def _used_bytes(self) -> int:
+        return sum(
+            (entry.loaded_bytes if entry.is_loaded else 0) + entry.reserved_bytes
+            for entry in self._entries.values()
+        )
+
+    def _make_room(self, target: RegisteredModel, needed: int) -> None:
+        """持有 _lock 时调用：卸载最久未使用的模型直到放得下 needed 字节"""
+        if self.budget_bytes is None:
+            return
+        while self._used_bytes() + needed > self.budget_bytes:
+            candidates = [
+                entry for entry in self._entries.values()
+                if entry is not target and entry.is_loaded and not entry.pinned and entry.in_use == 0
+            ]
+            if not candidates:
+                raise RuntimeError(
+                    f"内存预算不足：加载 {target.name} 约需 {needed / _GB:.1f}GB，"
+                    f"已用 {self._used_bytes() / _GB:.1f}GB / {self.budget_bytes / _GB:.1f}GB，"
+                    "且没有可卸载的模型，请稍后重试。"
+                )
+            victim = min(candidates, key=lambda entry: entry.last_used)
+            print(f"[registry] 卸载最久未使用的模型 {victim.name}，为 {target.name} 腾出内存")
+            victim.backend.unload_model()
+            victim.loaded_bytes = 0
+            victim.evictions += 1
+
+    def _ensure_loaded(self, entry: RegisteredModel) -> None:
+        with entry.load_lock:
+            if entry.is_loaded:
+                return
+            with self._lock:
+                self._make_room(entry, entry.estimated_bytes)
+                entry.reserved_bytes = entry.estimated_bytes
+            print(f"[registry] 正在加载模型 {entry.name}（{entry.spec.get('path')}）")
+            start = time.perf_counter()
+            try:
+                entry.backend.load_model()
+            except Exception as exc:
+                # 路径错误、权重损坏或显存不足等统一转为 RuntimeError，由界面与接口给出提示
+                raise RuntimeError(f"模型 {entry.name} 加载失败（{entry.spec.get('path')}）：{exc}") from exc
+            finally:
+                with self._lock:
+                    entry.reserved_bytes = 0
+            measured = int(entry.backend.memory_bytes()) if hasattr(entry.backend, "memory_bytes") else 0
+            with self._lock:
+                entry.loaded_bytes = measured or entry.estimated_bytes
+                # 下次加载按实测占用腾出空间
+                entry.estimated_bytes = entry.loaded_bytes
+                entry.loads += 1
+                entry.load_seconds = time.perf_counter() - start
+                # 估算偏小导致超出预算时，尽量卸载其他空闲模型
+                try:
+                    self._make_room(entry, 0)
+                except RuntimeError as exc:
+                    print(f"⚠️ [registry] {exc}")
+
+    @contextmanager
+    def acquire(self, name: Optional[str] = None) -> Iterator[Any]:
+        """
+        取得模型后端用于推理（必要时先加载），使用期间不会被淘汰
+
+        Yields:
+            所选模型的后端实例
+        """
+        with self._lock:
+            entry = self._entries[self.resolve(name)]
+            entry.in_use += 1
+            entry.requests += 1
+            entry.last_used = self._clock()
+        try:
+            self._ensure_loaded(entry)
+            yield entry.backend
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = self._clock()
+
+    def generate(self, messages, model: Optional[str] = None, **kwargs):
+        with self.acquire(model) as backend:
+            return backend.generate(messages=messages, **kwargs)
+
+    def generate_batch(self, conversations, model: Optional[str] = None, **kwargs):
+        with self.acquire(model) as backend:
+            return backend.generate_batch(conversations, **kwargs)
+
+    def generate_stream(self, messages, model: Optional[str] = None, **kwargs):
+        with self.acquire(model) as backend:
+            yield from backend.generate_stream(messages=messages, **kwargs)
+
+    def models(self) -> List[Dict[str, Any]]:
+        """各模型的加载状态、内存占用与请求计数"""
+        with self._lock:
+            return [entry.snapshot() for entry in self._entries.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            used = self._used_bytes()
+        return {
+            "default": self.default,
+            "budget_mb": round(self.budget_bytes / 1024 ** 2, 1) if self.budget_bytes is not None else None,
+            "used_mb": round(used / 1024 ** 2, 1),
+            "models": self.models(),
+        }
+
+    def get_model_info(self) -> Dict[str, Any]:
+        info = dict(self._entries[self.default].backend.get_model_info())
+        info["可选模型"] = "、".join(
+            f"{name}{'（已加载）' if entry.is_loaded else ''}" for name, entry in self._entries.items()
+        )
+        budget = self.budget_bytes
+        info["模型内存预算"] = f"{budget / _GB:.1f}GB" if budget is not None else "不限"
+        return info
+
+
+def create_model_registry(
+    usage_tracker: Optional[Any] = None,
+    specs: Optional[Dict[str, Dict[str, Any]]] = None,
+    default: str = DEFAULT_MODEL,
+) -> ModelRegistry:
+    """
+    按配置创建模型注册表（尚未加载模型）
+
+    模拟后端下每个模型对应一个桩模型（可用 stub_seconds_per_token 区分速度，
+    memory_gb 作为模拟占用），所有模型共享同一个用量记录器。
+    """
+    from src.models.model_manager import ModelManager
+    from src.models.stub_backend import StubModelManager
+    from src.models.usage import UsageTracker
+
+    tracker = usage_tracker or UsageTracker()
+
+    def factory(name: str, spec: Dict[str, Any]) -> Any:
+        if MODEL_BACKEND == "stub":
+            backend = StubModelManager(
+                name=name,
+                seconds_per_token=spec.get("stub_seconds_per_token", STUB_SECONDS_PER_TOKEN),
+                usage_tracker=tracker,
+                memory_bytes=estimate_model_bytes(spec),
+                adapter_dir=spec.get("adapter_dir"),
+            )
+            # 与真实模型一致：首次请求时才加载
+            backend.is_loaded = False
+            return backend
+        return ModelManager(
+            model_path=spec["path"],
+            device_map=spec.get("device_map", DEVICE_MAP),
+            usage_tracker=tracker,
+            adapter_dir=spec.get("adapter_dir"),
+        )
+
+    return ModelRegistry(
+        MODEL_REGISTRY if specs is None else specs,
+        default=default,
+        factory=factory,
+        budget_bytes=default_memory_budget(),
+        usage_tracker=tracker,
+    )
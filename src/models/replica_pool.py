@@ -0,0 +1,242 @@
+"""
+模型副本池模块 - Replica Pool
+每个设备组加载一个完整模型副本，按最少在途工作量分发请求（数据并行）
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    DEFAULT_MAX_TOKENS,
+    REPLICA_FAILURE_THRESHOLD,
+    REPLICA_RECOVERY_SECONDS,
+)
+
+
+class BackendFailure(RuntimeError):
+    """
+    推理后端自身的故障（设备错误、模型未加载等）
+
+    副本池只按这类异常判断副本健康；提示过长、显存不足等请求本身的问题
+    仍为普通 RuntimeError，换个副本重试也不会成功，不应暂停副本。
+    """
+
+
+class Replica:
+    """
+    单个模型副本及其健康状态
+
+    后端故障（BackendFailure）连续达到阈值后进入不健康状态，冷却期结束后
+    允许一次试探请求，成功即恢复健康，失败则重新进入冷却。请求本身的错误
+    说明副本能正常处理请求，按成功计。
+    """
+
+    def __init__(self, name: str, backend: Any):
+        self.name = name
+        self.backend = backend
+        self.outstanding_requests = 0
+        self.outstanding_work = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until: Optional[float] = None
+        self.total_requests = 0
+        self.total_failures = 0
+        self.last_error: Optional[str] = None
+
+    def is_available(self, now: float) -> bool:
+        if self.unhealthy_until is None:
+            return True
+        # 冷却结束后同一时间只放行一个试探请求
+        return self.unhealthy_until <= now and self.outstanding_requests == 0
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "healthy": self.unhealthy_until is None,
+            "available": self.is_available(now),
+            "outstanding_requests": self.outstanding_requests,
+            "outstanding_work": self.outstanding_work,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "last_error": self.last_error,
+        }
+
+
+class ReplicaPool:
+    """
+    模型副本池
+
+    对外提供与 ModelManager 相同的 generate / generate_batch / generate_stream
+    接口。每次请求选择在途工作量（在途请求的 max_new_tokens 之和）最小的
+    可用副本；副本可以是真实的 ModelManager，也可以是 StubModelManager。
+
+    Example:
+        >>> pool = ReplicaPool([StubModelManager("a"), StubModelManager("b")])
+        >>> poem, usage = pool.generate(messages, format_choice="五言绝句")
+        >>> pool.health()[0]["total_requests"]
+        1
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[Any],
+        names: Optional[Sequence[str]] = None,
+        failure_threshold: int = REPLICA_FAILURE_THRESHOLD,
+        recovery_seconds: float = REPLICA_RECOVERY_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not backends:
+            raise ValueError("副本池至少需要一个副本")
+        names = names or [f"replica-{index}" for index in range(len(backends))]
+        self.replicas = [Replica(name, backend) for name, backend in zip(names, backends)]
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        first = backends[0]
+        self.model_path = getattr(first, "model_path", None)
+        self.usage_tracker = getattr(first, "usage_tracker", None)
+
+    @property
+    def is_loaded(self) -> bool:
+        return all(getattr(r.backend, "is_loaded", True) for r in self.replicas)
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    def load_model(self) -> None:
+        """各副本位于不同的设备组，由线程并行加载"""
+        pending = [replica for replica in self.replicas if not getattr(replica.backend, "is_loaded", True)]
+
+        def load(replica: Replica) -> None:
+            print(f"正在加载副本 {replica.name}...")
+            replica.backend.load_model()
+
+        with ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+            # list() 使任一副本的加载异常在此抛出
+            list(pool.map(load, pending))
+
+    def _select(self, work: int) -> Replica:
+        with self._lock:
+            now = self._clock()
+            candidates = [r for r in self.replicas if r.is_available(now)]
+            if not candidates:
+                raise RuntimeError("所有模型副本均不可用，请稍后重试。")
+            replica = min(
+                candidates,
+                key=lambda r: (r.outstanding_work, r.outstanding_requests, r.total_requests),
+            )
+            replica.outstanding_requests += 1
+            replica.outstanding_work += work
+            replica.total_requests += 1
+            return replica
+
+    def _release(self, replica: Replica, work: int, error: Optional[BaseException]) -> None:
+        with self._lock:
+            replica.outstanding_requests -= 1
+            replica.outstanding_work -= work
+            if not isinstance(error, BackendFailure):
+                replica.consecutive_failures = 0
+                replica.unhealthy_until = None
+                return
+            replica.total_failures += 1
+            replica.consecutive_failures += 1
+            replica.last_error = str(error)
+            if replica.consecutive_failures >= self.failure_threshold:
+                replica.unhealthy_until = self._clock() + self.recovery_seconds
+                print(f"⚠️ 副本 {replica.name} 连续失败 {replica.consecutive_failures} 次，暂停分发")
+
+    @contextmanager
+    def acquire(self, work: int = DEFAULT_MAX_TOKENS) -> Iterator[Any]:
+        """
+        获取一个副本的后端用于推理，结束后自动归还并更新健康状态
+
+        Args:
+            work: 该请求的预估工作量（通常取 max_new_tokens）
+
+        Yields:
+            选中副本的后端实例
+        """
+        replica = self._select(work)
+        error: Optional[BaseException] = None
+        try:
+            yield replica.backend
+        except GeneratorExit:
+            # 流式请求被调用方提前关闭，不计为副本故障
+            raise
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            self._release(replica, work, error)
+
+    def generate(self, messages, max_new_tokens: int = DEFAULT_MAX_TOKENS, **kwargs):
+        with self.acquire(int(max_new_tokens)) as backend:
+            return backend.generate(messages=messages, max_new_tokens=max_new_tokens, **kwargs)
+
+    def generate_batch(self, conversations, max_new_tokens: int = DEFAULT_MAX_TOKENS, **kwargs):
+        with self.acquire(int(max_new_tokens) * len(conversations)) as backend:
+            return backend.generate_batch(
+                conversations, max_new_tokens=max_new_tokens, **kwargs
+            )
+
+    def generate_stream(self, messages, max_new_tokens: int = DEFAULT_MAX_TOKENS, **kwargs):
+        with self.acquire(int(max_new_tokens)) as backend:
+            yield from backend.generate_stream(
+                messages=messages, max_new_tokens=max_new_tokens, **kwargs
+            )
+
+    def health(self) -> List[Dict[str, Any]]:
+        """获取各副本的健康状态与负载快照"""
+        with self._lock:
+            now = self._clock()
+            return [replica.snapshot(now) for replica in self.replicas]
+
+    def get_model_info(self) -> Dict[str, Any]:
+        info = dict(self.replicas[0].backend.get_model_info())
+        info["副本数"] = len(self.replicas)
+        info["副本"] = ", ".join(r.name for r in self.replicas)
+        return info
+
+
+def _device_map_for_group(group: Sequence[int]) -> Dict[str, Any]:
+    """为设备组生成 from_pretrained 的设备参数"""
+    if len(group) == 1:
+        return {"device_map": {"": f"cuda:{group[0]}"}}
+    import torch
+    # 多卡设备组内自动切分，通过 max_memory 限制只使用组内的卡
+    max_memory = {
+        index: torch.cuda.get_device_properties(index).total_memory
+        for index in group
+    }
+    return {"device_map": "auto", "max_memory": max_memory}
+
+
+def create_replica_pool(
+    device_groups: Sequence[Sequence[int]],
+    usage_tracker: Optional[Any] = None,
+) -> ReplicaPool:
+    """
+    按设备组创建副本池（尚未加载模型）
+
+    Args:
+        device_groups: 设备组列表，如 [[0], [1], [2, 3]]
+        usage_tracker: 共享的用量记录器（默认按配置新建）
+
+    Returns:
+        副本池实例，所有副本共享同一个用量记录器
+    """
+    from src.models.model_manager import ModelManager
+    from src.models.usage import UsageTracker
+
+    tracker = usage_tracker or UsageTracker()
+    backends = [
+        ModelManager(usage_tracker=tracker, **_device_map_for_group(group))
+        for group in device_groups
+    ]
+    names = ["cuda:" + "+".join(str(index) for index in group) for group in device_groups]
+    return ReplicaPool(backends, names=names)
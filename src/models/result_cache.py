@@ -0,0 +1,201 @@
+"""
+结果缓存模块 - Result Cache
+对固定随机种子的重复请求复用生成结果（内存LRU + 可选磁盘持久化）
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_DIR,
+)
+
+# 缓存键格式版本，键的组成方式变化时递增以废弃旧的磁盘缓存
+CACHE_KEY_VERSION = 2
+
+
+def normalize_instruction(text: str) -> str:
+    """规范化用户提示：去除首尾空白并合并连续空白"""
+    return " ".join((text or "").split())
+
+
+def build_cache_key(
+    image_digest: str,
+    format_choice: str,
+    style_choice: str,
+    user_instruction: str,
+    history: List[Tuple[str, str]],
+    sampling: Dict[str, Any],
+) -> str:
+    """
+    构建结果缓存键
+
+    Args:
+        image_digest: 原始图片文件的摘要（见 ImageStore.put）
+        format_choice: 诗词格式
+        style_choice: 创作风格
+        user_instruction: 用户提示（会被规范化）
+        history: 对话历史，以摘要形式参与键计算
+        sampling: 采样参数（max_new_tokens/top_p/temperature/seed 等）
+
+    Returns:
+        十六进制缓存键
+    """
+    history_digest = hashlib.sha256(
+        json.dumps(history, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    payload = json.dumps(
+        {
+            "v": CACHE_KEY_VERSION,
+            "image": image_digest,
+            "format": format_choice,
+            "style": style_choice,
+            "instruction": normalize_instruction(user_instruction),
+            "history": history_digest,
+            "sampling": sampling,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    生成结果缓存
+
+    内存中为带TTL的LRU；配置了 cache_dir 时同时写入磁盘，
+    内存未命中时回读磁盘，进程重启后仍可复用。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds: Optional[float] = RESULT_CACHE_TTL_SECONDS,
+        cache_dir: Optional[Path] = RESULT_CACHE_DIR,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl_seconds if self.ttl_seconds else None
+
+    @staticmethod
+    def _is_expired(expires_at: Optional[float]) -> bool:
+        return expires_at is not None and expires_at < time.time()
+
+    def _remember(self, key: str, expires_at: Optional[float], value: Dict[str, Any]) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[Optional[float], Dict[str, Any]]]:
+        path = self._disk_path(key)
+        try:
+            with path.open(encoding="utf-8") as fh:
+                record = json.load(fh)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if self._is_expired(record.get("expires_at")):
+            path.unlink(missing_ok=True)
+            return None
+        return record.get("expires_at"), record["value"]
+
+    def _write_disk(self, key: str, expires_at: Optional[float], value: Dict[str, Any]) -> None:
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as fh:
+            json.dump({"expires_at": expires_at, "value": value}, fh, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存
+
+        Args:
+            key: build_cache_key 生成的缓存键
+
+        Returns:
+            命中时返回缓存的结果字典，否则返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[0]):
+                del self._entries[key]
+                entry = None
+            if entry is None and self.cache_dir is not None:
+                entry = self._read_disk(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._remember(key, *entry)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 可JSON序列化的结果字典
+        """
+        expires_at = self._expires_at()
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self.cache_dir is not None:
+                try:
+                    self._write_disk(key, expires_at, value)
+                except OSError as exc:
+                    print(f"⚠️ 结果缓存写入磁盘失败：{exc}")
+
+    def clear(self) -> None:
+        """清空内存缓存（磁盘文件保留，依赖TTL过期）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "persistent": self.cache_dir is not None,
+            }
+
+
+# 全局结果缓存实例
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """获取全局结果缓存；未启用缓存时返回None"""
+    global _result_cache
+    if not RESULT_CACHE_ENABLED:
+        return None
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
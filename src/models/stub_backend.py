@@ -0,0 +1,289 @@
+"""
+桩模型模块 - Stub Backend
+不依赖GPU与模型权重的模拟后端，按格式生成固定版式的占位诗句，
+并按token数模拟推理耗时，用于本地开发、压测与调度逻辑验证
+"""
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_TOP_P,
+    DEFAULT_TEMPERATURE,
+    STUB_PREFILL_SECONDS,
+    STUB_SECONDS_PER_TOKEN,
+    STYLE_ADAPTER_DIR,
+)
+from src.constants.templates import FORMAT_GUIDE
+from src.models.adapters import AdapterCache, discover_style_adapters
+from src.models.replica_pool import BackendFailure
+from src.models.usage import UsageTracker
+from src.models.vision_budget import VisionBudgetPolicy
+from src.serving.cancellation import CancellationToken
+
+# 占位诗句的字库
+STUB_CHARSET = "山水云月风花雪江天秋春夜烟霞松竹舟鸿归远清长孤寒星河"
+
+# 词等变长格式使用的句式
+STUB_CI_LINE_LENGTHS = [4, 5, 7, 6, 4, 5, 7, 6]
+
+Messages = List[Dict[str, Any]]
+
+
+def stub_poem(format_choice: Optional[str], salt: str = "") -> str:
+    """
+    按格式生成确定性的占位诗句
+
+    Args:
+        format_choice: 诗词格式（FORMAT_GUIDE 的键）
+        salt: 参与取字的扰动串，相同输入得到相同诗句
+
+    Returns:
+        占位诗句，每句一行
+    """
+    guide = FORMAT_GUIDE.get(format_choice or "", {})
+    lines = guide.get("lines")
+    chars_per_line = guide.get("chars_per_line")
+    if isinstance(lines, int) and isinstance(chars_per_line, int):
+        lengths = [chars_per_line] * lines
+    else:
+        lengths = STUB_CI_LINE_LENGTHS
+
+    seed = hashlib.sha256(f"{format_choice}|{salt}".encode("utf-8")).digest()
+    poem_lines = []
+    offset = 0
+    for index, length in enumerate(lengths):
+        chars = "".join(
+            STUB_CHARSET[seed[(offset + i) % len(seed)] % len(STUB_CHARSET)]
+            for i in range(length)
+        )
+        offset += length
+        poem_lines.append(chars + ("。" if index % 2 else "，"))
+    return "\n".join(poem_lines)
+
+
+class StubModelManager:
+    """
+    模拟模型管理器
+
+    接口与 ModelManager 一致（generate / generate_batch / generate_stream /
+    get_model_info），推理耗时 = 预填充耗时 + 生成token数 × 单token耗时。
+    """
+
+    def __init__(
+        self,
+        name: str = "stub",
+        prefill_seconds: float = STUB_PREFILL_SECONDS,
+        seconds_per_token: float = STUB_SECONDS_PER_TOKEN,
+        usage_tracker: Optional[UsageTracker] = None,
+        fail: bool = False,
+        memory_bytes: int = 0,
+        adapter_dir: Optional[str] = STYLE_ADAPTER_DIR,
+    ):
+        self.model_path = name
+        self.prefill_seconds = prefill_seconds
+        self.seconds_per_token = seconds_per_token
+        self.usage_tracker = usage_tracker or UsageTracker(log_path=None)
+        self.vision_budget = VisionBudgetPolicy()
+        # 置为True时每次生成都抛出异常，用于验证故障处理
+        self.fail = fail
+        # 模拟的模型内存占用，用于验证模型注册表的内存预算与淘汰
+        self._memory_bytes = memory_bytes
+        # 与真实后端相同的适配器路由与淘汰（不加载权重），用量记录中可观察所用适配器
+        self.adapters = AdapterCache(
+            discover_style_adapters(adapter_dir),
+            load=lambda name, path: None,
+            unload=lambda name: None,
+        )
+        self.is_loaded = True
+        self._generate_lock = threading.Lock()
+
+    def load_model(self) -> None:
+        self.is_loaded = True
+
+    def unload_model(self) -> None:
+        with self._generate_lock:
+            self.is_loaded = False
+            self.adapters.clear()
+
+    def memory_bytes(self) -> int:
+        return self._memory_bytes if self.is_loaded else 0
+
+    @staticmethod
+    def _salt(messages: Messages) -> str:
+        texts = [
+            item.get("text", "")
+            for message in messages
+            for item in message.get("content", [])
+            if item.get("type") == "text"
+        ]
+        return "|".join(texts)
+
+    def _usage(
+        self,
+        format_choice: Optional[str],
+        style_choice: Optional[str],
+        generated_tokens: int,
+        max_new_tokens: int,
+        seed: Optional[int],
+        batch_size: int,
+        latency: float,
+        stop_reason: Optional[str] = None,
+        vision_budget: Optional[Dict[str, int]] = None,
+        do_sample: bool = True,
+        adapter: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        usage = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "format": format_choice,
+            "style": style_choice,
+            "prompt_tokens": 0,
+            "image_tokens": 0,
+            "generated_tokens": generated_tokens,
+            "max_new_tokens": int(max_new_tokens),
+            "do_sample": do_sample,
+            "adapter": adapter,
+            "seed": seed,
+            "batch_size": batch_size,
+            "latency_seconds": round(latency, 3),
+            "tokens_per_second": round(generated_tokens / latency, 2) if latency > 0 else 0.0,
+            "peak_memory_mb": None,
+            "stop_reason": stop_reason,
+            "backend": self.model_path,
+            **(vision_budget or {}),
+        }
+        self.usage_tracker.record(usage)
+        return usage
+
+    def generate(
+        self,
+        messages: Messages,
+        image: Any = None,
+        max_new_tokens: int = DEFAULT_MAX_TOKENS,
+        top_p: float = DEFAULT_TOP_P,
+        temperature: float = DEFAULT_TEMPERATURE,
+        do_sample: bool = True,
+        format_choice: Optional[str] = None,
+        style_choice: Optional[str] = None,
+        seed: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        queue_depth: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        return self.generate_batch(
+            [messages],
+            max_new_tokens=max_new_tokens,
+            top_p=top_p,
+            temperature=temperature,
+            do_sample=do_sample,
+            format_choices=[format_choice],
+            style_choices=[style_choice],
+            seed=seed,
+            cancel_token=cancel_token,
+            queue_depth=queue_depth,
+        )[0]
+
+    def generate_batch(
+        self,
+        conversations: List[Messages],
+        max_new_tokens: int = DEFAULT_MAX_TOKENS,
+        top_p: float = DEFAULT_TOP_P,
+        temperature: float = DEFAULT_TEMPERATURE,
+        do_sample: bool = True,
+        format_choices: Optional[List[Optional[str]]] = None,
+        style_choices: Optional[List[Optional[str]]] = None,
+        seed: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        queue_depth: Optional[int] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        if self.fail:
+            raise BackendFailure(f"模拟后端 {self.model_path} 推理失败")
+        if not self.is_loaded:
+            raise BackendFailure("模型尚未加载，请先调用 initialize_model()。")
+
+        batch_size = len(conversations)
+        format_choices = format_choices or [None] * batch_size
+        style_choices = style_choices or [None] * batch_size
+        # 与真实后端相同的预算选择与缩放，用量记录中可观察预算随负载的变化
+        conversations, budgets = self.vision_budget.prepare(conversations, format_choices, queue_depth)
+        poems = [
+            stub_poem(format_choice, f"{self._salt(messages)}|{seed}")[: int(max_new_tokens)]
+            for messages, format_choice in zip(conversations, format_choices)
+        ]
+        # 批内各行并行解码，耗时取决于最长的一行；每个解码步检查取消令牌
+        longest = max((len(poem) for poem in poems), default=0)
+        stop_reason = None
+        start = time.perf_counter()
+        with self._generate_lock:
+            adapter_names = self.adapters.acquire(style_choices) or [None] * batch_size
+            time.sleep(self.prefill_seconds)
+            steps = 0
+            while steps < longest:
+                stop_reason = cancel_token.stop_reason() if cancel_token is not None else None
+                if stop_reason is not None:
+                    break
+                time.sleep(self.seconds_per_token)
+                steps += 1
+        latency = time.perf_counter() - start
+
+        return [
+            (poem[:steps], self._usage(
+                format_choice, style_choice, len(poem[:steps]), max_new_tokens, seed, batch_size, latency,
+                stop_reason, budget, do_sample, adapter,
+            ))
+            for poem, format_choice, style_choice, budget, adapter
+            in zip(poems, format_choices, style_choices, budgets, adapter_names)
+        ]
+
+    def generate_stream(
+        self,
+        messages: Messages,
+        max_new_tokens: int = DEFAULT_MAX_TOKENS,
+        top_p: float = DEFAULT_TOP_P,
+        temperature: float = DEFAULT_TEMPERATURE,
+        do_sample: bool = True,
+        format_choice: Optional[str] = None,
+        style_choice: Optional[str] = None,
+        seed: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        queue_depth: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        if self.fail:
+            raise BackendFailure(f"模拟后端 {self.model_path} 推理失败")
+        if not self.is_loaded:
+            raise BackendFailure("模型尚未加载，请先调用 initialize_model()。")
+
+        (messages,), (budget,) = self.vision_budget.prepare([messages], [format_choice], queue_depth)
+        poem = stub_poem(format_choice, f"{self._salt(messages)}|{seed}")[: int(max_new_tokens)]
+        start = time.perf_counter()
+        stop_reason = None
+        generated = ""
+        with self._generate_lock:
+            adapter_names = self.adapters.acquire([style_choice])
+            time.sleep(self.prefill_seconds)
+            for char in poem:
+                stop_reason = cancel_token.stop_reason() if cancel_token is not None else None
+                if stop_reason is not None:
+                    break
+                time.sleep(self.seconds_per_token)
+                generated += char
+                yield {"type": "delta", "text": char}
+        latency = time.perf_counter() - start
+        usage = self._usage(
+            format_choice, style_choice, len(generated), max_new_tokens, seed, 1, latency, stop_reason, budget,
+            do_sample, adapter_names[0] if adapter_names else None,
+        )
+        yield {"type": "done", "text": generated, "usage": usage}
+
+    def get_model_info(self) -> Dict[str, Any]:
+        return {
+            "模型路径": self.model_path,
+            "后端": "stub（模拟推理）",
+            "预填充耗时": f"{self.prefill_seconds}s",
+            "单token耗时": f"{self.seconds_per_token}s",
+            "已加载": self.is_loaded,
+        }
@@ -0,0 +1,165 @@
+"""
+用量统计模块 - Usage Tracker
+记录每次生成的token数、速度与显存峰值，并按格式/风格聚合
+"""
+import json
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    USAGE_LOG_ENABLED,
+    USAGE_LOG_PATH,
+    USAGE_LOG_MAX_BYTES,
+    USAGE_LOG_BACKUP_COUNT,
+    USAGE_TOKEN_SAMPLES,
+)
+
+# 未指定格式/风格时的聚合键
+UNKNOWN_KEY = "未指定"
+
+
+def _new_aggregate() -> Dict[str, float]:
+    return {
+        "requests": 0,
+        "prompt_tokens": 0,
+        "image_tokens": 0,
+        "generated_tokens": 0,
+        "max_generated_tokens": 0,
+        "latency_seconds": 0.0,
+        "peak_memory_mb": 0.0,
+        "vision_max_pixels": 0,
+        "image_pixels": 0,
+        "image_count": 0,
+    }
+
+
+class UsageTracker:
+    """
+    生成用量记录器
+
+    每条用量记录会：
+    1. 累加到按 (格式, 风格) 分组的内存聚合中
+    2. 自然结束的生成（未取消、未到时限、未触及 max_new_tokens）按格式保留最近的生成token数，
+       供分位数统计
+    3. 以一行JSON的形式追加到滚动日志（超过大小上限自动轮转）
+
+    Example:
+        >>> tracker = UsageTracker(log_path=None)
+        >>> tracker.record({"format": "五言绝句", "style": "婉约抒情风",
+        ...                 "prompt_tokens": 812, "generated_tokens": 31})
+        >>> tracker.summary()["五言绝句|婉约抒情风"]["requests"]
+        1
+    """
+
+    def __init__(
+        self,
+        log_path: Optional[Path] = USAGE_LOG_PATH if USAGE_LOG_ENABLED else None,
+        max_bytes: int = USAGE_LOG_MAX_BYTES,
+        backup_count: int = USAGE_LOG_BACKUP_COUNT,
+        token_samples: int = USAGE_TOKEN_SAMPLES,
+    ):
+        self.log_path = Path(log_path) if log_path else None
+        self._lock = threading.Lock()
+        self._aggregates: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._token_samples = token_samples
+        self._generated: Dict[str, Deque[int]] = {}
+        self._logger: Optional[logging.Logger] = None
+
+        if self.log_path is not None:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                self.log_path,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            # 每个日志文件对应独立的logger，避免重复挂载handler
+            logger = logging.getLogger(f"poetry.usage.{self.log_path}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            for old in list(logger.handlers):
+                logger.removeHandler(old)
+                old.close()
+            logger.addHandler(handler)
+            self._logger = logger
+
+    def record(self, usage: Dict[str, Any]) -> None:
+        """
+        记录一次生成的用量
+
+        Args:
+            usage: 用量记录字典，需包含 format/style 及各项token统计
+        """
+        key = (
+            usage.get("format") or UNKNOWN_KEY,
+            usage.get("style") or UNKNOWN_KEY,
+        )
+        generated = int(usage.get("generated_tokens") or 0)
+        limit = usage.get("max_new_tokens")
+        # 被截断的生成只说明上限，不代表该格式实际需要的长度
+        finished = usage.get("stop_reason") is None and (limit is None or generated < int(limit))
+
+        with self._lock:
+            if finished:
+                self._generated.setdefault(key[0], deque(maxlen=self._token_samples)).append(generated)
+            agg = self._aggregates.setdefault(key, _new_aggregate())
+            agg["requests"] += 1
+            agg["prompt_tokens"] += int(usage.get("prompt_tokens") or 0)
+            agg["image_tokens"] += int(usage.get("image_tokens") or 0)
+            agg["generated_tokens"] += generated
+            agg["max_generated_tokens"] = max(agg["max_generated_tokens"], generated)
+            agg["latency_seconds"] += float(usage.get("latency_seconds") or 0.0)
+            agg["vision_max_pixels"] += int(usage.get("vision_max_pixels") or 0)
+            agg["image_pixels"] += int(usage.get("image_pixels") or 0)
+            agg["image_count"] += int(usage.get("image_count") or 0)
+            agg["peak_memory_mb"] = max(
+                agg["peak_memory_mb"], float(usage.get("peak_memory_mb") or 0.0)
+            )
+
+        if self._logger is not None:
+            self._logger.info(json.dumps(usage, ensure_ascii=False))
+
+    def generated_samples(self, format_choice: Optional[str]) -> List[int]:
+        """该格式最近自然结束的生成token数"""
+        with self._lock:
+            return list(self._generated.get(format_choice or UNKNOWN_KEY, ()))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        获取按格式/风格聚合的用量摘要
+
+        Returns:
+            以 "格式|风格" 为键的摘要字典，包含请求数、平均token数、
+            平均视觉预算、实际图片像素与图片数、平均生成速度（tokens/s）和显存峰值
+        """
+        with self._lock:
+            snapshot = {key: dict(agg) for key, agg in self._aggregates.items()}
+
+        result: Dict[str, Dict[str, float]] = {}
+        for (format_name, style_name), agg in snapshot.items():
+            count = agg["requests"] or 1
+            latency = agg["latency_seconds"]
+            result[f"{format_name}|{style_name}"] = {
+                "format": format_name,
+                "style": style_name,
+                "requests": agg["requests"],
+                "avg_prompt_tokens": agg["prompt_tokens"] / count,
+                "avg_image_tokens": agg["image_tokens"] / count,
+                "avg_generated_tokens": agg["generated_tokens"] / count,
+                "max_generated_tokens": agg["max_generated_tokens"],
+                "avg_vision_max_pixels": agg["vision_max_pixels"] / count,
+                "avg_image_pixels": agg["image_pixels"] / count,
+                "avg_image_count": agg["image_count"] / count,
+                "tokens_per_second": (
+                    agg["generated_tokens"] / latency if latency > 0 else 0.0
+                ),
+                "peak_memory_mb": agg["peak_memory_mb"],
+            }
+        return result
@@ -0,0 +1,230 @@
+"""
+视觉token预算模块 - Vision Budget
+Qwen-VL 的视觉token数随图片分辨率增长。按生成通道的排队深度与诗词格式
+为每个请求选择像素上下限，生成前把图片缩放到预算内：
+短篇幅格式与高负载时使用更少的视觉token，预填充耗时随负载自动下降。
+一条消息含多张照片时共用一份总预算，按各图面积自动分配每张的分辨率
+"""
+import math
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    VISION_BUDGET_ENABLED,
+    VISION_TOKEN_SIDE,
+    VISION_MAX_TOKENS,
+    VISION_FLOOR_TOKENS,
+    VISION_MIN_TOKENS,
+    VISION_LOAD_HALF_DEPTH,
+    VISION_FORMAT_SCALE,
+    VISION_MULTI_IMAGE_SCALE,
+    VISION_MULTI_IMAGE_FLOOR_TOKENS,
+)
+from src.serving.lanes import generation_queue_depth
+
+Messages = List[Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class VisionBudget:
+    """单个请求的图片像素上下限"""
+
+    min_pixels: int
+    max_pixels: int
+    queue_depth: int
+
+    def as_usage(self, image_pixels: int, image_count: int = 1) -> Dict[str, int]:
+        """写入用量记录的字段"""
+        return {
+            "vision_min_pixels": self.min_pixels,
+            "vision_max_pixels": self.max_pixels,
+            "image_pixels": image_pixels,
+            "image_count": image_count,
+            "queue_depth": self.queue_depth,
+        }
+
+
+def fit_to_budget(width: int, height: int, budget: VisionBudget, factor: int = VISION_TOKEN_SIDE) -> Tuple[int, int]:
+    """
+    按预算计算缩放后的尺寸（宽高对齐到 factor 的倍数，保持宽高比）
+
+    与处理器的 smart_resize 规则一致：超过上限时向下取整，低于下限时向上取整，
+    因此处理器不会再次改变尺寸，视觉token数 = 宽 × 高 / factor²。
+    """
+    h_bar = max(factor, round(height / factor) * factor)
+    w_bar = max(factor, round(width / factor) * factor)
+    if h_bar * w_bar > budget.max_pixels:
+        beta = math.sqrt(height * width / budget.max_pixels)
+        h_bar = max(factor, math.floor(height / beta / factor) * factor)
+        w_bar = max(factor, math.floor(width / beta / factor) * factor)
+    elif h_bar * w_bar < budget.min_pixels:
+        beta = math.sqrt(budget.min_pixels / (height * width))
+        h_bar = math.ceil(height * beta / factor) * factor
+        w_bar = math.ceil(width * beta / factor) * factor
+    return w_bar, h_bar
+
+
+def split_budget(areas: List[int], total_pixels: int, floor_pixels: int) -> List[int]:
+    """
+    把一组图片的总像素预算分给各张图片（注水式分配）
+
+    原始面积小于平均份额的图片保持原尺寸，省下的预算依次分给更大的图片，
+    因此总量不超过 total_pixels（每张不低于 floor_pixels 时除外）。
+
+    Example:
+        >>> split_budget([100, 1000, 1000], total_pixels=900, floor_pixels=10)
+        [100, 400, 400]
+    """
+    shares = [0] * len(areas)
+    remaining = total_pixels
+    pending = sorted(range(len(areas)), key=lambda index: areas[index])
+    while pending:
+        share = remaining // len(pending)
+        index = pending[0]
+        if areas[index] > share:
+            # 剩余图片都大于平均份额：平分剩余预算
+            for index in pending:
+                shares[index] = max(floor_pixels, share)
+            break
+        shares[index] = max(floor_pixels, areas[index])
+        remaining -= areas[index]
+        pending.pop(0)
+    return shares
+
+
+class VisionBudgetPolicy:
+    """
+    视觉token预算策略
+
+    上限 = VISION_MAX_TOKENS × 格式系数 ÷ (1 + 排队深度 / VISION_LOAD_HALF_DEPTH)，
+    不低于 VISION_FLOOR_TOKENS；排队深度默认取本进程生成通道的等待任务数
+    （推理进程由界面进程随请求传入）。
+    一条消息含 N 张照片时，总上限为单张上限 × min(N, VISION_MULTI_IMAGE_SCALE)，
+    由 split_budget 按各图面积分配，每张不少于 VISION_MULTI_IMAGE_FLOOR_TOKENS。
+
+    Example:
+        >>> policy = VisionBudgetPolicy()
+        >>> budget = policy.select("五言绝句", queue_depth=8)
+        >>> messages, pixels, count = policy.apply(messages, budget)
+    """
+
+    def __init__(
+        self,
+        enabled: bool = VISION_BUDGET_ENABLED,
+        token_side: int = VISION_TOKEN_SIDE,
+        max_tokens: int = VISION_MAX_TOKENS,
+        floor_tokens: int = VISION_FLOOR_TOKENS,
+        min_tokens: int = VISION_MIN_TOKENS,
+        half_depth: float = VISION_LOAD_HALF_DEPTH,
+        format_scale: Optional[Dict[str, float]] = None,
+        multi_image_scale: float = VISION_MULTI_IMAGE_SCALE,
+        multi_image_floor_tokens: int = VISION_MULTI_IMAGE_FLOOR_TOKENS,
+        depth_source: Callable[[], int] = generation_queue_depth,
+    ):
+        self.enabled = enabled
+        self.token_side = token_side
+        self.max_tokens = max_tokens
+        self.floor_tokens = min(floor_tokens, max_tokens)
+        self.min_tokens = min(min_tokens, self.floor_tokens)
+        self.half_depth = half_depth
+        self.format_scale = VISION_FORMAT_SCALE if format_scale is None else format_scale
+        self.multi_image_scale = max(1.0, multi_image_scale)
+        self.multi_image_floor_tokens = multi_image_floor_tokens
+        self.depth_source = depth_source
+
+    def select(self, format_choice: Optional[str], queue_depth: Optional[int] = None) -> VisionBudget:
+        depth = self.depth_source() if queue_depth is None else int(queue_depth)
+        token_pixels = self.token_side ** 2
+        if not self.enabled:
+            # 关闭时只记录，不缩放图片
+            return VisionBudget(self.min_tokens * token_pixels, self.max_tokens * token_pixels, depth)
+        scale = self.format_scale.get(format_choice or "", 1.0)
+        if self.half_depth:
+            scale /= 1 + depth / self.half_depth
+        tokens = max(self.floor_tokens, min(self.max_tokens, int(self.max_tokens * scale)))
+        return VisionBudget(self.min_tokens * token_pixels, tokens * token_pixels, depth)
+
+    def image_budgets(self, sizes: List[Tuple[int, int]], budget: VisionBudget) -> List[VisionBudget]:
+        """
+        一条消息中各张图片的预算
+
+        Args:
+            sizes: 各图片的 (宽, 高)
+            budget: 该请求的预算（单张图片的上限）
+
+        Returns:
+            与 sizes 顺序一致的预算；只有一张图片时即为 budget
+        """
+        if len(sizes) <= 1:
+            return [budget] * len(sizes)
+        total = int(budget.max_pixels * min(len(sizes), self.multi_image_scale))
+        floor = min(budget.max_pixels, self.multi_image_floor_tokens * self.token_side ** 2)
+        # 每张图片也不超过单张上限
+        areas = [min(width * height, budget.max_pixels) for width, height in sizes]
+        return [
+            replace(budget, max_pixels=share, min_pixels=min(budget.min_pixels, share))
+            for share in split_budget(areas, total, floor)
+        ]
+
+    def apply(self, messages: Messages, budget: VisionBudget) -> Tuple[Messages, int, int]:
+        """
+        把消息中的图片缩放到预算内（不修改传入的消息）
+
+        Returns:
+            (新的消息列表, 缩放后图片的像素总数, 图片数)
+        """
+        pixels = 0
+        count = 0
+        result: Messages = []
+        for message in messages:
+            content = message.get("content")
+            if not isinstance(content, list) or not any(item.get("type") == "image" for item in content):
+                result.append(message)
+                continue
+            images = [
+                item["image"] for item in content
+                if item.get("type") == "image" and isinstance(item.get("image"), Image.Image)
+            ]
+            budgets = iter(self.image_budgets([image.size for image in images], budget))
+            items = []
+            for item in content:
+                image = item.get("image")
+                if item.get("type") == "image" and isinstance(image, Image.Image):
+                    size = image.size
+                    if self.enabled:
+                        size = fit_to_budget(image.width, image.height, next(budgets), self.token_side)
+                    if size != image.size:
+                        image = image.resize(size, Image.BICUBIC)
+                    pixels += image.width * image.height
+                    count += 1
+                    item = {**item, "image": image}
+                items.append(item)
+            result.append({**message, "content": items})
+        return result, pixels, count
+
+    def prepare(
+        self,
+        conversations: List[Messages],
+        format_choices: List[Optional[str]],
+        queue_depth: Optional[int] = None,
+    ) -> Tuple[List[Messages], List[Dict[str, int]]]:
+        """
+        为一批对话选择预算并缩放图片
+
+        Returns:
+            (缩放后的对话, 每组对话写入用量记录的预算字段)
+        """
+        depth = self.depth_source() if queue_depth is None else queue_depth
+        prepared: List[Messages] = []
+        usage: List[Dict[str, int]] = []
+        for messages, format_choice in zip(conversations, format_choices):
+            budget = self.select(format_choice, depth)
+            messages, pixels, count = self.apply(messages, budget)
+            prepared.append(messages)
+            usage.append(budget.as_usage(pixels, count))
+        return prepared, usage
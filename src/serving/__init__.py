@@ -0,0 +1,54 @@
+"""服务调度模块"""
+from .workers import WorkerPool
+from .admission import (
+    AdmissionController,
+    AdmissionRejected,
+    client_key,
+    get_admission_controller,
+)
+from .cancellation import (
+    CancellationToken,
+    CancellationRegistry,
+    get_cancellation_registry,
+)
+from .sessions import (
+    SessionMemory,
+    SessionStore,
+    get_session_store,
+)
+from .lanes import (
+    Lane,
+    ANALYSIS_LANE,
+    GENERATION_LANE,
+    create_lanes,
+    get_lanes,
+    generation_queue_depth,
+)
+from .degradation import (
+    DegradationPlan,
+    DegradationController,
+    get_degradation_controller,
+)
+
+__all__ = [
+    "WorkerPool",
+    "AdmissionController",
+    "AdmissionRejected",
+    "client_key",
+    "get_admission_controller",
+    "CancellationToken",
+    "CancellationRegistry",
+    "get_cancellation_registry",
+    "SessionMemory",
+    "SessionStore",
+    "get_session_store",
+    "Lane",
+    "ANALYSIS_LANE",
+    "GENERATION_LANE",
+    "create_lanes",
+    "get_lanes",
+    "generation_queue_depth",
+    "DegradationPlan",
+    "DegradationController",
+    "get_degradation_controller",
+]
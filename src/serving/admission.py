@@ -0,0 +1,193 @@
+"""
+准入控制模块 - Admission Control
+在生成通道之前按队列深度、预计等待时间与客户端请求频率决定是否受理，
+超限的请求立即返回带预计排队时间的提示，而不是无限期等待
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_QUEUE_DEPTH,
+    ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_RATE_LIMIT,
+    ADMISSION_RATE_WINDOW_SECONDS,
+    ADMISSION_TRUST_FORWARDED_FOR,
+    ADMISSION_TRUSTED_PROXY_COUNT,
+)
+from src.serving.lanes import Lane
+
+# 超过该数量的客户端记录时清理已过期的频率窗口
+_CLIENT_PRUNE_THRESHOLD = 1024
+
+
+class AdmissionRejected(Exception):
+    """
+    请求未被受理
+
+    Attributes:
+        reason: "queue_full" / "wait_too_long" / "rate_limited"
+        retry_after: 建议的重试等待（秒）
+    """
+
+    def __init__(self, message: str, reason: str, retry_after: float):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_key(
+    host: Optional[str],
+    headers: Optional[Any] = None,
+    trust_forwarded_for: bool = ADMISSION_TRUST_FORWARDED_FOR,
+    trusted_proxies: int = ADMISSION_TRUSTED_PROXY_COUNT,
+) -> str:
+    """
+    识别客户端：信任代理头时取 X-Forwarded-For 从右数第 trusted_proxies 项，否则取连接地址
+
+    通过Gradio分享链接访问时，所有连接都来自本机的隧道进程，
+    只有转发头才能区分真实用户。每层代理把对端地址追加到末尾，
+    左侧的项可由客户端任意填写，因此只取可信代理写入的那一项。
+    """
+    if trust_forwarded_for and headers is not None:
+        forwarded = [hop.strip() for hop in (headers.get("x-forwarded-for") or "").split(",") if hop.strip()]
+        if forwarded:
+            # 项数少于代理层数时全部由代理写入，最左一项即客户端
+            return forwarded[-min(max(1, trusted_proxies), len(forwarded))]
+    return host or "unknown"
+
+
+class AdmissionController:
+    """
+    生成请求的准入控制
+
+    依次检查：
+    1. 客户端频率：每个客户端在 rate_window 秒内最多受理 rate_limit 次
+    2. 队列深度：通道内等待的任务数达到 max_queue_depth 时拒绝
+    3. 预计等待：按最近吞吐估算的排队时间超过 max_wait_seconds 时拒绝
+
+    三项检查都通过后才计入客户端的请求频率，被拒绝的请求不消耗配额。
+    检查与入队之间不加全局锁，并发到达时队列深度可能短暂超出上限一两个，
+    换来受理路径上没有额外的串行点。
+
+    Example:
+        >>> admission = AdmissionController(lanes["generation"])
+        >>> with admission.enter("203.0.113.7", cost=1.2):
+        ...     model_manager.generate(messages)
+    """
+
+    def __init__(
+        self,
+        lane: Lane,
+        max_queue_depth: int = ADMISSION_MAX_QUEUE_DEPTH,
+        max_wait_seconds: float = ADMISSION_MAX_WAIT_SECONDS,
+        rate_limit: int = ADMISSION_RATE_LIMIT,
+        rate_window: float = ADMISSION_RATE_WINDOW_SECONDS,
+        enabled: bool = ADMISSION_ENABLED,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.lane = lane
+        self.max_queue_depth = max_queue_depth
+        self.max_wait_seconds = max_wait_seconds
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.enabled = enabled
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._requests: Dict[str, Deque[float]] = {}
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "wait_too_long": 0, "rate_limited": 0}
+
+    def _check_rate(self, client: str, now: float) -> None:
+        with self._lock:
+            if len(self._requests) > _CLIENT_PRUNE_THRESHOLD:
+                for key in [k for k, q in self._requests.items() if not q or q[-1] <= now - self.rate_window]:
+                    del self._requests[key]
+            history = self._requests.setdefault(client, deque())
+            while history and history[0] <= now - self.rate_window:
+                history.popleft()
+            if self.rate_limit and len(history) >= self.rate_limit:
+                retry_after = history[0] + self.rate_window - now
+                self.rejected["rate_limited"] += 1
+                raise AdmissionRejected(
+                    f"请求过于频繁，请约 {max(1, round(retry_after))} 秒后再试。",
+                    "rate_limited",
+                    retry_after,
+                )
+
+    def _record_request(self, client: str, now: float) -> None:
+        with self._lock:
+            self._requests.setdefault(client, deque()).append(now)
+            self.admitted += 1
+
+    def _reject(self, reason: str, wait: float) -> AdmissionRejected:
+        with self._lock:
+            self.rejected[reason] += 1
+        return AdmissionRejected(f"当前排队约 {max(1, round(wait))} 秒，请稍后再试。", reason, wait)
+
+    def estimated_wait(self, cost: float) -> float:
+        return self.lane.estimated_wait(default_service_seconds=cost)
+
+    def admit(self, client: str, cost: float) -> float:
+        """
+        决定是否受理请求
+
+        Args:
+            client: 客户端标识（见 client_key）
+            cost: 该请求的预计耗时（秒），尚无执行记录时用于估算等待
+
+        Returns:
+            预计排队时间（秒）
+
+        Raises:
+            AdmissionRejected: 超出频率、队列深度或等待上限
+        """
+        wait = self.estimated_wait(cost)
+        if not self.enabled:
+            return wait
+        now = self._clock()
+        self._check_rate(client, now)
+        if self.lane.waiting >= self.max_queue_depth:
+            raise self._reject("queue_full", wait)
+        if self.max_wait_seconds and wait > self.max_wait_seconds:
+            raise self._reject("wait_too_long", wait)
+        self._record_request(client, now)
+        return wait
+
+    @contextmanager
+    def enter(self, client: str, cost: float) -> Iterator[float]:
+        """受理后占用生成通道的名额，产出预计排队时间"""
+        wait = self.admit(client, cost)
+        with self.lane.slot(cost):
+            yield wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_queue_depth": self.max_queue_depth,
+                "max_wait_seconds": self.max_wait_seconds,
+                "rate_limit": f"{self.rate_limit}/{self.rate_window:g}s",
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "tracked_clients": len(self._requests),
+            }
+
+
+_admission: Optional[AdmissionController] = None
+
+
+def get_admission_controller(lane: Optional[Lane] = None) -> AdmissionController:
+    """获取全局准入控制器（首次调用时绑定到给定的生成通道）"""
+    global _admission
+    if _admission is None:
+        if lane is None:
+            raise RuntimeError("首次获取准入控制器时需要指定生成通道")
+        _admission = AdmissionController(lane)
+    return _admission
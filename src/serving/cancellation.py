@@ -0,0 +1,140 @@
+"""
+取消与截止时间模块 - Cancellation
+每个生成请求携带一个取消令牌：用户清除对话、关闭页面或连接断开时取消，
+到达截止时间时自动失效；推理后端在每个解码步检查令牌，及时释放生成名额
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import GENERATION_DEADLINE_SECONDS
+
+# 停止原因
+STOP_CANCELLED = "cancelled"
+STOP_DEADLINE = "deadline"
+
+
+class CancellationToken:
+    """
+    取消令牌
+
+    cancel() 可从任意线程调用；截止时间在创建时确定（timeout 为 None 或0表示不限）。
+    后端在解码循环中调用 stop_reason()，返回非 None 时停止生成并保留已生成的内容。
+
+    Example:
+        >>> token = CancellationToken(timeout=120)
+        >>> text, usage = model_manager.generate(messages, cancel_token=token)
+        >>> usage["stop_reason"]  # None / "cancelled" / "deadline"
+    """
+
+    def __init__(self, timeout: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.deadline = clock() + timeout if timeout else None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], Any]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and self._clock() >= self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """距截止时间的剩余秒数（不限时为 None）"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self._clock())
+
+    def stop_reason(self) -> Optional[str]:
+        if self.cancelled:
+            return STOP_CANCELLED
+        if self.expired:
+            return STOP_DEADLINE
+        return None
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback: Callable[[], Any]) -> None:
+        """取消时调用 callback（已取消则立即调用），用于把取消转发给推理进程"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+class CancellationRegistry:
+    """
+    按会话登记进行中的请求，清除对话或关闭页面时取消该会话的全部请求
+
+    Example:
+        >>> registry = get_cancellation_registry()
+        >>> with registry.track(request.session_hash, token):
+        ...     chat_with_image(..., cancel_token=token)
+        >>> registry.cancel(request.session_hash)  # 另一线程中
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, Set[CancellationToken]] = {}
+
+    @contextmanager
+    def track(self, session: Optional[str], token: CancellationToken) -> Iterator[CancellationToken]:
+        if session is None:
+            yield token
+            return
+        with self._lock:
+            self._tokens.setdefault(session, set()).add(token)
+        try:
+            yield token
+        finally:
+            with self._lock:
+                tokens = self._tokens.get(session)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._tokens[session]
+
+    def cancel(self, session: Optional[str]) -> int:
+        """取消会话中进行中的请求，返回取消的数量"""
+        if session is None:
+            return 0
+        with self._lock:
+            tokens = list(self._tokens.get(session, ()))
+        for token in tokens:
+            token.cancel()
+        return len(tokens)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(len(tokens) for tokens in self._tokens.values())
+
+
+def new_generation_token() -> CancellationToken:
+    """按 GENERATION_DEADLINE_SECONDS 创建生成请求的令牌"""
+    return CancellationToken(timeout=GENERATION_DEADLINE_SECONDS)
+
+
+_registry: Optional[CancellationRegistry] = None
+
+
+def get_cancellation_registry() -> CancellationRegistry:
+    """获取全局取消登记表"""
+    global _registry
+    if _registry is None:
+        _registry = CancellationRegistry()
+    return _registry
@@ -0,0 +1,242 @@
+"""
+过载降级模块 - Graceful Degradation
+按生成通道的排队深度自动切换降级档位：依次限制生成长度、改用贪心解码、
+精简对话历史、改由备用小模型生成，以稍差的结果换取高负载下的响应速度；
+档位切换记录为事件与计数，随 /v1/lanes 输出
+"""
+import math
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    DEGRADATION_ENABLED,
+    DEGRADATION_TIERS,
+    DEGRADATION_HYSTERESIS,
+    DEGRADATION_TOKEN_HEADROOM,
+    DEGRADATION_TOKEN_PERCENTILE,
+    DEGRADATION_MIN_TOKENS,
+    DEGRADATION_EVENT_WINDOW,
+    SCHEDULER_TOKENS_PER_CHAR,
+)
+from src.serving.lanes import generation_queue_depth
+from src.serving.scheduler import JobCostEstimator, format_expected_chars
+
+# 未降级时的档位名称
+NORMAL_TIER = "正常"
+
+
+@dataclass(frozen=True)
+class DegradationPlan:
+    """单个请求使用的降级档位及其生成参数"""
+
+    tier: int
+    name: str
+    queue_depth: int
+    max_new_tokens: int
+    do_sample: bool = True
+    history_turns: Optional[int] = None
+    fallback: bool = False
+
+    @property
+    def degraded(self) -> bool:
+        return self.tier > 0
+
+    def trim_history(self, history: List[Any]) -> List[Any]:
+        """只保留最近 history_turns 轮对话（未限制时原样返回）"""
+        if self.history_turns is None:
+            return history
+        return history[-self.history_turns:] if self.history_turns > 0 else []
+
+    def as_dict(self) -> Dict[str, Any]:
+        """写入响应的档位信息"""
+        return asdict(self)
+
+
+def capped_tokens(
+    format_choice: Optional[str],
+    max_new_tokens: int,
+    headroom: float = DEGRADATION_TOKEN_HEADROOM,
+    observed: Optional[int] = None,
+    minimum: int = DEGRADATION_MIN_TOKENS,
+) -> int:
+    """
+    按格式篇幅限制生成长度，不超过原值
+
+    有观测值（该格式实际生成token数的高分位数）时取观测值 × 余量，否则取
+    预计字数 × 每字token数 × 余量；均不低于 minimum，标题行与模板开销
+    不会让诗句截断在中途。
+
+    Example:
+        >>> capped_tokens("五言绝句", 512)
+        96
+        >>> capped_tokens("词（自动匹配词牌）", 512, observed=180)
+        225
+    """
+    base = observed if observed is not None else format_expected_chars(format_choice) * SCHEDULER_TOKENS_PER_CHAR
+    return min(int(max_new_tokens), max(int(minimum), math.ceil(base * headroom)))
+
+
+class DegradationController:
+    """
+    降级档位控制器
+
+    排队深度达到某档的 queue_depth 即升到该档；回落时需低于当前档位阈值
+    hysteresis 个任务，避免在阈值附近反复切换。档位按请求选择：
+    请求受理时的档位决定其全部生成参数，生成中途不会改变。限制生成长度时
+    优先按 token_source 给出的该格式实际生成token数分位数。
+    未提供备用模型时，带 fallback 动作的档位被忽略。
+
+    Example:
+        >>> controller = get_degradation_controller(get_fallback_manager())
+        >>> plan = controller.plan("五言绝句", max_new_tokens=512)
+        >>> backend = controller.backend_for(plan, model_manager)
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[List[Dict[str, Any]]] = None,
+        fallback: Any = None,
+        enabled: bool = DEGRADATION_ENABLED,
+        hysteresis: int = DEGRADATION_HYSTERESIS,
+        headroom: float = DEGRADATION_TOKEN_HEADROOM,
+        event_window: int = DEGRADATION_EVENT_WINDOW,
+        depth_source: Callable[[], int] = generation_queue_depth,
+        token_source: Optional[Callable[[Optional[str]], Optional[int]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        tiers = DEGRADATION_TIERS if tiers is None else tiers
+        self.fallback = fallback
+        self.tiers = sorted(
+            (tier for tier in tiers if fallback is not None or not tier.get("fallback")),
+            key=lambda tier: tier["queue_depth"],
+        )
+        self.enabled = enabled and bool(self.tiers)
+        self.hysteresis = hysteresis
+        self.headroom = headroom
+        self.depth_source = depth_source
+        # 格式 → 实际生成token数的高分位数（样本不足时为 None），用于限制生成长度
+        self.token_source = token_source
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.current = 0
+        self.requests: Counter = Counter()
+        self.transitions: Counter = Counter()
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=event_window)
+
+    def tier_name(self, tier: int) -> str:
+        return self.tiers[tier - 1]["name"] if tier > 0 else NORMAL_TIER
+
+    def _threshold(self, tier: int) -> int:
+        return self.tiers[tier - 1]["queue_depth"] if tier > 0 else 0
+
+    def _target(self, depth: int) -> int:
+        """按排队深度与当前档位计算新档位（升档立即生效，降档带滞后）"""
+        rising = sum(1 for tier in self.tiers if depth >= tier["queue_depth"])
+        if rising >= self.current:
+            return rising
+        tier = self.current
+        while tier > 0 and depth < self._threshold(tier) - self.hysteresis:
+            tier -= 1
+        return tier
+
+    def _transition(self, tier: int, depth: int) -> None:
+        previous = self.current
+        self.current = tier
+        self.transitions[f"{previous}->{tier}"] += 1
+        event = {
+            "timestamp": round(self._clock(), 3),
+            "from_tier": previous,
+            "to_tier": tier,
+            "from_name": self.tier_name(previous),
+            "to_name": self.tier_name(tier),
+            "queue_depth": depth,
+        }
+        self.events.append(event)
+        print(f"[degradation] 档位 {previous}（{event['from_name']}）→ {tier}（{event['to_name']}），排队 {depth}")
+
+    def plan(
+        self,
+        format_choice: Optional[str],
+        max_new_tokens: int,
+        queue_depth: Optional[int] = None,
+    ) -> DegradationPlan:
+        """
+        为一个请求选择降级档位
+
+        Args:
+            format_choice: 诗词格式（决定限制后的生成长度）
+            max_new_tokens: 请求的最大生成token数
+            queue_depth: 生成通道的排队深度（默认读取本进程的生成通道）
+
+        Returns:
+            该请求使用的档位与生成参数
+        """
+        depth = self.depth_source() if queue_depth is None else int(queue_depth)
+        with self._lock:
+            tier = self._target(depth) if self.enabled else 0
+            if tier != self.current:
+                self._transition(tier, depth)
+            self.requests[tier] += 1
+
+        if tier == 0:
+            return DegradationPlan(0, NORMAL_TIER, depth, int(max_new_tokens))
+        actions = self.tiers[tier - 1]
+        return DegradationPlan(
+            tier=tier,
+            name=actions["name"],
+            queue_depth=depth,
+            max_new_tokens=(
+                capped_tokens(
+                    format_choice,
+                    max_new_tokens,
+                    self.headroom,
+                    observed=self.token_source(format_choice) if self.token_source else None,
+                )
+                if actions.get("cap_tokens") else int(max_new_tokens)
+            ),
+            do_sample=not actions.get("greedy", False),
+            history_turns=actions.get("history_turns"),
+            fallback=bool(actions.get("fallback")),
+        )
+
+    def backend_for(self, plan: DegradationPlan, model_manager: Any) -> Any:
+        """该档位使用的推理后端"""
+        return self.fallback if plan.fallback and self.fallback is not None else model_manager
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "current_tier": self.current,
+                "current_name": self.tier_name(self.current),
+                "hysteresis": self.hysteresis,
+                "fallback_model": getattr(self.fallback, "model_path", None),
+                "tiers": [
+                    {"tier": index, "name": tier["name"], "queue_depth": tier["queue_depth"]}
+                    for index, tier in enumerate(self.tiers, start=1)
+                ],
+                "requests": {self.tier_name(tier): count for tier, count in sorted(self.requests.items())},
+                "transitions": dict(self.transitions),
+                "recent_events": list(self.events)[-10:],
+            }
+
+
+_degradation: Optional[DegradationController] = None
+
+
+def get_degradation_controller(fallback: Any = None, usage_tracker: Any = None) -> DegradationController:
+    """获取全局降级控制器（首次调用时绑定备用模型，并按用量记录的观测值限制生成长度）"""
+    global _degradation
+    if _degradation is None:
+        estimator = JobCostEstimator(usage_tracker)
+        _degradation = DegradationController(
+            fallback=fallback,
+            token_source=lambda format_choice: estimator.token_percentile(format_choice, DEGRADATION_TOKEN_PERCENTILE),
+        )
+    return _degradation
@@ -0,0 +1,288 @@
+"""
+并发通道模块 - Concurrency Lanes
+把界面事件分到相互独立的通道：图像分析等CPU轻任务走高并发通道，
+模型生成走按副本数限流的GPU通道，各自排队、各自统计；
+通道内按预计耗时短者优先调度，并随等待时间提升优先级防止长任务饿死
+"""
+import functools
+import inspect
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    ANALYSIS_LANE_CONCURRENCY,
+    ANALYSIS_LANE_QUEUE_SLOTS,
+    GENERATION_LANE_CONCURRENCY,
+    GENERATION_LANE_QUEUE_SLOTS,
+    LANE_METRICS_WINDOW,
+    SCHEDULER_POLICY,
+    SCHEDULER_AGING_RATE,
+)
+
+# 通道名称（同时用作Gradio事件的 concurrency_id）
+ANALYSIS_LANE = "analysis"
+GENERATION_LANE = "generation"
+
+
+def select_next(
+    waiting: Dict[int, Tuple[float, float]],
+    now: float,
+    aging_rate: float,
+) -> int:
+    """
+    选出下一个执行的任务：有效优先级 = 预计耗时 − aging_rate × 已等待时间，
+    取最小者，相同时按到达顺序
+
+    所有任务预计耗时相同（或未提供）时退化为先到先服务；aging_rate 为0时
+    即纯短任务优先。
+
+    Args:
+        waiting: 任务编号 → (预计耗时, 入队时刻)
+        now: 当前时刻
+        aging_rate: 每等待1秒优先级提升的幅度
+
+    Returns:
+        选中的任务编号
+    """
+    return min(
+        waiting,
+        key=lambda ticket: (waiting[ticket][0] - aging_rate * (now - waiting[ticket][1]), ticket),
+    )
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Lane:
+    """
+    并发通道
+
+    同一时间最多 concurrency 个任务在执行，其余在通道内等待，名额空出时
+    按 select_next 选出下一个任务（policy 为 "fifo" 时忽略预计耗时）。
+    queue_slots 为允许在通道内等待的任务数，与 concurrency 之和作为
+    Gradio事件的 concurrency_limit，超出部分留在Gradio队列中，
+    不会占用线程池。
+
+    Example:
+        >>> lane = Lane("generation", concurrency=2)
+        >>> with lane.slot(cost=1.5):
+        ...     model_manager.generate(messages)
+        >>> lane.stats()["completed"]
+        1
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        queue_slots: int = 0,
+        policy: str = "fifo",
+        aging_rate: float = SCHEDULER_AGING_RATE,
+        window: int = LANE_METRICS_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if concurrency < 1:
+            raise ValueError("通道并发数至少为1")
+        if policy not in ("fifo", "sjf"):
+            raise ValueError(f"未知的调度策略：{policy}")
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_slots = queue_slots
+        self.policy = policy
+        self.aging_rate = aging_rate
+        self._clock = clock
+        self._cond = threading.Condition()
+        # 等待中的任务：编号 → (预计耗时, 入队时刻)
+        self._waiting: Dict[int, Tuple[float, float]] = {}
+        # 已分到名额、尚未开始执行的任务编号
+        self._granted: Set[int] = set()
+        self._tickets = itertools.count()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self._wait_times: Deque[float] = deque(maxlen=window)
+        self._service_times: Deque[float] = deque(maxlen=window)
+
+    @property
+    def gradio_limit(self) -> int:
+        """Gradio事件的 concurrency_limit：执行中与通道内等待的任务总数上限"""
+        return self.concurrency + self.queue_slots
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting) + len(self._granted)
+
+    def _dispatch(self) -> None:
+        """把空闲名额分配给等待中的任务（需持有锁）；分配结果一经确定不再改变"""
+        now = self._clock()
+        while self._waiting and self.running + len(self._granted) < self.concurrency:
+            if self.policy == "sjf":
+                ticket = select_next(self._waiting, now, self.aging_rate)
+            else:
+                ticket = min(self._waiting)
+            del self._waiting[ticket]
+            self._granted.add(ticket)
+        self._cond.notify_all()
+
+    def _acquire(self, cost: Optional[float]) -> float:
+        enqueued = time.perf_counter()
+        with self._cond:
+            ticket = next(self._tickets)
+            self._waiting[ticket] = (float(cost or 0.0), self._clock())
+            self._dispatch()
+            while ticket not in self._granted:
+                self._cond.wait()
+            self._granted.remove(ticket)
+            self.running += 1
+        started = time.perf_counter()
+        self._wait_times.append(started - enqueued)
+        return started
+
+    def _release(self, started: float, error: bool) -> None:
+        with self._cond:
+            self.running -= 1
+            if error:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self._service_times.append(time.perf_counter() - started)
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, cost: Optional[float] = None) -> Iterator[None]:
+        """
+        占用通道的一个并发名额，排队等待的时间计入等待统计
+
+        Args:
+            cost: 预计耗时（秒），用于短任务优先调度；None 视为0
+        """
+        started = self._acquire(cost)
+        error = False
+        try:
+            yield
+        except GeneratorExit:
+            raise
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._release(started, error)
+
+    def wrap(self, fn: Callable, cost: Optional[Callable[..., float]] = None) -> Callable:
+        """
+        包装事件处理函数，使其在通道内执行
+
+        生成器函数在第一次取值时才占用名额，整个流式输出期间保持占用。
+
+        Args:
+            fn: 事件处理函数
+            cost: 以相同参数调用、返回预计耗时（秒）的函数
+        """
+        def estimate(args, kwargs) -> Optional[float]:
+            return cost(*args, **kwargs) if cost is not None else None
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                with self.slot(estimate(args, kwargs)):
+                    yield from fn(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.slot(estimate(args, kwargs)):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def estimated_wait(self, default_service_seconds: float) -> float:
+        """
+        按最近的平均执行耗时估算新任务的排队等待时间（秒）
+
+        Args:
+            default_service_seconds: 尚无执行记录时假定的单任务耗时
+        """
+        with self._cond:
+            ahead = len(self._waiting) + len(self._granted) + self.running
+            samples = list(self._service_times)
+        service = sum(samples) / len(samples) if samples else default_service_seconds
+        # 有空闲名额时无需等待；否则前面每 concurrency 个任务需要一轮平均耗时
+        return max(0, ahead - self.concurrency + 1) * service / self.concurrency
+
+    def stats(self) -> Dict[str, Any]:
+        """通道的排队与耗时统计（耗时基于最近 window 个任务）"""
+        wait_times = list(self._wait_times)
+        service_times = list(self._service_times)
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "concurrency": self.concurrency,
+            "queue_slots": self.queue_slots,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_seconds_p50": round(_percentile(wait_times, 50), 3),
+            "wait_seconds_p95": round(_percentile(wait_times, 95), 3),
+            "service_seconds_p50": round(_percentile(service_times, 50), 3),
+            "service_seconds_p95": round(_percentile(service_times, 95), 3),
+        }
+
+
+def generation_parallelism(model_manager: Any) -> int:
+    """推理后端可同时执行的请求数：副本池/推理进程池取其规模，单模型为1"""
+    try:
+        return max(1, len(model_manager))
+    except TypeError:
+        return 1
+
+
+_lanes: Optional[Dict[str, Lane]] = None
+
+
+def create_lanes(model_manager: Any) -> Dict[str, Lane]:
+    """
+    按配置创建分析通道与生成通道（全局共享，界面与推理接口共用）
+
+    Args:
+        model_manager: 推理后端，GENERATION_LANE_CONCURRENCY 未配置时按其规模限流
+
+    Returns:
+        通道名 → 通道
+    """
+    global _lanes
+    generation_concurrency = GENERATION_LANE_CONCURRENCY or generation_parallelism(model_manager)
+    _lanes = {
+        ANALYSIS_LANE: Lane(ANALYSIS_LANE, ANALYSIS_LANE_CONCURRENCY, ANALYSIS_LANE_QUEUE_SLOTS),
+        GENERATION_LANE: Lane(
+            GENERATION_LANE,
+            generation_concurrency,
+            GENERATION_LANE_QUEUE_SLOTS,
+            policy=SCHEDULER_POLICY,
+        ),
+    }
+    return _lanes
+
+
+def get_lanes(model_manager: Any = None) -> Dict[str, Lane]:
+    """获取全局通道（首次调用时创建）"""
+    if _lanes is None:
+        return create_lanes(model_manager)
+    return _lanes
+
+
+def generation_queue_depth() -> int:
+    """生成通道当前的排队任务数（通道尚未创建时为0，如批量创作）"""
+    return _lanes[GENERATION_LANE].waiting if _lanes is not None else 0
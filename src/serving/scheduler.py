@@ -0,0 +1,130 @@
+"""
+调度估算模块 - Job Cost Estimator
+按诗词格式的篇幅、对话历史长度与实际观测到的生成统计，
+估算每个生成任务的耗时，供生成通道做短任务优先调度
+"""
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    DEFAULT_MAX_TOKENS,
+    SCHEDULER_TOKENS_PER_CHAR,
+    SCHEDULER_DEFAULT_TOKENS_PER_SECOND,
+    SCHEDULER_PREFILL_SECONDS_PER_CHAR,
+    SCHEDULER_MIN_SAMPLES,
+)
+from src.constants.templates import FORMAT_GUIDE
+
+
+def format_expected_chars(format_choice: Optional[str]) -> int:
+    """
+    格式的预期字数：固定格式取 total_chars，词等变长格式取区间上限
+
+    Example:
+        >>> format_expected_chars("五言绝句")
+        20
+        >>> format_expected_chars("词（自动匹配词牌）")
+        100
+    """
+    total = FORMAT_GUIDE.get(format_choice or "", {}).get("total_chars")
+    if isinstance(total, int):
+        return total
+    numbers = [int(n) for n in re.findall(r"\d+", str(total or ""))]
+    if numbers:
+        return max(numbers)
+    # 未知格式按最长的固定格式估计
+    return max(g["total_chars"] for g in FORMAT_GUIDE.values() if isinstance(g["total_chars"], int))
+
+
+def history_chars(history: Optional[List[Any]]) -> int:
+    """对话历史的文字总长度（决定预填充的开销），历史格式为 [(用户消息, AI回复), ...]"""
+    total = 0
+    for turn in history or []:
+        total += sum(len(part) for part in turn if isinstance(part, str))
+    return total
+
+
+class JobCostEstimator:
+    """
+    生成任务耗时估算器
+
+    预计耗时 = 预计生成token数 / 生成速度 + 历史字数 × 单字预填充耗时
+
+    - 预计生成token数：该格式已有足够样本时取观测均值，否则按
+      FORMAT_GUIDE 的字数 × SCHEDULER_TOKENS_PER_CHAR 估计；不超过 max_new_tokens
+    - 生成速度：取用量统计中全部请求的平均 tokens/s，无样本时取默认值
+
+    Example:
+        >>> estimator = JobCostEstimator(model_manager.usage_tracker)
+        >>> estimator.estimate("五言绝句") < estimator.estimate("词（自动匹配词牌）")
+        True
+    """
+
+    def __init__(self, usage_tracker: Any = None):
+        self.usage_tracker = usage_tracker
+
+    def _observed(self) -> Dict[str, Dict[str, float]]:
+        """按格式汇总用量统计（跨风格合并）"""
+        if self.usage_tracker is None:
+            return {}
+        per_format: Dict[str, Dict[str, float]] = {}
+        for entry in self.usage_tracker.summary().values():
+            agg = per_format.setdefault(entry["format"], {"requests": 0, "tokens": 0.0, "seconds": 0.0})
+            agg["requests"] += entry["requests"]
+            agg["tokens"] += entry["avg_generated_tokens"] * entry["requests"]
+            if entry["tokens_per_second"] > 0:
+                agg["seconds"] += entry["avg_generated_tokens"] * entry["requests"] / entry["tokens_per_second"]
+        return per_format
+
+    def expected_tokens(self, format_choice: Optional[str], max_new_tokens: int = DEFAULT_MAX_TOKENS) -> float:
+        observed = self._observed().get(format_choice or "")
+        if observed and observed["requests"] >= SCHEDULER_MIN_SAMPLES:
+            tokens = observed["tokens"] / observed["requests"]
+        else:
+            tokens = format_expected_chars(format_choice) * SCHEDULER_TOKENS_PER_CHAR
+        return min(tokens, float(max_new_tokens))
+
+    def token_percentile(self, format_choice: Optional[str], percentile: float) -> Optional[int]:
+        """
+        该格式实际生成token数的分位数（最近邻秩），样本不足 SCHEDULER_MIN_SAMPLES 时为 None
+        """
+        if self.usage_tracker is None or not hasattr(self.usage_tracker, "generated_samples"):
+            return None
+        samples = sorted(self.usage_tracker.generated_samples(format_choice))
+        if len(samples) < SCHEDULER_MIN_SAMPLES:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * len(samples)))
+        return samples[rank - 1]
+
+    def tokens_per_second(self) -> float:
+        observed = self._observed().values()
+        tokens = sum(o["tokens"] for o in observed)
+        seconds = sum(o["seconds"] for o in observed)
+        if tokens > 0 and seconds > 0:
+            return tokens / seconds
+        return SCHEDULER_DEFAULT_TOKENS_PER_SECOND
+
+    def estimate(
+        self,
+        format_choice: Optional[str],
+        history: Optional[List[Any]] = None,
+        max_new_tokens: int = DEFAULT_MAX_TOKENS,
+    ) -> float:
+        """
+        估算一次生成的耗时（秒）
+
+        Args:
+            format_choice: 诗词格式
+            history: 对话历史 [(用户消息, AI回复), ...]
+            max_new_tokens: 最大生成token数
+
+        Returns:
+            预计耗时（秒）
+        """
+        decode_seconds = self.expected_tokens(format_choice, max_new_tokens) / self.tokens_per_second()
+        prefill_seconds = history_chars(history) * SCHEDULER_PREFILL_SECONDS_PER_CHAR
+        return decode_seconds + prefill_seconds
@@ -0,0 +1,262 @@
+"""
+会话内存模块 - Session Store
+按会话集中存放对话轮次与创作记录：轮次文本只存一份，对话历史与创作记录
+只引用轮次编号；每个会话有内存预算，超出时淘汰最旧的内容，闲置会话定期回收
+"""
+import itertools
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    MAX_RECENT_ENTRIES,
+    RECENT_HISTORY_TURNS,
+    SESSION_MAX_BYTES,
+    SESSION_IDLE_SECONDS,
+    SESSION_REAP_INTERVAL,
+)
+
+Turn = Tuple[str, str]
+
+# 每条创作记录除文本与图片外的固定开销（字典与列表结构，粗略估计）
+_ENTRY_OVERHEAD_BYTES = 512
+
+
+class SessionMemory:
+    """
+    单个会话的对话与创作记录
+
+    - 轮次 (用户消息, AI回复) 按内容驻留，相同轮次只存一份
+    - history 为当前对话的轮次编号，recent 中每条记录引用轮次编号与图片摘要
+    - 写入后若超出 max_bytes，依次淘汰：最旧的创作记录（保留最新一条）、
+      最旧的对话轮次（保留最新一轮）、剩余的创作记录
+    """
+
+    def __init__(self, session_id: str, max_bytes: int = SESSION_MAX_BYTES, clock: Callable[[], float] = time.monotonic):
+        self.session_id = session_id
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._ids = itertools.count()
+        self._turns: Dict[int, Turn] = {}
+        self._turn_ids: Dict[Turn, int] = {}
+        self._images: Dict[str, str] = {}
+        self.history: List[int] = []
+        self.recent: List[Dict[str, Any]] = []
+        self.nbytes = 0
+        self.evicted_turns = 0
+        self.evicted_entries = 0
+        self.last_access = clock()
+
+    def touch(self) -> None:
+        self.last_access = self._clock()
+
+    def _intern(self, turn: Turn) -> int:
+        turn_id = self._turn_ids.get(turn)
+        if turn_id is None:
+            turn_id = next(self._ids)
+            self._turns[turn_id] = turn
+            self._turn_ids[turn] = turn_id
+        return turn_id
+
+    def history_turns(self) -> List[Turn]:
+        """当前对话 [(用户消息, AI回复), ...]"""
+        with self._lock:
+            return [self._turns[turn_id] for turn_id in self.history]
+
+    def append_turn(self, user: str, reply: str) -> List[Turn]:
+        """追加一轮对话，返回更新后的对话历史"""
+        with self._lock:
+            self.history.append(self._intern((user, reply)))
+            self._enforce_budget()
+            return self.history_turns()
+
+    def add_recent(self, entry: Dict[str, Any], image_digest: str, image_uri: str) -> None:
+        """
+        记录一次创作：引用当前对话最近的轮次与图片
+
+        Args:
+            entry: 格式、风格、提示、时间等展示字段
+            image_digest: 图片摘要（同一图片的多条记录共用一份缩略图）
+            image_uri: 缩略图的Data URI
+        """
+        with self._lock:
+            self._images.setdefault(image_digest, image_uri)
+            record = {**entry, "turns": self.history[-RECENT_HISTORY_TURNS:], "image": image_digest}
+            self.recent = [record] + self.recent[: MAX_RECENT_ENTRIES - 1]
+            self._enforce_budget()
+
+    def image_uri(self, image_digest: str) -> Optional[str]:
+        """已存放的缩略图（避免重复编码同一图片）"""
+        with self._lock:
+            return self._images.get(image_digest)
+
+    def recent_entries(self) -> List[Dict[str, Any]]:
+        """展开后的创作记录（history 为轮次文本，image 为Data URI），用于渲染"""
+        with self._lock:
+            return [
+                {
+                    **{k: v for k, v in record.items() if k != "turns"},
+                    "history": [self._turns[turn_id] for turn_id in record["turns"]],
+                    "image": self._images[record["image"]],
+                }
+                for record in self.recent
+            ]
+
+    def reset_history(self) -> None:
+        """清空当前对话，保留创作记录"""
+        with self._lock:
+            self.history = []
+            self._collect()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.history = []
+            self.recent = []
+            self._collect()
+
+    def _collect(self) -> None:
+        """释放不再被引用的轮次与图片，并重新计算占用"""
+        referenced = set(self.history)
+        for record in self.recent:
+            referenced.update(record["turns"])
+        for turn_id in [t for t in self._turns if t not in referenced]:
+            del self._turn_ids[self._turns.pop(turn_id)]
+        images = {record["image"] for record in self.recent}
+        for digest in [d for d in self._images if d not in images]:
+            del self._images[digest]
+
+        total = sum(sys.getsizeof(user) + sys.getsizeof(reply) for user, reply in self._turns.values())
+        total += sum(sys.getsizeof(uri) for uri in self._images.values())
+        total += sum(_ENTRY_OVERHEAD_BYTES + sys.getsizeof(record.get("prompt", "")) for record in self.recent)
+        self.nbytes = total
+
+    def _enforce_budget(self) -> None:
+        self._collect()
+        while self.nbytes > self.max_bytes:
+            if len(self.recent) > 1:
+                self.recent.pop()
+                self.evicted_entries += 1
+            elif len(self.history) > 1:
+                self.history.pop(0)
+                self.evicted_turns += 1
+            elif self.recent:
+                self.recent.pop()
+                self.evicted_entries += 1
+            else:
+                break
+            self._collect()
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "session": self.session_id[:8],
+                "bytes": self.nbytes,
+                "turns": len(self._turns),
+                "history": len(self.history),
+                "recent": len(self.recent),
+                "images": len(self._images),
+                "idle_seconds": round(now - self.last_access, 1),
+            }
+
+
+class SessionStore:
+    """
+    全部会话的内存登记表
+
+    get() 取得（或创建）会话并刷新其活跃时间；闲置超过 idle_seconds 的会话
+    由 reap() 回收，start_reaper() 在后台定期执行。
+
+    Example:
+        >>> store = get_session_store()
+        >>> session = store.get(request.session_hash)
+        >>> session.append_turn("突出秋景", poem)
+        >>> store.stats()["total_bytes"]
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = SESSION_MAX_BYTES,
+        idle_seconds: float = SESSION_IDLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, SessionMemory] = {}
+        self.reaped = 0
+        self._reaper: Optional[threading.Thread] = None
+
+    def get(self, session_id: Optional[str]) -> SessionMemory:
+        session_id = session_id or "anonymous"
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = SessionMemory(session_id, self.max_bytes, self._clock)
+                self._sessions[session_id] = session
+        session.touch()
+        return session
+
+    def drop(self, session_id: Optional[str]) -> None:
+        with self._lock:
+            session = self._sessions.pop(session_id or "anonymous", None)
+        if session is not None:
+            session.clear()
+
+    def reap(self) -> int:
+        """回收闲置会话，返回回收的数量"""
+        cutoff = self._clock() - self.idle_seconds
+        with self._lock:
+            idle = [sid for sid, session in self._sessions.items() if session.last_access < cutoff]
+            sessions = [self._sessions.pop(sid) for sid in idle]
+            self.reaped += len(idle)
+        for session in sessions:
+            session.clear()
+        return len(idle)
+
+    def start_reaper(self, interval: float = SESSION_REAP_INTERVAL) -> None:
+        if self._reaper is not None:
+            return
+
+        def run() -> None:
+            while True:
+                time.sleep(interval)
+                self.reap()
+
+        self._reaper = threading.Thread(target=run, name="session-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self, top: int = 5) -> Dict[str, Any]:
+        """会话总数、总占用与占用最多的会话"""
+        now = self._clock()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            reaped = self.reaped
+        snapshots = sorted((s.snapshot(now) for s in sessions), key=lambda s: s["bytes"], reverse=True)
+        return {
+            "sessions": len(snapshots),
+            "total_bytes": sum(s["bytes"] for s in snapshots),
+            "max_session_bytes": snapshots[0]["bytes"] if snapshots else 0,
+            "budget_bytes": self.max_bytes,
+            "idle_seconds": self.idle_seconds,
+            "evicted_turns": sum(s.evicted_turns for s in sessions),
+            "evicted_entries": sum(s.evicted_entries for s in sessions),
+            "reaped": reaped,
+            "largest": snapshots[:top],
+        }
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """获取全局会话登记表（首次调用时创建并启动闲置回收）"""
+    global _store
+    if _store is None:
+        _store = SessionStore()
+        _store.start_reaper()
+    return _store
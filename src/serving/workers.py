@@ -0,0 +1,597 @@
+"""
+推理进程模块 - Inference Workers
+在独立子进程中运行模型推理，界面进程通过每个进程独占的本地管道收发请求，
+图像像素经共享内存传递而不经过pickle序列化
+"""
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    MODEL_REGISTRY,
+    INFERENCE_WORKERS,
+    REPLICA_DEVICE_GROUPS,
+    WORKER_START_TIMEOUT,
+    WORKER_RESTART_DELAY,
+    WORKER_RESTART_BACKOFF_MAX,
+    WORKER_MAX_START_FAILURES,
+    WORKER_RESPONSE_GRACE,
+    WORKER_RESPONSE_TIMEOUT,
+)
+from src.serving.cancellation import CancellationToken
+from src.serving.lanes import generation_queue_depth
+
+Messages = List[Dict[str, Any]]
+
+# 共享内存图像描述：(共享内存名, 形状, dtype)
+ImageHandle = Tuple[str, Tuple[int, ...], str]
+
+
+def export_images(
+    conversations: List[Messages],
+) -> Tuple[List[Messages], List[shared_memory.SharedMemory], List[ImageHandle]]:
+    """
+    将对话中的图像复制到共享内存，消息里只保留图像序号
+
+    Returns:
+        (去除图像后的对话, 共享内存对象列表, 图像描述列表)
+    """
+    segments: List[shared_memory.SharedMemory] = []
+    handles: List[ImageHandle] = []
+    stripped: List[Messages] = []
+    try:
+        for messages in conversations:
+            stripped_messages = []
+            for message in messages:
+                content = []
+                for item in message.get("content", []):
+                    if item.get("type") == "image" and isinstance(item.get("image"), Image.Image):
+                        array = np.asarray(item["image"].convert("RGB"))
+                        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+                        segments.append(segment)
+                        handles.append((segment.name, array.shape, array.dtype.str))
+                        item = {"type": "image", "image_index": len(handles) - 1}
+                    content.append(item)
+                stripped_messages.append({**message, "content": content})
+            stripped.append(stripped_messages)
+    except BaseException:
+        release_segments(segments)
+        raise
+    return stripped, segments, handles
+
+
+def release_segments(segments: List[shared_memory.SharedMemory]) -> None:
+    for segment in segments:
+        try:
+            segment.close()
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def import_images(conversations: List[Messages], handles: List[ImageHandle]) -> List[Messages]:
+    """在推理进程中从共享内存恢复图像并填回对话"""
+    images: List[Image.Image] = []
+    for name, shape, dtype in handles:
+        # spawn子进程与界面进程共用同一个资源跟踪器，共享内存统一由界面进程回收
+        segment = shared_memory.SharedMemory(name=name)
+        try:
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+            images.append(Image.fromarray(view.copy()))
+            del view
+        finally:
+            segment.close()
+
+    restored = []
+    for messages in conversations:
+        restored.append([
+            {
+                **message,
+                "content": [
+                    {"type": "image", "image": images[item["image_index"]]}
+                    if "image_index" in item else item
+                    for item in message.get("content", [])
+                ],
+            }
+            for message in messages
+        ])
+    return restored
+
+
+def _worker_main(
+    worker_id: int,
+    device_group: Optional[List[int]],
+    request_conn: Connection,
+    response_conn: Connection,
+) -> None:
+    """推理进程入口：加载模型后循环处理请求"""
+    if device_group is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = ",".join(str(index) for index in device_group)
+
+    from src.models.model_manager import create_model_manager
+    from src.models.usage import UsageTracker
+
+    # 用量由界面进程统一记录，推理进程不写日志文件
+    manager = create_model_manager(usage_tracker=UsageTracker(log_path=None), device_groups=None)
+    manager.load_model()
+
+    # 读线程持续把请求从管道取到本地队列，界面进程发送时不会因管道写满而阻塞；
+    # 取消消息由读线程直接作用于对应请求的令牌，排队中或生成中的请求都能及时停止
+    inbox: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+    tokens: Dict[int, CancellationToken] = {}
+    tokens_lock = threading.Lock()
+
+    def read_requests() -> None:
+        try:
+            while True:
+                message = request_conn.recv()
+                if message.get("type") == "cancel":
+                    with tokens_lock:
+                        token = tokens.get(message["id"])
+                    if token is not None:
+                        token.cancel()
+                    continue
+                with tokens_lock:
+                    tokens[message["id"]] = CancellationToken(timeout=message.get("timeout"))
+                inbox.put(message)
+        except (EOFError, OSError):
+            inbox.put(None)
+
+    threading.Thread(target=read_requests, daemon=True).start()
+    response_conn.send({"type": "ready", "pid": os.getpid()})
+
+    while True:
+        request = inbox.get()
+        if request is None:
+            break
+        request_id = request["id"]
+        with tokens_lock:
+            token = tokens[request_id]
+        try:
+            conversations = import_images(request["conversations"], request["images"])
+            method = request["method"]
+            kwargs = {**request["kwargs"], "cancel_token": token}
+            if method == "generate_batch":
+                result = manager.generate_batch(conversations, **kwargs)
+                response_conn.send({"type": "result", "id": request_id, "result": result})
+            elif method == "generate_stream":
+                for chunk in manager.generate_stream(messages=conversations[0], **kwargs):
+                    response_conn.send({**chunk, "id": request_id})
+            else:
+                result = manager.generate(messages=conversations[0], **kwargs)
+                response_conn.send({"type": "result", "id": request_id, "result": result})
+        except Exception as exc:
+            response_conn.send({"type": "error", "id": request_id, "error": str(exc)})
+        finally:
+            with tokens_lock:
+                tokens.pop(request_id, None)
+
+
+class _WorkerHandle:
+    """界面进程侧的单个推理进程句柄"""
+
+    def __init__(
+        self,
+        worker_id: int,
+        process: mp.Process,
+        request_conn: Connection,
+        response_conn: Connection,
+        failures: int = 0,
+    ):
+        self.worker_id = worker_id
+        self.process = process
+        self.request_conn = request_conn
+        self.response_conn = response_conn
+        self.send_lock = threading.Lock()
+        self.ready = False
+        self.in_flight = 0
+        # 连续退出次数（就绪后清零）：未就绪即退出通常是模型加载失败
+        self.failures = failures
+        self.restart_at: Optional[float] = None
+        self.failed = False
+
+    def close(self) -> None:
+        for conn in (self.request_conn, self.response_conn):
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+
+class _PendingRequest:
+    def __init__(self, worker_id: int, segments: List[shared_memory.SharedMemory]):
+        self.worker_id = worker_id
+        self.segments = segments
+        self.responses: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+
+
+class WorkerPool:
+    """
+    推理进程池
+
+    - 界面进程调用 generate / generate_batch / generate_stream，接口与 ModelManager 一致
+    - 每个推理进程独占一对请求/响应管道，请求分发给在途请求最少的就绪进程；
+      进程崩溃只影响自己的管道，不会让其他进程卡在共享队列锁上
+    - 图像像素写入共享内存，推理进程直接从中复制，请求结束后回收
+    - 监控线程发现进程退出时，使其在途请求失败并自动重启该进程；连续失败时重启等待
+      按2倍递增，连续 max_start_failures 次未能就绪即退出后停止重启并标记为失败
+    - 取消令牌不跨进程传递：截止时间以剩余秒数随请求发送，取消时另发一条取消消息
+    - 等待响应以截止时间加宽限为上限，推理进程卡住或响应丢失时调用方不会一直阻塞
+    """
+
+    def __init__(
+        self,
+        num_workers: int = INFERENCE_WORKERS,
+        device_groups: Optional[List[List[int]]] = REPLICA_DEVICE_GROUPS,
+        start_timeout: float = WORKER_START_TIMEOUT,
+        restart_delay: float = WORKER_RESTART_DELAY,
+        restart_backoff_max: float = WORKER_RESTART_BACKOFF_MAX,
+        max_start_failures: int = WORKER_MAX_START_FAILURES,
+        response_grace: float = WORKER_RESPONSE_GRACE,
+        response_timeout: float = WORKER_RESPONSE_TIMEOUT,
+    ):
+        from src.models.usage import UsageTracker
+
+        self.num_workers = num_workers
+        self.device_groups = device_groups
+        self.start_timeout = start_timeout
+        self.restart_delay = restart_delay
+        self.restart_backoff_max = restart_backoff_max
+        self.max_start_failures = max_start_failures
+        self.response_grace = response_grace
+        self.response_timeout = response_timeout
+        self.usage_tracker = UsageTracker()
+        self.model_path = None
+        # 推理进程按 MODEL_REGISTRY 创建模型注册表，请求可携带 model 参数
+        self.model_names = list(MODEL_REGISTRY) if len(MODEL_REGISTRY) > 1 else []
+        self._ctx = mp.get_context("spawn")
+        self._workers: Dict[int, _WorkerHandle] = {}
+        self._pending: Dict[int, _PendingRequest] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready_event = threading.Condition(self._lock)
+        self._stopping = False
+        self.restarts = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        with self._lock:
+            return any(handle.ready for handle in self._workers.values())
+
+    def __len__(self) -> int:
+        return self.num_workers
+
+    def _device_group(self, worker_id: int) -> Optional[List[int]]:
+        if not self.device_groups:
+            return None
+        return list(self.device_groups[worker_id % len(self.device_groups)])
+
+    def _spawn(self, worker_id: int, failures: int = 0) -> None:
+        request_recv, request_send = self._ctx.Pipe(duplex=False)
+        response_recv, response_send = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._device_group(worker_id), request_recv, response_send),
+            name=f"inference-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        # 子进程已持有另一端，关闭本进程中的副本，子进程退出时才能读到EOF
+        request_recv.close()
+        response_send.close()
+        self._workers[worker_id] = _WorkerHandle(worker_id, process, request_send, response_recv, failures)
+
+    def start(self) -> "WorkerPool":
+        """启动所有推理进程，并等待至少一个进程完成模型加载"""
+        with self._lock:
+            for worker_id in range(self.num_workers):
+                self._spawn(worker_id)
+        threading.Thread(target=self._dispatch_responses, name="worker-responses", daemon=True).start()
+        threading.Thread(target=self._monitor, name="worker-monitor", daemon=True).start()
+
+        deadline = time.monotonic() + self.start_timeout
+        with self._ready_event:
+            while not any(handle.ready for handle in self._workers.values()):
+                if all(handle.failed for handle in self._workers.values()):
+                    raise RuntimeError("推理进程均未能加载模型，已停止重启，请检查模型路径与GPU环境。")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError("推理进程启动超时，请检查模型路径与GPU环境。")
+                self._ready_event.wait(remaining)
+        return self
+
+    def shutdown(self) -> None:
+        """关闭管道使推理进程退出"""
+        self._stopping = True
+        with self._lock:
+            handles = list(self._workers.values())
+        for handle in handles:
+            handle.close()
+        for handle in handles:
+            handle.process.join(timeout=5)
+            if handle.process.is_alive():
+                handle.process.terminate()
+
+    def _dispatch_responses(self) -> None:
+        while not self._stopping:
+            with self._lock:
+                by_conn = {
+                    handle.response_conn: handle
+                    for handle in self._workers.values()
+                    if not handle.response_conn.closed
+                }
+            if not by_conn:
+                time.sleep(0.1)
+                continue
+            try:
+                ready = wait(list(by_conn), timeout=0.5)
+            except (OSError, ValueError):
+                # 收集连接之后监控线程关闭了其中某个连接，重新收集
+                continue
+            for conn in ready:
+                handle = by_conn[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    # 进程已退出，停止向其分发；善后与重启由监控线程负责
+                    with self._lock:
+                        handle.ready = False
+                    handle.close()
+                    continue
+                self._handle_message(handle, message)
+
+    def _handle_message(self, handle: _WorkerHandle, message: Dict[str, Any]) -> None:
+        if message["type"] == "ready":
+            with self._ready_event:
+                handle.ready = True
+                handle.failures = 0
+                self._ready_event.notify_all()
+            print(f"✓ 推理进程 {handle.worker_id} 已就绪（pid={message['pid']}）")
+            return
+        with self._lock:
+            pending = self._pending.get(message["id"])
+        # pending为None：调用方已放弃该请求（如流式连接断开），丢弃后续消息
+        if pending is not None:
+            pending.responses.put(message)
+
+    def _monitor(self) -> None:
+        while not self._stopping:
+            time.sleep(1)
+            now = time.monotonic()
+            with self._lock:
+                dead = [
+                    h for h in self._workers.values()
+                    if not h.failed and h.restart_at is None and not h.process.is_alive()
+                ]
+            for handle in dead:
+                self._on_exit(handle, now)
+            with self._lock:
+                due = [h for h in self._workers.values() if h.restart_at is not None and h.restart_at <= now]
+            for handle in due:
+                if self._stopping:
+                    return
+                with self._lock:
+                    self._spawn(handle.worker_id, failures=handle.failures)
+                self.restarts += 1
+
+    def _on_exit(self, handle: _WorkerHandle, now: float) -> None:
+        """进程退出：使其在途请求失败，并按连续失败次数安排重启或停止重启"""
+        with self._ready_event:
+            handle.ready = False
+            handle.failures += 1
+            handle.close()
+            lost = [p for p in self._pending.values() if p.worker_id == handle.worker_id]
+            if handle.failures >= self.max_start_failures:
+                handle.failed = True
+                # 唤醒 start() 中的等待，所有进程都失败时立即报错
+                self._ready_event.notify_all()
+            else:
+                delay = min(self.restart_delay * 2 ** (handle.failures - 1), self.restart_backoff_max)
+                handle.restart_at = now + delay
+        for pending in lost:
+            pending.responses.put({"type": "error", "error": "推理进程异常退出，请重试。"})
+        if handle.failed:
+            print(
+                f"❌ 推理进程 {handle.worker_id} 连续 {handle.failures} 次未能就绪即退出"
+                f"（exitcode={handle.process.exitcode}），已停止重启"
+            )
+        else:
+            print(
+                f"⚠️ 推理进程 {handle.worker_id} 异常退出"
+                f"（exitcode={handle.process.exitcode}），{handle.restart_at - now:.0f} 秒后重启..."
+            )
+
+    def _submit(
+        self,
+        method: str,
+        conversations: List[Messages],
+        kwargs: Dict[str, Any],
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> Tuple[int, _PendingRequest]:
+        with self._lock:
+            candidates = [h for h in self._workers.values() if h.ready]
+            if not candidates:
+                raise RuntimeError("推理进程尚未就绪，请稍后重试。")
+            handle = min(candidates, key=lambda h: h.in_flight)
+            handle.in_flight += 1
+            request_id = next(self._ids)
+
+        try:
+            stripped, segments, handles = export_images(conversations)
+        except BaseException:
+            with self._lock:
+                handle.in_flight -= 1
+            raise
+        pending = _PendingRequest(handle.worker_id, segments)
+        # 排队深度只在界面进程可见，随请求传给推理进程用于选择视觉token预算
+        kwargs = {"queue_depth": generation_queue_depth(), **kwargs}
+        with self._lock:
+            self._pending[request_id] = pending
+        try:
+            with handle.send_lock:
+                handle.request_conn.send({
+                    "id": request_id,
+                    "method": method,
+                    "conversations": stripped,
+                    "images": handles,
+                    "kwargs": kwargs,
+                    "timeout": cancel_token.remaining() if cancel_token is not None else None,
+                })
+        except (OSError, ValueError):
+            self._finish(request_id)
+            raise RuntimeError("推理进程不可用，请重试。")
+        if cancel_token is not None:
+            cancel_token.add_callback(lambda: self._send_cancel(handle, request_id))
+        return request_id, pending
+
+    def _send_cancel(self, handle: _WorkerHandle, request_id: int) -> None:
+        with self._lock:
+            if request_id not in self._pending:
+                return
+        try:
+            with handle.send_lock:
+                handle.request_conn.send({"type": "cancel", "id": request_id})
+        except (OSError, ValueError):
+            # 进程已退出，其在途请求由监控线程处理
+            pass
+
+    def _finish(self, request_id: int) -> None:
+        with self._lock:
+            pending = self._pending.pop(request_id, None)
+            if pending is not None:
+                handle = self._workers.get(pending.worker_id)
+                if handle is not None and handle.in_flight > 0:
+                    handle.in_flight -= 1
+        if pending is not None:
+            release_segments(pending.segments)
+
+    def _next_response(
+        self,
+        pending: _PendingRequest,
+        cancel_token: Optional[CancellationToken],
+    ) -> Dict[str, Any]:
+        """
+        等待推理进程的下一条响应：有截止时间时最多等到截止后 response_grace 秒，否则 response_timeout 秒
+
+        Raises:
+            RuntimeError: 超时（同时取消请求，通知推理进程停止）
+        """
+        remaining = cancel_token.remaining() if cancel_token is not None else None
+        timeout = self.response_timeout if remaining is None else remaining + self.response_grace
+        try:
+            return pending.responses.get(timeout=timeout)
+        except queue.Empty:
+            if cancel_token is not None:
+                cancel_token.cancel()
+            raise RuntimeError("推理进程长时间没有响应，请重试。")
+
+    def _record(self, usage: Optional[Dict[str, Any]]) -> None:
+        if usage:
+            self.usage_tracker.record(usage)
+
+    def _call(
+        self,
+        method: str,
+        conversations: List[Messages],
+        kwargs: Dict[str, Any],
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> Any:
+        request_id, pending = self._submit(method, conversations, kwargs, cancel_token)
+        try:
+            message = self._next_response(pending, cancel_token)
+        finally:
+            self._finish(request_id)
+        if message["type"] == "error":
+            raise RuntimeError(message["error"])
+        return message["result"]
+
+    def generate(
+        self,
+        messages: Messages,
+        image: Any = None,
+        cancel_token: Optional[CancellationToken] = None,
+        **kwargs,
+    ) -> Tuple[str, Dict[str, Any]]:
+        text, usage = self._call("generate", [messages], kwargs, cancel_token)
+        self._record(usage)
+        return text, usage
+
+    def generate_batch(
+        self,
+        conversations: List[Messages],
+        cancel_token: Optional[CancellationToken] = None,
+        **kwargs,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        results = self._call("generate_batch", conversations, kwargs, cancel_token)
+        for _, usage in results:
+            self._record(usage)
+        return results
+
+    def generate_stream(
+        self,
+        messages: Messages,
+        cancel_token: Optional[CancellationToken] = None,
+        **kwargs,
+    ) -> Iterator[Dict[str, Any]]:
+        # 调用方提前关闭时也要通知推理进程停止，因此总是携带令牌
+        token = cancel_token or CancellationToken()
+        request_id, pending = self._submit("generate_stream", [messages], kwargs, token)
+        try:
+            while True:
+                message = self._next_response(pending, token)
+                if message["type"] == "error":
+                    raise RuntimeError(message["error"])
+                message.pop("id", None)
+                if message["type"] == "done":
+                    self._record(message.get("usage"))
+                    yield message
+                    return
+                yield message
+        except GeneratorExit:
+            token.cancel()
+            raise
+        finally:
+            self._finish(request_id)
+
+    def health(self) -> List[Dict[str, Any]]:
+        """各推理进程的存活、就绪、在途请求数与连续失败状态"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "name": handle.process.name,
+                    "pid": handle.process.pid,
+                    "alive": handle.process.is_alive(),
+                    "ready": handle.ready,
+                    "healthy": not handle.failed,
+                    "in_flight": handle.in_flight,
+                    "consecutive_failures": handle.failures,
+                    "restart_in": round(max(0.0, handle.restart_at - now), 1) if handle.restart_at is not None else None,
+                }
+                for handle in self._workers.values()
+            ]
+
+    def get_model_info(self) -> Dict[str, Any]:
+        with self._lock:
+            ready = sum(handle.ready for handle in self._workers.values())
+            failed = sum(handle.failed for handle in self._workers.values())
+        return {
+            "推理进程数": self.num_workers,
+            "已就绪": ready,
+            "已停止重启": failed,
+            "设备组": self.device_groups or "未指定",
+            "用量日志": str(self.usage_tracker.log_path or "未启用"),
+        }
@@ -3,18 +3,26 @@ from .components import (
     render_recent_creations,
     handle_image_upload,
     chat_with_image,
+    merge_uploads,
     reset_conversation,
     create_hero_section,
     create_footer_section,
 )
+from .upload import UploadedImage, UploadedGallery
 from .styles import CUSTOM_CSS
+from .scripts import build_lookup_js, build_apply_suggestion_js
 
 __all__ = [
     "render_recent_creations",
     "handle_image_upload",
     "chat_with_image",
+    "merge_uploads",
     "reset_conversation",
     "create_hero_section",
     "create_footer_section",
+    "UploadedImage",
+    "UploadedGallery",
     "CUSTOM_CSS",
+    "build_lookup_js",
+    "build_apply_suggestion_js",
 ]
\ No newline at end of file
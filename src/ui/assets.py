@@ -0,0 +1,103 @@
+"""
+静态资源模块 - Static Assets
+读取 scripts/build_static_assets.py 的构建清单，按客户端支持的编码
+返回预压缩文件，并为带内容哈希的文件设置长期缓存头
+"""
+import json
+import mimetypes
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import STATIC_ASSETS_DIR, STATIC_URL_PREFIX, STATIC_CACHE_MAX_AGE
+
+# 构建清单文件名
+MANIFEST_NAME = "manifest.json"
+
+# 预压缩文件的后缀，按优先级排列
+PRECOMPRESSED_SUFFIXES = [("br", ".br"), ("gzip", ".gz")]
+
+mimetypes.add_type("font/woff2", ".woff2")
+mimetypes.add_type("font/woff", ".woff")
+
+
+def load_manifest(dist_dir: Path = STATIC_ASSETS_DIR) -> Optional[Dict[str, Any]]:
+    """
+    读取构建清单
+
+    Returns:
+        清单字典（含 css 与 files 两个键）；尚未构建时返回None
+    """
+    manifest_path = Path(dist_dir) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    with manifest_path.open(encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def asset_url(name: str) -> str:
+    return f"{STATIC_URL_PREFIX}/{name}"
+
+
+def asset_head_tags(manifest: Dict[str, Any]) -> str:
+    """生成引用构建后样式表的 <head> 标签"""
+    return f'<link rel="stylesheet" href="{asset_url(manifest["css"])}">'
+
+
+def _accepted_encodings(request: Request) -> set:
+    header = request.headers.get("accept-encoding", "")
+    accepted = set()
+    for token in header.split(","):
+        name, _, params = token.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def create_static_router(dist_dir: Path = STATIC_ASSETS_DIR) -> APIRouter:
+    """
+    创建静态资源路由
+
+    只提供清单中列出的文件；客户端声明支持 br/gzip 且存在对应的
+    预压缩文件时直接返回压缩版本，不在请求时压缩。
+
+    Args:
+        dist_dir: 构建产物目录
+
+    Returns:
+        可挂载到Gradio服务器的FastAPI路由
+    """
+    dist_dir = Path(dist_dir)
+    # 构建产物在服务启动后不会变化，清单只读取一次
+    files = (load_manifest(dist_dir) or {}).get("files", {})
+    router = APIRouter(prefix=STATIC_URL_PREFIX)
+
+    @router.get("/{path:path}")
+    def static_asset(path: str, request: Request) -> Response:
+        entry = files.get(path)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="资源不存在")
+
+        etag = f'"{entry["hash"]}"'
+        headers = {
+            "Cache-Control": f"public, max-age={STATIC_CACHE_MAX_AGE}, immutable",
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+        }
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        accepted = _accepted_encodings(request)
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+            if encoding in accepted and encoding in entry.get("encodings", []):
+                headers["Content-Encoding"] = encoding
+                return FileResponse(dist_dir / f"{path}{suffix}", media_type=media_type, headers=headers)
+        return FileResponse(dist_dir / path, media_type=media_type, headers=headers)
+
+    return router
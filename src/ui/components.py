@@ -3,8 +3,9 @@ UI组件模块 - Components
 定义Gradio界面组件和渲染逻辑
 """
 import functools
+import hashlib
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 import gradio as gr
 from PIL import Image
 
@@ -15,7 +16,8 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.config import (
     DEFAULT_FORMAT,
     DEFAULT_STYLE,
-    MAX_RECENT_ENTRIES,
+    RECENT_THUMBNAIL_SIZE,
+    MULTI_IMAGE_MAX,
     IMAGE_UPLOAD_HEIGHT,
     CHATBOT_HEIGHT,
     POEM_OUTPUT_LINES,
@@ -33,15 +35,35 @@ from src.constants.templates import (
     RECENT_EMPTY_TEMPLATE,
 )
 from src.utils.image_processor import (
-    analyze_image_profile,
+    aggregate_image_profiles,
+    analyze_image_profiles,
     encode_image_to_data_uri,
     preprocess_image,
+    ImageValidationError,
 )
+from src.utils.image_store import get_image_store
+from src.utils.video_frames import get_clip_cache, is_clip
 from src.utils.prompt_builder import (
     format_prompt_preview,
     style_prompt_preview,
     apply_suggestion,
 )
+from src.models.result_cache import build_cache_key, get_result_cache
+from src.serving.cancellation import STOP_DEADLINE, CancellationToken, get_cancellation_registry
+from src.serving.sessions import SessionMemory, get_session_store
+from src.serving.degradation import DegradationPlan
+
+# 缓存命中时展示的标记
+CACHED_MARKER = "⚡ 已命中缓存：相同图片与参数的创作结果已直接返回"
+
+# 到达截止时间、只返回部分诗句时展示的标记
+DEADLINE_MARKER = "⏱ 已到生成时限：以下为已完成的部分，可稍后重试"
+
+# 高负载下启用降级档位时展示的标记
+DEGRADED_MARKER = "🚦 当前创作人数较多：已启用「{name}」档位以加快响应，可稍后重试获得完整效果"
+
+# chat_with_image 的输出数量（请求被取消时全部保持不变）
+CHAT_OUTPUT_COUNT = 6
 
 # 类型别名
 ChatHistory = List[Tuple[str, str]]
@@ -82,6 +104,97 @@ def render_recent_creations(entries: List[Dict[str, Any]]) -> str:
     return f"<div class='recent-grid'>{''.join(cards)}</div>"
 
 
+def load_uploaded_image(image: str) -> Tuple[str, Image.Image]:
+    """
+    把上传文件存入图片库并取出RGB图像
+
+    同一图片重复上传时只存一份，解码后的像素由图片库缓存，不再重复解码。
+
+    Returns:
+        (图片摘要, RGB图像)
+
+    Raises:
+        gr.Error: 图片未通过校验（尺寸、格式或大小不符合要求）
+    """
+    store = get_image_store()
+    try:
+        return store.load(image)
+    except ImageValidationError as exc:
+        raise gr.Error(str(exc)) from exc
+
+
+def merge_uploads(images: Any, clip: Any = None) -> List[str]:
+    """合并组图与短视频/动图上传框的文件路径（视频排在照片之后）"""
+    paths = [images] if isinstance(images, (str, Path)) else list(images or [])
+    if clip:
+        paths.append(clip)
+    return paths
+
+
+def load_uploaded_images(images: Any) -> Tuple[str, List[Image.Image]]:
+    """
+    把一张或一组上传文件存入图片库并取出RGB图像
+
+    视频与动图只取场景变化最大的几个关键帧（见 src.utils.video_frames），
+    关键帧与照片一样存入图片库，按上传顺序排列。
+
+    Args:
+        images: 上传文件的路径，或路径列表（见 src.ui.upload.UploadedGallery 与 merge_uploads）
+
+    Returns:
+        (组图摘要, 按上传顺序的RGB图像列表)；只有一个文件时组图摘要即该文件的摘要，
+        与单图上传的结果缓存和缩略图通用
+
+    Raises:
+        gr.Error: 照片数超过上限或图片/视频未通过校验
+    """
+    paths = merge_uploads(images)
+    if len(paths) > MULTI_IMAGE_MAX:
+        raise gr.Error(f"一次最多上传 {MULTI_IMAGE_MAX} 张照片，请删减后再试。")
+    digests: List[str] = []
+    frames: List[Image.Image] = []
+    for path in paths:
+        if is_clip(path):
+            try:
+                digest, keyframes, _ = get_clip_cache().load(path)
+            except ImageValidationError as exc:
+                raise gr.Error(str(exc)) from exc
+        else:
+            digest, image = load_uploaded_image(path)
+            keyframes = [image]
+        digests.append(digest)
+        frames.extend(keyframes)
+    if len(frames) > MULTI_IMAGE_MAX:
+        raise gr.Error(f"照片与视频关键帧合计最多 {MULTI_IMAGE_MAX} 张，请删减后再试。")
+    if len(digests) == 1:
+        return digests[0], frames
+    # 组图按顺序组合摘要：顺序不同视为不同的作品
+    series = hashlib.sha256("+".join(digests).encode("ascii")).hexdigest()
+    return series, frames
+
+
+def _series_thumbnail(images: List[Image.Image]) -> Image.Image:
+    """创作记录卡片的缩略图：单图直接缩小，组图把前几张横向拼接"""
+    if len(images) == 1:
+        thumbnail = images[0].copy()
+    else:
+        tiles = []
+        for image in images[:3]:
+            tile = image.copy()
+            tile.thumbnail((RECENT_THUMBNAIL_SIZE, RECENT_THUMBNAIL_SIZE))
+            tiles.append(tile)
+        # 统一高度后拼接
+        height = min(tile.height for tile in tiles)
+        tiles = [tile.resize((max(1, tile.width * height // tile.height), height)) for tile in tiles]
+        thumbnail = Image.new("RGB", (sum(tile.width for tile in tiles), height))
+        offset = 0
+        for tile in tiles:
+            thumbnail.paste(tile, (offset, 0))
+            offset += tile.width
+    thumbnail.thumbnail((RECENT_THUMBNAIL_SIZE, RECENT_THUMBNAIL_SIZE))
+    return thumbnail
+
+
 def handle_image_upload(image: Any) -> Tuple[
     Dict[str, Any],  # style_selector更新
     str,             # style_hint
@@ -94,17 +207,18 @@ def handle_image_upload(image: Any) -> Tuple[
     处理图片上传事件
     
     当用户上传图片时：
-    1. 分析图片特征
-    2. 推荐合适的创作风格
+    1. 分析图片特征（组图逐张分析，统计一次批量计算）
+    2. 汇总各张的结果，推荐合适的创作风格
     3. 更新UI显示
     
     Args:
-        image: 上传的图片数组
+        image: 上传文件的路径列表（见 merge_uploads），也可为单个路径；
+            视频与动图按关键帧分析
         
     Returns:
         多个UI组件的更新值
     """
-    if image is None:
+    if not image:
         # 图片为空时返回默认状态
         return (
             gr.update(value=DEFAULT_STYLE),
@@ -115,15 +229,17 @@ def handle_image_upload(image: Any) -> Tuple[
             "⭐ AI 推荐风格：<strong>婉约抒情风</strong>",
         )
     
-    # 转换为PIL图像并分析
-    image_pil = Image.fromarray(image).convert("RGB")
-    profile = analyze_image_profile(image_pil)
+    # 存入图片库（校验文件头、缓存像素）后分析
+    _, images = load_uploaded_images(image)
+    profile = aggregate_image_profiles(analyze_image_profiles(images))
     
     # 格式化分析结果
     tone_text = f"🍑 色调：<strong>{profile['tone']}</strong>"
     scene_text = f"🏞️ 场景：{profile['scene']}"
     mood_text = f"💫 情感：{profile['mood']}"
     recommend_text = f"⭐ AI 推荐风格：<strong>{profile['style']}</strong>"
+    if len(images) > 1:
+        recommend_text += f"（综合 {len(images)} 张画面）"
     
     return (
         gr.update(value=profile["style"]),
@@ -143,129 +259,190 @@ def chat_with_image(
     max_new_tokens: int,
     top_p: float,
     temperature: float,
-    history: ChatHistory | None,
-    recent_creations: List[Dict[str, Any]] | None,
+    seed: int | None,
+    session: SessionMemory,
     model_manager,  # ModelManager实例
+    cancel_token: Optional[CancellationToken] = None,
+    degradation: Optional[DegradationPlan] = None,
+    model_choice: Optional[str] = None,
 ) -> Tuple[
     ChatHistory,                    # chatbot
     Dict[str, Any],                 # prompt_box (清空)
-    ChatHistory,                    # history_state
     str,                            # poem_output
+    str,                            # cache_badge
     Dict[str, Any],                 # suggestion_group (显示)
-    List[Dict[str, Any]],          # recent_state
     str,                            # recent_panel (HTML)
 ]:
     """
     执行诗词生成并更新界面
     
     Args:
-        image: 上传的图片
+        image: 上传文件的路径列表（见 merge_uploads），也可为单个路径；
+            组图的所有照片（视频与动图取关键帧）放在同一个请求中，写成一首
         format_choice: 诗词格式
         style_choice: 创作风格
         user_instruction: 用户提示
         max_new_tokens: 最大生成token数
         top_p: Top-p参数
         temperature: 温度参数
-        history: 对话历史
-        recent_creations: 最近创作记录
+        seed: 随机种子（固定种子时才会使用结果缓存）
+        session: 当前会话（对话历史与创作记录）
         model_manager: 模型管理器实例
+        cancel_token: 取消令牌；请求被取消（如已清除对话）时不更新任何组件，
+            到达截止时间时展示已生成的部分
+        degradation: 过载降级档位；按其限制生成长度、解码方式与送入模型的
+            对话轮数（会话中仍保存完整历史），model_manager 由调用方按档位选择
+        model_choice: 模型注册表中的模型名（None 表示后端的默认模型）
         
     Returns:
         更新后的各个UI组件状态
     """
     # 验证输入
-    if image is None:
+    if not image:
         raise gr.Error("请先上传图片，再开始创作对话。")
     
-    # 初始化状态
-    history = history or []
-    recent_creations = recent_creations or []
+    history = session.history_turns()
+    do_sample = True
+    if degradation is not None:
+        history = degradation.trim_history(history)
+        max_new_tokens = degradation.max_new_tokens
+        do_sample = degradation.do_sample
     
-    # 预处理图像
-    image_pil = Image.fromarray(image).convert("RGB")
+    # 从图片库取出图像（上传时已解码过的像素直接复用）
+    image_digest, images = load_uploaded_images(image)
     
     # 构建消息
     from src.utils.prompt_builder import build_messages
     messages = build_messages(
-        image_pil,
+        images,
         format_choice,
         style_choice,
         user_instruction,
         history
     )
     
-    try:
-        # 调用模型生成
-        generated_text = model_manager.generate(
-            messages=messages,
-            image=image_pil,
-            max_new_tokens=max_new_tokens,
-            top_p=top_p,
-            temperature=temperature,
+    # 固定种子的请求可复现，先查询结果缓存
+    result_cache = get_result_cache()
+    cache_key = None
+    cached = None
+    if result_cache is not None and seed is not None:
+        cache_key = build_cache_key(
+            image_digest,
+            format_choice,
+            style_choice,
+            user_instruction,
+            history,
+            {
+                "model": model_choice or getattr(model_manager, "model_path", None),
+                "max_new_tokens": int(max_new_tokens),
+                "top_p": float(top_p),
+                "temperature": float(temperature),
+                "do_sample": do_sample,
+                "seed": int(seed),
+            },
         )
-    except RuntimeError as exc:
-        raise gr.Error(str(exc)) from exc
+        cached = result_cache.get(cache_key)
+
+    stop_reason = None
+    if cached is not None:
+        generated_text = cached["text"]
+    else:
+        # 排队期间已被取消的请求不再占用模型
+        if cancel_token is not None and cancel_token.cancelled:
+            return tuple(gr.update() for _ in range(CHAT_OUTPUT_COUNT))
+        try:
+            # 调用模型生成
+            generated_text, usage = model_manager.generate(
+                messages=messages,
+                image=images[0],
+                max_new_tokens=max_new_tokens,
+                top_p=top_p,
+                temperature=temperature,
+                do_sample=do_sample,
+                format_choice=format_choice,
+                style_choice=style_choice,
+                seed=seed,
+                cancel_token=cancel_token,
+                **({"model": model_choice} if model_choice else {}),
+            )
+        except RuntimeError as exc:
+            raise gr.Error(str(exc)) from exc
+        stop_reason = usage.get("stop_reason")
+        # 对话已被清除：丢弃结果，不覆盖重置后的界面
+        if cancel_token is not None and cancel_token.cancelled:
+            return tuple(gr.update() for _ in range(CHAT_OUTPUT_COUNT))
+        # 未完成的部分结果不写入缓存
+        if cache_key is not None and stop_reason is None:
+            result_cache.put(cache_key, {"text": generated_text})
     
-    # 更新历史记录
+    # 更新会话：轮次文本只存一份，创作记录引用轮次与缩略图
     user_record = user_instruction.strip() or "（未额外输入提示，使用默认风格创作）"
-    updated_history = history + [(user_record, generated_text)]
-    
-    # 创建新的创作记录
-    recent_entry = {
-        "format": format_choice,
-        "style": style_choice,
-        "prompt": user_record,
-        "history": updated_history[-10:],  # 只保存最近10轮对话
-        "image": encode_image_to_data_uri(image_pil),
-        "timestamp": datetime.now().strftime("%H:%M:%S"),
-    }
+    updated_history = session.append_turn(user_record, generated_text)
+    thumbnail_uri = session.image_uri(image_digest)
+    if thumbnail_uri is None:
+        thumbnail_uri = encode_image_to_data_uri(_series_thumbnail(images))
+    session.add_recent(
+        {
+            "format": format_choice,
+            "style": style_choice,
+            "prompt": user_record,
+            "timestamp": datetime.now().strftime("%H:%M:%S"),
+        },
+        image_digest=image_digest,
+        image_uri=thumbnail_uri,
+    )
     
-    # 更新最近创作列表
-    updated_recent = [recent_entry] + recent_creations
-    updated_recent = updated_recent[:MAX_RECENT_ENTRIES]
+    badge = ""
+    if cached is not None:
+        badge = CACHED_MARKER
+    elif stop_reason == STOP_DEADLINE:
+        badge = DEADLINE_MARKER
+    elif degradation is not None and degradation.degraded:
+        badge = DEGRADED_MARKER.format(name=degradation.name)
     
     return (
         updated_history,           # 更新对话框
         {"value": ""},            # 清空输入框
-        updated_history,           # 更新历史状态
         generated_text,            # 更新诗词输出
+        badge,                     # 缓存/时限标记
         gr.update(visible=True),   # 显示优化建议
-        updated_recent,            # 更新创作记录
-        render_recent_creations(updated_recent),  # 渲染创作记录
+        render_recent_creations(session.recent_entries()),  # 渲染创作记录
     )
 
 
 def reset_conversation(
-    recent_creations: List[Dict[str, Any]] | None
+    request: gr.Request | None = None,
 ) -> Tuple[
     ChatHistory,
     Dict[str, Any],
-    ChatHistory,
+    str,
     str,
     Dict[str, Any],
-    List[Dict[str, Any]],
     str,
 ]:
     """
     重置对话状态
     
-    清空对话历史和输出，但保留最近创作记录
+    清空对话历史和输出，但保留最近创作记录；该会话进行中的生成一并取消，
+    在下一个解码步释放生成名额
     
     Args:
-        recent_creations: 最近创作记录
+        request: Gradio请求（自动注入），用于定位当前会话
         
     Returns:
         重置后的各个UI组件状态
     """
-    entries = recent_creations or []
+    session_id = request.session_hash if request is not None else None
+    get_cancellation_registry().cancel(session_id)
+    session = get_session_store().get(session_id)
+    session.reset_history()
     return (
         [],                         # 清空对话框
         {"value": ""},             # 清空输入框
-        [],                         # 清空历史
         "",                         # 清空输出
+        "",                         # 清空缓存标记
         gr.update(visible=False),   # 隐藏建议
-        entries,                    # 保留创作记录
-        render_recent_creations(entries),
+        render_recent_creations(session.recent_entries()),
     )
 
 
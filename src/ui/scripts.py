@@ -0,0 +1,40 @@
+"""
+UI脚本模块 - Client Scripts
+生成在浏览器端执行的事件处理函数，纯界面交互不经过服务器队列
+"""
+import json
+from typing import Callable, Iterable
+
+
+def build_lookup_js(preview: Callable[[str], str], choices: Iterable[str]) -> str:
+    """
+    在构建界面时预先计算所有选项的预览文本，生成查表的JS处理函数
+
+    Args:
+        preview: 选项 → 预览文本的函数（如 format_prompt_preview）
+        choices: 全部选项
+
+    Returns:
+        可传给事件 js 参数的函数源码
+
+    Example:
+        >>> js = build_lookup_js(format_prompt_preview, FORMAT_GUIDE.keys())
+        >>> format_selector.change(fn=None, js=js, inputs=format_selector, outputs=format_hint)
+    """
+    table = {choice: preview(choice) for choice in choices}
+    return f"(choice) => ({json.dumps(table, ensure_ascii=False)})[choice] ?? ''"
+
+
+def build_apply_suggestion_js(snippet: str) -> str:
+    """
+    生成与 apply_suggestion 等价的JS处理函数：当前文本非空且未以
+    句末标点结尾时先补分号，再追加建议片段
+    """
+    return (
+        "(current) => {"
+        " const text = (current || '').trim();"
+        f" const snippet = {json.dumps(snippet, ensure_ascii=False)};"
+        " if (!text) return snippet;"
+        " return (/[。！？；]$/.test(text) ? text : text + '；') + snippet;"
+        " }"
+    )
@@ -1,18 +1,15 @@
 """
 UI样式模块 - Styles
 定义Gradio界面的CSS样式
+
+不引用任何外部资源；字体由 scripts/build_static_assets.py 打包到本地，
+构建产物存在时页面改为引用压缩后的样式文件
 """
 
 # 完整的CSS样式定义
 CUSTOM_CSS = """
-/* Import modern fonts including Microsoft YaHei for elegant typography */
-@import url('https://fonts.googleapis.com/css2?family=Noto+Serif+SC:wght@400;500;600;700&family=Inter:wght@300;400;500;600;700&display=swap');
-
-/* Fallback for Microsoft YaHei */
-@font-face {
-  font-family: 'Microsoft YaHei';
-  src: local('Microsoft YaHei'), url('https://fonts.cdnfonts.com/css/microsoft-yahei') format('woff');
-}
+/* Fonts: Noto Serif SC / Inter are bundled by scripts/build_static_assets.py;
+   without a build the stack falls back to locally installed fonts */
 
 /* Root variables for colors, radii, shadows - enhanced for 2025 trends */
 :root {
@@ -301,6 +298,13 @@ CUSTOM_CSS = """
   color: var(--text-muted);
 }
 
+/* Cache marker */
+.cache-badge {
+  font-size: 0.85rem;
+  color: var(--accent-purple);
+  min-height: 1.2rem;
+}
+
 /* Suggestion box */
 .suggestion-box {
   background: linear-gradient(145deg, #f3f4f6, #e5e7eb);
@@ -0,0 +1,40 @@
+"""
+上传组件模块 - Upload
+图片上传组件：前端与 gr.Image / gr.Gallery 相同，处理函数收到的是上传文件的路径
+"""
+from typing import List, Optional
+
+import gradio as gr
+
+
+class UploadedImage(gr.Image):
+    """
+    跳过 Gradio 自带预处理的图片上传组件
+
+    gr.Image 的预处理会先解码图片（type="filepath" 时还会重新编码）；
+    这里直接返回上传文件的路径，原始文件交给图片库校验、去重与解码。
+
+    注：Gradio 会在本模块旁生成 upload.pyi 类型存根（已加入 .gitignore）。
+    """
+
+    # 前端沿用 gr.Image 的组件
+    is_template = True
+
+    def preprocess(self, payload) -> Optional[str]:
+        return None if payload is None else str(payload.path)
+
+
+class UploadedGallery(gr.Gallery):
+    """
+    组图上传组件（一次上传多张照片，写成一首）
+
+    处理函数按展示顺序收到上传文件的路径列表，与 UploadedImage 一样不解码图片。
+    """
+
+    # 前端沿用 gr.Gallery 的组件
+    is_template = True
+
+    def preprocess(self, payload) -> Optional[List[str]]:
+        if payload is None or not payload.root:
+            return None
+        return [str(item.image.path) for item in payload.root]
@@ -2,9 +2,23 @@
 from .image_processor import (
     encode_image_to_data_uri,
     analyze_image_profile,
+    analyze_image_profiles,
+    aggregate_image_profiles,
     validate_image,
     preprocess_image,
     get_image_info,
+    probe_image,
+    check_image_info,
+    decode_image,
+    ImageValidationError,
+)
+from .image_store import ImageStore, get_image_store
+from .video_frames import (
+    ClipKeyframeCache,
+    extract_keyframes,
+    get_clip_cache,
+    is_clip,
+    scene_change_scores,
 )
 from .prompt_builder import (
     build_messages,
@@ -20,9 +34,24 @@ __all__ = [
     # image_processor
     "encode_image_to_data_uri",
     "analyze_image_profile",
+    "analyze_image_profiles",
+    "aggregate_image_profiles",
     "validate_image",
     "preprocess_image",
     "get_image_info",
+    "probe_image",
+    "check_image_info",
+    "decode_image",
+    "ImageValidationError",
+    # image_store
+    "ImageStore",
+    "get_image_store",
+    # video_frames
+    "ClipKeyframeCache",
+    "extract_keyframes",
+    "get_clip_cache",
+    "is_clip",
+    "scene_change_scores",
     # prompt_builder
     "build_messages",
     "apply_suggestion",
@@ -4,9 +4,10 @@
 """
 import base64
 import io
-from typing import Dict
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Union
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageOps, UnidentifiedImageError
 
 import sys
 from pathlib import Path
@@ -18,8 +19,24 @@ from config.config import (
     BRIGHTNESS_LOW_THRESHOLD,
     SATURATION_HIGH_THRESHOLD,
     COLOR_DOMINANCE_THRESHOLD,
+    UPLOAD_MAX_BYTES,
+    IMAGE_MIN_SIDE,
+    IMAGE_MAX_PIXELS,
+    IMAGE_MAX_DECODED_MB,
+    IMAGE_SUPPORTED_FORMATS,
+    IMAGE_SUPPORTED_MODES,
 )
 
+# EXIF方向标签；5-8 表示图像需旋转90°，显示时宽高互换
+EXIF_ORIENTATION_TAG = 0x0112
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+ImageSource = Union[bytes, str, Path, Image.Image]
+
+
+class ImageValidationError(ValueError):
+    """上传图片未通过校验（尺寸、格式或大小不符合要求）"""
+
 
 def encode_image_to_data_uri(image: Image.Image) -> str:
     """
@@ -74,20 +91,49 @@ def analyze_image_profile(image: Image.Image) -> Dict[str, str]:
             'mood': '壮阔豪迈'
         }
     """
-    resized = image.resize(IMAGE_ANALYSIS_SIZE)
-    arr = np.asarray(resized).astype("float32") / 255.0
+    return analyze_image_profiles([image])[0]
 
-    mean_rgb = arr.mean(axis=(0, 1))  
-    std_rgb = arr.std(axis=(0, 1))    
 
-    brightness = float(arr.mean())
-    saturation = float(
-        np.sqrt(
-            ((arr - arr.mean(axis=2, keepdims=True)) ** 2).mean(axis=2)
-        ).mean()
-    )
-    
-    red, green, blue = mean_rgb
+def analyze_image_profiles(images: Sequence[Image.Image]) -> List[Dict[str, str]]:
+    """
+    批量分析多张图像（组图上传时使用）
+
+    各图缩放到 IMAGE_ANALYSIS_SIZE 后堆叠为一个数组，颜色、亮度与饱和度统计
+    一次向量化计算完成，再逐张按 analyze_image_profile 的规则分类。
+
+    Args:
+        images: PIL图像列表
+
+    Returns:
+        与输入顺序一致的分析结果列表（字段同 analyze_image_profile）
+    """
+    if not images:
+        return []
+    stack = np.stack([
+        np.asarray(image.resize(IMAGE_ANALYSIS_SIZE).convert("RGB")) for image in images
+    ]).astype("float32") / 255.0
+
+    mean_rgb = stack.mean(axis=(1, 2))
+    std_rgb = stack.std(axis=(1, 2))
+    brightness = stack.mean(axis=(1, 2, 3))
+    saturation = np.sqrt(
+        ((stack - stack.mean(axis=3, keepdims=True)) ** 2).mean(axis=3)
+    ).mean(axis=(1, 2))
+
+    return [
+        _classify_profile(mean_rgb[i], std_rgb[i], float(brightness[i]), float(saturation[i]))
+        for i in range(len(images))
+    ]
+
+
+def _classify_profile(
+    mean_rgb: np.ndarray,
+    std_rgb: np.ndarray,
+    brightness: float,
+    saturation: float,
+) -> Dict[str, str]:
+    """按颜色统计推断风格、色调、场景与情绪"""
+    red, green, blue = (float(value) for value in mean_rgb)
     
     
     if green >= red * COLOR_DOMINANCE_THRESHOLD and green >= blue * 1.05:
@@ -147,16 +193,175 @@ def analyze_image_profile(image: Image.Image) -> Dict[str, str]:
     }
 
 
+def aggregate_image_profiles(profiles: Sequence[Dict[str, str]]) -> Dict[str, str]:
+    """
+    汇总组图的分析结果：每个字段取出现次数最多的值（次数相同时取靠前照片的值）
+
+    Example:
+        >>> aggregate_image_profiles([{"style": "田园归隐风", ...}, {"style": "禅意空灵风", ...},
+        ...                           {"style": "田园归隐风", ...}])["style"]
+        '田园归隐风'
+    """
+    if not profiles:
+        return {}
+    result = {}
+    for key in profiles[0]:
+        values = [profile[key] for profile in profiles]
+        # Counter.most_common 在次数相同时保持首次出现的顺序
+        result[key] = Counter(values).most_common(1)[0][0]
+    return result
+
+
+def _bytes_per_pixel(mode: str) -> int:
+    """PIL像素模式解码后每像素占用的字节数"""
+    bands = Image.getmodebands(mode)
+    if mode in ("I", "F"):
+        return 4
+    if ";16" in mode:
+        return 2 * bands
+    return bands
+
+
+def _read_orientation(raw: Image.Image) -> int:
+    """
+    从文件头中的EXIF块读取方向
+
+    只解析 open() 时已读入 info 的EXIF字节，不调用 getexif()，
+    避免PNG等格式为查找尾部EXIF而解码整幅像素。
+    """
+    exif_bytes = raw.info.get("exif")
+    if not exif_bytes:
+        return 1
+    try:
+        exif = Image.Exif()
+        exif.load(exif_bytes)
+        return int(exif.get(EXIF_ORIENTATION_TAG, 1))
+    except Exception:
+        return 1
+
+
+def _probe_opened(raw: Image.Image, byte_size: Optional[int]) -> Dict[str, Any]:
+    orientation = _read_orientation(raw)
+    width, height = raw.size
+    if orientation in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return {
+        "width": width,
+        "height": height,
+        "mode": raw.mode,
+        "format": raw.format,
+        "orientation": orientation,
+        "byte_size": byte_size,
+        "decoded_bytes": raw.size[0] * raw.size[1] * _bytes_per_pixel(raw.mode),
+    }
+
+
+def probe_image(source: ImageSource) -> Dict[str, Any]:
+    """
+    只读取容器文件头，获取图像元信息（不解码像素）
+
+    Args:
+        source: 原始图片字节、文件路径，或尚未 load() 的PIL图像
+
+    Returns:
+        元信息字典：
+        - width / height: 按EXIF方向校正后的宽高
+        - mode / format: 像素模式与容器格式
+        - orientation: EXIF方向（1 表示无需旋转）
+        - byte_size: 文件字节数（PIL图像输入时为None）
+        - decoded_bytes: 预估解码后的像素内存
+
+    Raises:
+        ImageValidationError: 无法识别的图片
+    """
+    if isinstance(source, Image.Image):
+        return _probe_opened(source, None)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        fp: Any = io.BytesIO(source)
+        byte_size = len(source)
+    else:
+        fp = str(source)
+        byte_size = Path(source).stat().st_size
+    try:
+        with Image.open(fp) as raw:
+            return _probe_opened(raw, byte_size)
+    except Image.DecompressionBombError as exc:
+        raise ImageValidationError("图片像素过多，请压缩后再上传。") from exc
+    except (UnidentifiedImageError, OSError) as exc:
+        raise ImageValidationError("无法识别的图片格式。") from exc
+
+
+def check_image_info(info: Dict[str, Any]) -> None:
+    """
+    按配置的上限校验 probe_image 的结果
+
+    Raises:
+        ImageValidationError: 文件过大、尺寸过小/过大、格式或模式不受支持
+    """
+    if info["format"] not in IMAGE_SUPPORTED_FORMATS:
+        supported = "、".join(IMAGE_SUPPORTED_FORMATS)
+        raise ImageValidationError(f"不支持的图片格式 {info['format']}，请上传 {supported}。")
+    if info["mode"] not in IMAGE_SUPPORTED_MODES:
+        raise ImageValidationError(f"不支持的像素模式 {info['mode']}。")
+    if info["byte_size"] is not None and info["byte_size"] > UPLOAD_MAX_BYTES:
+        raise ImageValidationError(
+            f"图片文件过大（上限 {UPLOAD_MAX_BYTES // (1024 * 1024)}MB）。"
+        )
+    if min(info["width"], info["height"]) < IMAGE_MIN_SIDE:
+        raise ImageValidationError(f"图片尺寸过小，短边至少需要 {IMAGE_MIN_SIDE} 像素。")
+    if info["width"] * info["height"] > IMAGE_MAX_PIXELS:
+        raise ImageValidationError(
+            f"图片分辨率过高（上限约 {IMAGE_MAX_PIXELS // 1_000_000} 百万像素），请缩小后再上传。"
+        )
+    if info["decoded_bytes"] > IMAGE_MAX_DECODED_MB * 1024 * 1024:
+        raise ImageValidationError("图片解码后占用内存过大，请缩小后再上传。")
+
+
+def decode_image(source: ImageSource, max_side: Optional[int] = None) -> Image.Image:
+    """
+    校验文件头后解码为RGB图像
+
+    未通过校验的图片不会分配任何像素内存；指定 max_side 时，
+    JPEG借助 draft() 直接按缩小比例解码，减少解码开销。
+
+    Args:
+        source: 原始图片字节、文件路径，或尚未 load() 的PIL图像
+        max_side: 解码后长边上限（None 表示保持原尺寸）
+
+    Returns:
+        按EXIF方向校正后的RGB图像
+
+    Raises:
+        ImageValidationError: 图片无法识别或未通过校验
+    """
+    info = probe_image(source)
+    check_image_info(info)
+
+    if isinstance(source, Image.Image):
+        raw = source
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        raw = Image.open(io.BytesIO(source))
+    else:
+        raw = Image.open(str(source))
+    try:
+        if max_side and raw.format == "JPEG":
+            raw.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(raw).convert("RGB")
+    except (OSError, ValueError) as exc:
+        raise ImageValidationError("图片数据已损坏，无法解码。") from exc
+    finally:
+        if raw is not source:
+            raw.close()
+    if max_side:
+        image.thumbnail((max_side, max_side))
+    return image
+
+
 def validate_image(image: Image.Image) -> bool:
+    """检查图像尺寸与模式是否满足要求（只读取元信息，不解码像素）"""
     try:
-        # 检查图像尺寸
-        if image.width < 32 or image.height < 32:
-            return False
-        
-        # 检查图像模式
-        if image.mode not in ['RGB', 'RGBA', 'L']:
-            return False
-        
+        check_image_info(_probe_opened(image, None))
         return True
     except Exception:
         return False
@@ -168,11 +373,13 @@ def preprocess_image(image: Image.Image) -> Image.Image:
     return image
 
 
-def get_image_info(image: Image.Image) -> Dict[str, any]:
+def get_image_info(image: Image.Image) -> Dict[str, Any]:
+    # 由尺寸与像素模式推算，不调用 tobytes() 复制整块像素
     return {
         "width": image.width,
         "height": image.height,
         "mode": image.mode,
         "format": image.format,
-        "size_kb": len(image.tobytes()) / 1024,
-    }
\ No newline at end of file
+        "size_kb": image.width * image.height * _bytes_per_pixel(image.mode) / 1024,
+    }
+
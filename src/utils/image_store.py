@@ -0,0 +1,265 @@
+"""
+图片库模块 - Image Store
+内容寻址的磁盘图片库：原始文件以SHA-256摘要命名、按摘要前缀分目录存放并自动去重，
+解码并校正方向后的RGB像素缓存为 .npy 文件，以 np.memmap 只读映射，
+重复访问同一图片不再解码也不复制像素；总大小超过上限时按最近访问时间回收
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    IMAGE_STORE_DIR,
+    IMAGE_STORE_MAX_BYTES,
+    IMAGE_STORE_GC_TARGET,
+    IMAGE_STORE_TOUCH_INTERVAL,
+)
+from src.utils.image_processor import check_image_info, decode_image, probe_image
+
+# 原始文件的后缀；像素缓存为 <摘要>.rgb.npy 或 <摘要>.rgb<长边上限>.npy
+ORIGINAL_SUFFIX = ".orig"
+
+# 流式计算摘要时的读块大小
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def hash_source(source: Union[bytes, str, Path]) -> str:
+    """原始图片字节或文件的SHA-256摘要（文件分块读取）"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, "rb") as fh:
+            for chunk in iter(lambda: fh.read(_HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    # 传入文件对象，避免 np.save 给临时文件名追加 .npy
+    with open(path, "wb") as fh:
+        np.save(fh, array)
+
+
+class ImageStore:
+    """
+    内容寻址图片库
+
+    目录结构：<root>/ab/cd/abcd...ef.orig 与同目录下的像素缓存。
+    写入先落临时文件再原子重命名，多个进程（如批量解码进程）可共用同一目录。
+    回收时重新扫描目录，以原始文件的修改时间作为最近访问时间（访问时更新）。
+
+    Example:
+        >>> store = get_image_store()
+        >>> digest = store.put(upload_bytes)       # 校验文件头后存入（已存在则直接返回）
+        >>> pixels = store.raster(digest)          # 只读 np.memmap，形状 (H, W, 3)
+        >>> image = store.image(digest, max_side=1280)
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path] = IMAGE_STORE_DIR,
+        max_bytes: int = IMAGE_STORE_MAX_BYTES,
+        gc_target: float = IMAGE_STORE_GC_TARGET,
+        touch_interval: float = IMAGE_STORE_TOUCH_INTERVAL,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.gc_target = gc_target
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def path(self, digest: str, suffix: str = ORIGINAL_SUFFIX) -> Path:
+        return self.root / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+
+    @staticmethod
+    def _raster_suffix(max_side: Optional[int]) -> str:
+        return ".rgb.npy" if max_side is None else f".rgb{int(max_side)}.npy"
+
+    def __contains__(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def _add_bytes(self, size: int) -> None:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += size
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self.gc()
+
+    def _write_atomic(self, target: Path, write) -> int:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            write(tmp)
+            os.replace(tmp, target)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return target.stat().st_size
+
+    def _touch(self, digest: str) -> None:
+        original = self.path(digest)
+        try:
+            if time.time() - original.stat().st_mtime > self.touch_interval:
+                os.utime(original)
+        except FileNotFoundError:
+            pass
+
+    def put(self, source: Union[bytes, str, Path]) -> str:
+        """
+        存入原始图片（字节或文件路径），返回摘要
+
+        只读取文件头做校验，相同内容只存一份。
+
+        Raises:
+            ImageValidationError: 图片无法识别或未通过校验
+        """
+        check_image_info(probe_image(source))
+        digest = hash_source(source)
+        target = self.path(digest)
+        if target.exists():
+            self._touch(digest)
+            return digest
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            size = self._write_atomic(target, lambda tmp: tmp.write_bytes(source))
+        else:
+            size = self._write_atomic(target, lambda tmp: shutil.copyfile(source, tmp))
+        self._add_bytes(size)
+        return digest
+
+    def load(self, source: Union[bytes, str, Path], max_side: Optional[int] = None) -> Tuple[str, Image.Image]:
+        """
+        存入原始图片并取出RGB图像
+
+        存入与解码之间图片可能被其他线程的 gc() 回收，此时重新存入一次。
+
+        Returns:
+            (图片摘要, RGB图像)
+
+        Raises:
+            ImageValidationError: 图片无法识别或未通过校验
+        """
+        digest = self.put(source)
+        try:
+            return digest, self.image(digest, max_side)
+        except KeyError:
+            self.put(source)
+            return digest, self.image(digest, max_side)
+
+    def original(self, digest: str) -> bytes:
+        """原始文件字节"""
+        self._touch(digest)
+        return self.path(digest).read_bytes()
+
+    def raster(self, digest: str, max_side: Optional[int] = None) -> np.ndarray:
+        """
+        解码后的RGB像素（只读内存映射，形状 (H, W, 3)，uint8）
+
+        首次访问时解码原始文件（校正EXIF方向，可按 max_side 缩小）并写入缓存。
+
+        Raises:
+            KeyError: 图片不在库中（未存入或已被回收）
+        """
+        target = self.path(digest, self._raster_suffix(max_side))
+        try:
+            array = np.load(target, mmap_mode="r")
+            self.hits += 1
+        except FileNotFoundError:
+            original = self.path(digest)
+            if not original.exists():
+                raise KeyError(digest) from None
+            self.misses += 1
+            pixels = np.asarray(decode_image(original, max_side=max_side))
+            size = self._write_atomic(target, lambda tmp: _save_array(tmp, pixels))
+            self._add_bytes(size)
+            array = np.load(target, mmap_mode="r")
+        self._touch(digest)
+        return array
+
+    def image(self, digest: str, max_side: Optional[int] = None) -> Image.Image:
+        """以PIL图像取出（由内存映射的像素构建）"""
+        return Image.fromarray(self.raster(digest, max_side))
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        """扫描目录：[(摘要, 该图片全部文件的大小, 最近访问时间), ...]"""
+        entries: Dict[str, List[Any]] = {}
+        if not self.root.exists():
+            return []
+        for path in self.root.glob("*/*/*"):
+            if path.name.startswith("."):
+                continue
+            digest = path.name.split(".", 1)[0]
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entry = entries.setdefault(digest, [0, 0.0])
+            entry[0] += stat.st_size
+            if path.suffix == ORIGINAL_SUFFIX:
+                entry[1] = stat.st_mtime
+        return [(digest, size, mtime) for digest, (size, mtime) in entries.items()]
+
+    def gc(self) -> int:
+        """
+        总大小超过上限时，按最近访问时间从旧到新删除图片（连同其像素缓存），
+        直到降至 max_bytes × gc_target
+
+        Returns:
+            删除的图片数
+        """
+        with self._lock:
+            entries = sorted(self._scan(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * self.gc_target
+                for digest, size, _ in entries:
+                    if total <= target:
+                        break
+                    for path in self.path(digest).parent.glob(f"{digest}.*"):
+                        path.unlink(missing_ok=True)
+                    total -= size
+                    removed += 1
+            self._total_bytes = total
+            self.evicted += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            return {
+                "root": str(self.root),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "raster_hits": self.hits,
+                "raster_misses": self.misses,
+                "evicted": self.evicted,
+            }
+
+
+_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    """获取全局图片库"""
+    global _store
+    if _store is None:
+        _store = ImageStore()
+    return _store
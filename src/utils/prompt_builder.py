@@ -2,7 +2,7 @@
 Prompt构建模块 - Prompt Builder
 负责构建多模态对话消息和系统提示词
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence, Union
 from PIL import Image
 
 import sys
@@ -15,7 +15,7 @@ ChatHistory = List[tuple[str, str]]
 
 
 def build_messages(
-    image: Image.Image,
+    image: Union[Image.Image, Sequence[Image.Image]],
     format_choice: str,
     style_choice: str,
     user_instruction: str,
@@ -33,7 +33,7 @@ def build_messages(
     ]
     
     Args:
-        image: PIL图像对象
+        image: PIL图像对象，或一组照片（按顺序写成一首，全部放在当前轮次中）
         format_choice: 选择的诗词格式（如"五言绝句"）
         style_choice: 选择的创作风格（如"婉约抒情风"）
         user_instruction: 用户额外的灵感提示
@@ -71,10 +71,19 @@ def build_messages(
     format_instruction = FORMAT_GUIDE.get(format_choice, {}).get("instruction", "")
     style_instruction = STYLE_GUIDE.get(style_choice, {}).get("instruction", "")
     
+    images = [image] if isinstance(image, Image.Image) else list(image)
+    
     # 构建系统提示词
     prompt_lines = [
         "你是一位具备古典文学素养的多模态文案创作者",
         "请仔细观察图片内容，抽取其中的关键意象、氛围与色彩。",
+    ]
+    if len(images) > 1:
+        prompt_lines.append(
+            f"以上 {len(images)} 张画面按时间先后排列，来自同一组旅途照片或同一段视频，"
+            "请综合各画面的景物与时序，写成一首完整的作品，不要逐张分写。"
+        )
+    prompt_lines += [
         f"作品格式要求：{format_instruction}",
         f"风格与语气参考：{style_instruction}",
         "务必让诗词意象与图片内容高度匹配，避免虚假描述。",
@@ -87,11 +96,11 @@ def build_messages(
     
     prompt_lines.append("最后，请按要求输出作品，不要额外解释。")
     
-    # 添加当前轮次（包含图像和文本）
+    # 添加当前轮次（包含图像和文本）；多张照片依次排在文本之前，随同一请求送入模型
     messages.append({
         "role": "user",
         "content": [
-            {"type": "image", "image": image},
+            *({"type": "image", "image": item} for item in images),
             {"type": "text", "text": "\n".join(prompt_lines)},
         ],
     })
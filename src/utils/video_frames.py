@@ -0,0 +1,397 @@
+"""
+视频关键帧模块 - Video Frames
+短视频与动图逐帧流式解码（任意时刻只持有当前帧与已选中的关键帧），
+按帧差与颜色直方图距离计算场景变化分数，挑选变化最大的几帧作为关键帧，
+只有关键帧进入图片分析与模型。解码受采样率、时长与时限约束，
+一分钟的4K视频也只解码关键帧或在时限内停止。
+
+视频解码需要 PyAV（pip install av）；GIF 等动图由 Pillow 解码。
+"""
+import heapq
+import io
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.config import (
+    IMAGE_MIN_SIDE,
+    IMAGE_MAX_PIXELS,
+    IMAGE_SAVE_QUALITY,
+    VIDEO_EXTENSIONS,
+    VIDEO_MAX_BYTES,
+    VIDEO_MAX_SECONDS,
+    VIDEO_KEYFRAMES,
+    VIDEO_SAMPLE_FPS,
+    VIDEO_DECODE_SECONDS,
+    VIDEO_SCENE_SIZE,
+    VIDEO_HIST_BINS,
+    VIDEO_SCENE_DIFF_WEIGHT,
+    VIDEO_FRAME_MAX_SIDE,
+    VIDEO_CACHE_ENTRIES,
+)
+from src.utils.image_processor import ImageValidationError
+from src.utils.image_store import get_image_store, hash_source
+
+# 可含多帧的图片格式（只有 is_animated 为真时按动图处理）
+ANIMATED_FORMATS = ("GIF", "WEBP", "PNG")
+
+# 动图帧未声明时长时使用的默认值（毫秒）
+DEFAULT_FRAME_MS = 100
+
+# 候选帧：(时间秒, 场景检测缩略图 (H, W, 3) uint8, 生成关键帧图像的函数)
+Candidate = Tuple[float, np.ndarray, Callable[[], Image.Image]]
+
+
+def is_clip(path: Union[str, Path]) -> bool:
+    """上传文件是否为视频或动图（视频按后缀判断，动图只读取文件头与第二帧的位置）"""
+    path = Path(path)
+    if path.suffix.lower() in VIDEO_EXTENSIONS:
+        return True
+    try:
+        with Image.open(path) as raw:
+            return raw.format in ANIMATED_FORMATS and bool(getattr(raw, "is_animated", False))
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return False
+
+
+def _import_av():
+    try:
+        import av
+    except ImportError as exc:
+        raise ImageValidationError("服务端未安装视频解码依赖，暂不支持视频：pip install av") from exc
+    return av
+
+
+def probe_clip(path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    读取视频/动图的元信息（不解码像素）
+
+    Returns:
+        元信息字典：kind（"video" / "animation"）、format、width、height、
+        duration（秒，动图在解码前未知时为None）、byte_size
+
+    Raises:
+        ImageValidationError: 无法识别的文件
+    """
+    path = Path(path)
+    byte_size = path.stat().st_size
+    if path.suffix.lower() in VIDEO_EXTENSIONS:
+        av = _import_av()
+        try:
+            with av.open(str(path)) as container:
+                if not container.streams.video:
+                    raise ImageValidationError("视频中没有画面。")
+                stream = container.streams.video[0]
+                if stream.duration is not None and stream.time_base is not None:
+                    duration = float(stream.duration * stream.time_base)
+                elif container.duration is not None:
+                    duration = container.duration / av.time_base
+                else:
+                    duration = None
+                return {
+                    "kind": "video",
+                    "format": container.format.name,
+                    "width": stream.codec_context.width,
+                    "height": stream.codec_context.height,
+                    "duration": duration,
+                    "byte_size": byte_size,
+                }
+        except av.error.FFmpegError as exc:
+            raise ImageValidationError("无法识别的视频格式。") from exc
+    try:
+        with Image.open(path) as raw:
+            return {
+                "kind": "animation",
+                "format": raw.format,
+                "width": raw.width,
+                "height": raw.height,
+                "duration": None,
+                "byte_size": byte_size,
+            }
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise ImageValidationError("无法识别的动图格式。") from exc
+
+
+def check_clip_info(info: Dict[str, Any]) -> None:
+    """
+    按配置的上限校验 probe_clip 的结果
+
+    Raises:
+        ImageValidationError: 文件过大、时长过长、画面尺寸过小/过大
+    """
+    if info["byte_size"] > VIDEO_MAX_BYTES:
+        raise ImageValidationError(f"视频文件过大（上限 {VIDEO_MAX_BYTES // (1024 * 1024)}MB）。")
+    if info["duration"] is not None and info["duration"] > VIDEO_MAX_SECONDS:
+        raise ImageValidationError(f"视频时长超过 {VIDEO_MAX_SECONDS} 秒，请剪辑后再上传。")
+    if not info["width"] or not info["height"] or min(info["width"], info["height"]) < IMAGE_MIN_SIDE:
+        raise ImageValidationError(f"画面尺寸过小，短边至少需要 {IMAGE_MIN_SIDE} 像素。")
+    if info["width"] * info["height"] > IMAGE_MAX_PIXELS:
+        raise ImageValidationError("画面分辨率过高，请压缩后再上传。")
+
+
+def _histograms(frames: np.ndarray, bins: int) -> np.ndarray:
+    """(..., H, W, 3) uint8 → (..., 3, bins) 各通道的归一化直方图（一次 bincount 完成）"""
+    lead = frames.shape[:-3]
+    flat = frames.reshape(-1, frames.shape[-3] * frames.shape[-2], 3)
+    count, pixels, _ = flat.shape
+    index = flat.astype(np.intp) * bins // 256
+    # 每帧每个通道占一段独立的分箱
+    index += (np.arange(count)[:, None, None] * 3 + np.arange(3)) * bins
+    counts = np.bincount(index.ravel(), minlength=count * 3 * bins)
+    return (counts.reshape(count, 3, bins) / pixels).reshape(*lead, 3, bins)
+
+
+def scene_change_scores(
+    previous: np.ndarray,
+    current: np.ndarray,
+    bins: int = VIDEO_HIST_BINS,
+    diff_weight: float = VIDEO_SCENE_DIFF_WEIGHT,
+) -> np.ndarray:
+    """
+    场景变化分数（0~1）：帧差与直方图距离的加权和
+
+    帧差对构图与位置变化敏感，直方图距离对色调与光线变化敏感、对小幅运动不敏感。
+    输入可以是单帧 (H, W, 3) 或一批帧 (N, H, W, 3)，按广播规则逐帧比较。
+
+    Args:
+        previous: 前一候选帧的缩略图（uint8）
+        current: 当前候选帧的缩略图（uint8）
+
+    Returns:
+        形状为输入前导维度的分数数组
+
+    Example:
+        >>> thumbs = np.stack(candidate_thumbs)
+        >>> scores = scene_change_scores(thumbs[:-1], thumbs[1:])
+    """
+    diff = np.abs(current.astype(np.int16) - previous.astype(np.int16)).mean(axis=(-3, -2, -1)) / 255.0
+    # 每个通道的总变差距离在 0~1 之间，三个通道取平均
+    distance = np.abs(_histograms(current, bins) - _histograms(previous, bins)).sum(axis=(-2, -1)) / 6.0
+    return diff_weight * diff + (1.0 - diff_weight) * distance
+
+
+def _fit_size(width: int, height: int, max_side: int) -> Tuple[int, int]:
+    scale = min(1.0, max_side / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _video_candidates(
+    path: Path,
+    info: Dict[str, Any],
+    deadline: float,
+    keyframes_only: bool,
+) -> Iterator[Candidate]:
+    """
+    流式解码视频并按采样率产出候选帧
+
+    keyframes_only 时让解码器跳过非关键帧（只解码I帧，4K视频也很快）；
+    否则解码全部帧、只转换采样到的帧。缩放与颜色转换由 libswscale 完成。
+    """
+    av = _import_av()
+    interval = 1.0 / VIDEO_SAMPLE_FPS
+    with av.open(str(path)) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        if keyframes_only:
+            stream.codec_context.skip_frame = "NONKEY"
+        next_time = 0.0
+        for frame in container.decode(stream):
+            info["decoded"] += 1
+            if time.monotonic() > deadline:
+                info["truncated"] = True
+                return
+            current = float(frame.time) if frame.time is not None else next_time
+            if current > VIDEO_MAX_SECONDS:
+                return
+            if current < next_time:
+                continue
+            next_time = current + interval
+            thumb = frame.to_ndarray(format="rgb24", width=VIDEO_SCENE_SIZE[0], height=VIDEO_SCENE_SIZE[1])
+            width, height = _fit_size(frame.width, frame.height, VIDEO_FRAME_MAX_SIDE)
+            # 默认参数在创建时绑定本帧及其尺寸，调用方在生成器前进后再调用也不会取到后续帧的值
+            yield current, thumb, lambda frame=frame, size=(width, height): frame.to_image(width=size[0], height=size[1])
+
+
+def _animation_candidates(path: Path, info: Dict[str, Any], deadline: float) -> Iterator[Candidate]:
+    """逐帧解码动图（GIF 的帧依赖前一帧，必须顺序解码）并按采样率产出候选帧"""
+    interval = 1.0 / VIDEO_SAMPLE_FPS
+    with Image.open(path) as raw:
+        elapsed = 0.0
+        next_time = 0.0
+        index = 0
+        while True:
+            try:
+                raw.seek(index)
+            except EOFError:
+                break
+            info["decoded"] += 1
+            if time.monotonic() > deadline:
+                info["truncated"] = True
+                return
+            current = elapsed
+            elapsed += (raw.info.get("duration") or DEFAULT_FRAME_MS) / 1000.0
+            info["duration"] = elapsed
+            index += 1
+            if current > VIDEO_MAX_SECONDS:
+                return
+            if current < next_time:
+                continue
+            next_time = current + interval
+            frame = raw.convert("RGB")
+            thumb = np.asarray(frame.resize(VIDEO_SCENE_SIZE, Image.BILINEAR))
+
+            def make_image(frame: Image.Image = frame) -> Image.Image:
+                size = _fit_size(frame.width, frame.height, VIDEO_FRAME_MAX_SIDE)
+                return frame.resize(size, Image.BICUBIC) if size != frame.size else frame
+
+            yield current, thumb, make_image
+
+
+def _select_keyframes(candidates: Iterator[Candidate], k: int) -> Tuple[List[Tuple[float, int, float, Image.Image]], int]:
+    """
+    流式挑选场景变化分数最高的 k 帧
+
+    每个候选帧只与前一个候选帧比较；小顶堆只保存当前的前 k 帧，
+    只有进入堆的帧才生成关键帧图像。第一帧的分数记为1（开场画面）。
+
+    Returns:
+        (按时间排序的 [(分数, 序号, 时间, 图像), ...], 候选帧数)
+    """
+    heap: List[Tuple[float, int, float, Image.Image]] = []
+    previous: Optional[np.ndarray] = None
+    count = 0
+    for seq, (current, thumb, make_image) in enumerate(candidates):
+        score = 1.0 if previous is None else float(scene_change_scores(previous, thumb))
+        previous = thumb
+        count += 1
+        if len(heap) < k:
+            heapq.heappush(heap, (score, seq, current, make_image()))
+        elif score > heap[0][0]:
+            heapq.heapreplace(heap, (score, seq, current, make_image()))
+    return sorted(heap, key=lambda item: item[1]), count
+
+
+def extract_keyframes(
+    path: Union[str, Path],
+    k: int = VIDEO_KEYFRAMES,
+    time_limit: float = VIDEO_DECODE_SECONDS,
+) -> Tuple[List[Image.Image], Dict[str, Any]]:
+    """
+    从视频或动图中挑选 k 个关键帧
+
+    视频先只解码I帧作为候选（编码器通常在镜头切换处插入I帧）；
+    I帧少于 2k 个时（长GOP的短片）改为解码全部帧、按 VIDEO_SAMPLE_FPS 采样。
+    两轮解码共用 time_limit 时限，到时以已取得的候选帧挑选。
+
+    Args:
+        path: 视频或动图文件路径
+        k: 关键帧数
+        time_limit: 解码时限（秒）
+
+    Returns:
+        (按时间排序的关键帧RGB图像, 解码信息)；解码信息在 probe_clip 的字段外还包含
+        decoded（解码帧数）、candidates（候选帧数）、times / scores（关键帧的时间与分数）、
+        decode_seconds 与 truncated（是否因时限提前停止）
+
+    Raises:
+        ImageValidationError: 文件未通过校验或没有可用的画面
+    """
+    path = Path(path)
+    info = probe_clip(path)
+    check_clip_info(info)
+    info.update(decoded=0, truncated=False)
+    start = time.monotonic()
+    deadline = start + time_limit
+
+    if info["kind"] == "video":
+        selected, count = _select_keyframes(_video_candidates(path, info, deadline, keyframes_only=True), k)
+        expected = (info["duration"] or 0.0) * VIDEO_SAMPLE_FPS
+        if count < 2 * k and expected > count and not info["truncated"]:
+            selected, count = _select_keyframes(_video_candidates(path, info, deadline, keyframes_only=False), k)
+    else:
+        selected, count = _select_keyframes(_animation_candidates(path, info, deadline), k)
+
+    if not selected:
+        raise ImageValidationError("未能从文件中解码出画面。")
+    info.update(
+        candidates=count,
+        times=[round(current, 2) for _, _, current, _ in selected],
+        scores=[round(score, 3) for score, _, _, _ in selected],
+        decode_seconds=round(time.monotonic() - start, 3),
+    )
+    return [image for _, _, _, image in selected], info
+
+
+class ClipKeyframeCache:
+    """
+    片段 → 关键帧的进程内缓存
+
+    以片段文件的SHA-256为键，关键帧编码后存入图片库（由图片库去重、缓存像素并回收），
+    这里只保存关键帧的摘要。上传分析与提交创作共用同一组关键帧，不再重复解码。
+
+    Example:
+        >>> digest, frames, info = get_clip_cache().load(upload_path)
+    """
+
+    def __init__(self, max_entries: int = VIDEO_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[List[str], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, path: Union[str, Path]) -> Tuple[str, List[Image.Image], Dict[str, Any]]:
+        """
+        取出片段的关键帧（未缓存时解码并挑选）
+
+        Returns:
+            (片段摘要, 关键帧RGB图像, 解码信息)
+        """
+        if Path(path).stat().st_size > VIDEO_MAX_BYTES:
+            raise ImageValidationError(f"视频文件过大（上限 {VIDEO_MAX_BYTES // (1024 * 1024)}MB）。")
+        digest = hash_source(path)
+        store = get_image_store()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+        if entry is not None:
+            try:
+                return digest, [store.image(frame) for frame in entry[0]], entry[1]
+            except KeyError:
+                # 关键帧已被图片库回收，重新解码
+                pass
+
+        frames, info = extract_keyframes(path)
+        digests = []
+        images = []
+        for frame in frames:
+            buf = io.BytesIO()
+            frame.save(buf, format="JPEG", quality=IMAGE_SAVE_QUALITY)
+            frame_digest, image = store.load(buf.getvalue())
+            digests.append(frame_digest)
+            images.append(image)
+        with self._lock:
+            self._entries[digest] = (digests, info)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return digest, images, info
+
+
+_clip_cache: Optional[ClipKeyframeCache] = None
+_clip_cache_lock = threading.Lock()
+
+
+def get_clip_cache() -> ClipKeyframeCache:
+    """获取进程内的片段关键帧缓存（单例）"""
+    global _clip_cache
+    with _clip_cache_lock:
+        if _clip_cache is None:
+            _clip_cache = ClipKeyframeCache()
+        return _clip_cache
@@ -0,0 +1,9 @@
+"""
+测试公共配置：使用模拟后端，测试在CPU上运行且无需模型权重
+"""
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("MODEL_BACKEND", "stub")
+sys.path.append(str(Path(__file__).parent.parent))
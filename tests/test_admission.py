@@ -0,0 +1,178 @@
+"""
+准入控制测试：检查顺序、客户端频率窗口、拒绝不消耗配额与突发负载下的排队上限
+"""
+import threading
+import time
+
+import pytest
+
+from src.serving.admission import AdmissionController, AdmissionRejected, client_key
+from src.serving.lanes import Lane
+
+
+class FakeClock:
+    """可手动推进的时钟，用于验证频率窗口"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_admission(lane=None, clock=None, **kwargs) -> AdmissionController:
+    options = {"max_queue_depth": 4, "max_wait_seconds": 0, "rate_limit": 3, "rate_window": 60.0}
+    options.update(kwargs)
+    return AdmissionController(lane or Lane("generation", concurrency=1), clock=clock or FakeClock(), **options)
+
+
+def hold_slots(lane: Lane, count: int):
+    """在后台占用通道：count 个任务进入通道后阻塞，返回放行事件与线程"""
+    release = threading.Event()
+    threads = []
+    for _ in range(count):
+        def occupy():
+            with lane.slot(1.0):
+                release.wait(5)
+        thread = threading.Thread(target=occupy, daemon=True)
+        thread.start()
+        threads.append(thread)
+    wait_until(lambda: lane.running + lane.waiting == count)
+    return release, threads
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.005)
+
+
+def test_rate_limit_window():
+    clock = FakeClock()
+    admission = make_admission(clock=clock)
+    for _ in range(3):
+        admission.admit("a", cost=1.0)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        admission.admit("a", cost=1.0)
+    assert excinfo.value.reason == "rate_limited"
+    assert excinfo.value.retry_after == pytest.approx(60.0)
+    # 频率按客户端分别计算
+    admission.admit("b", cost=1.0)
+
+    # 最早的请求移出窗口后恢复受理
+    clock.now += 60.0
+    admission.admit("a", cost=1.0)
+    assert admission.stats()["admitted"] == 5
+    assert admission.stats()["rejected"]["rate_limited"] == 1
+
+
+def test_rate_limit_checked_before_queue_depth():
+    lane = Lane("generation", concurrency=1)
+    admission = make_admission(lane, max_queue_depth=1, rate_limit=1)
+    admission.admit("a", cost=1.0)
+    release, threads = hold_slots(lane, 2)
+    try:
+        # 队列已满，但超出频率的客户端先得到频率提示
+        with pytest.raises(AdmissionRejected) as excinfo:
+            admission.admit("a", cost=1.0)
+        assert excinfo.value.reason == "rate_limited"
+        with pytest.raises(AdmissionRejected) as excinfo:
+            admission.admit("b", cost=1.0)
+        assert excinfo.value.reason == "queue_full"
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_wait_limit_uses_cost_estimate():
+    lane = Lane("generation", concurrency=1)
+    admission = make_admission(lane, max_wait_seconds=10, rate_limit=0)
+    release, threads = hold_slots(lane, 1)
+    try:
+        # 尚无执行记录：预计等待 = 前面的任务数 × 本请求的预计耗时
+        assert admission.admit("a", cost=5.0) == pytest.approx(5.0)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            admission.admit("b", cost=20.0)
+        assert excinfo.value.reason == "wait_too_long"
+        assert excinfo.value.retry_after == pytest.approx(20.0)
+        assert "20 秒" in str(excinfo.value)
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_rejected_requests_do_not_consume_quota():
+    lane = Lane("generation", concurrency=1)
+    admission = make_admission(lane, max_queue_depth=1, rate_limit=2)
+    release, threads = hold_slots(lane, 2)
+    try:
+        for _ in range(5):
+            with pytest.raises(AdmissionRejected, match="排队"):
+                admission.admit("a", cost=1.0)
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    # 队列空出后仍有完整配额
+    admission.admit("a", cost=1.0)
+    admission.admit("a", cost=1.0)
+    with pytest.raises(AdmissionRejected, match="频繁"):
+        admission.admit("a", cost=1.0)
+    assert admission.stats()["rejected"] == {"queue_full": 5, "wait_too_long": 0, "rate_limited": 1}
+
+
+def test_disabled_admits_everything():
+    admission = make_admission(enabled=False, rate_limit=1)
+    for _ in range(5):
+        admission.admit("a", cost=1.0)
+    assert admission.stats()["admitted"] == 0
+
+
+def test_burst_is_bounded_by_queue_depth():
+    """突发负载：20个客户端依次到达，通道内最多 并发数 + 队列上限 个任务，其余立即被拒绝"""
+    lane = Lane("generation", concurrency=2)
+    admission = make_admission(lane, max_queue_depth=4, rate_limit=0)
+    release = threading.Event()
+    outcomes = []
+    threads = []
+
+    def request(client: str) -> None:
+        try:
+            with admission.enter(client, cost=1.0):
+                release.wait(5)
+            outcomes.append("done")
+        except AdmissionRejected as exc:
+            outcomes.append(exc.reason)
+
+    for index in range(20):
+        thread = threading.Thread(target=request, args=(f"10.0.0.{index}",), daemon=True)
+        thread.start()
+        threads.append(thread)
+        # 等该请求被拒绝或进入通道后再放下一个，使结果与到达顺序一致
+        wait_until(lambda: len(outcomes) + lane.running + lane.waiting == index + 1)
+        assert lane.waiting <= 4
+
+    assert lane.running == 2 and lane.waiting == 4
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert outcomes.count("done") == 6
+    assert outcomes.count("queue_full") == 14
+    stats = admission.stats()
+    assert stats["admitted"] == 6
+    assert stats["rejected"]["queue_full"] == 14
+    assert lane.stats()["completed"] == 6
+
+
+def test_client_key_forwarded_for():
+    headers = {"x-forwarded-for": "198.51.100.1, 203.0.113.7"}
+    assert client_key("127.0.0.1", headers) == "127.0.0.1"
+    # 只取可信代理写入的一项，客户端伪造的左侧项不起作用
+    assert client_key("127.0.0.1", headers, trust_forwarded_for=True, trusted_proxies=1) == "203.0.113.7"
+    assert client_key("127.0.0.1", headers, trust_forwarded_for=True, trusted_proxies=2) == "198.51.100.1"
+    assert client_key("127.0.0.1", headers, trust_forwarded_for=True, trusted_proxies=5) == "198.51.100.1"
+    assert client_key(None, {}, trust_forwarded_for=True) == "unknown"
@@ -0,0 +1,125 @@
+"""
+取消令牌测试：截止时间、取消回调、按会话取消与后端在解码步中停止
+"""
+import threading
+
+from src.models.stub_backend import StubModelManager
+from src.serving.cancellation import (
+    STOP_CANCELLED,
+    STOP_DEADLINE,
+    CancellationRegistry,
+    CancellationToken,
+)
+
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "明月松间照"}]}]
+
+
+class FakeClock:
+    """可手动推进的时钟，用于验证截止时间"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_deadline_expires():
+    clock = FakeClock()
+    token = CancellationToken(timeout=30, clock=clock)
+    assert token.remaining() == 30
+    assert token.stop_reason() is None
+
+    clock.now += 29.5
+    assert token.remaining() == 0.5
+    assert not token.expired
+
+    clock.now += 1.0
+    assert token.expired
+    assert token.remaining() == 0.0
+    assert token.stop_reason() == STOP_DEADLINE
+    # 到期不等于取消，回调不会被触发
+    assert not token.cancelled
+
+
+def test_no_deadline():
+    for timeout in (None, 0):
+        token = CancellationToken(timeout=timeout, clock=FakeClock())
+        assert token.deadline is None
+        assert token.remaining() is None
+        assert not token.expired
+
+
+def test_cancel_takes_precedence_over_deadline():
+    clock = FakeClock()
+    token = CancellationToken(timeout=1, clock=clock)
+    clock.now += 5
+    token.cancel()
+    assert token.stop_reason() == STOP_CANCELLED
+
+
+def test_callbacks_run_once():
+    token = CancellationToken()
+    calls = []
+    token.add_callback(lambda: calls.append("first"))
+    token.add_callback(lambda: calls.append("second"))
+    token.cancel()
+    token.cancel()
+    assert calls == ["first", "second"]
+
+    # 已取消的令牌上注册的回调立即执行
+    token.add_callback(lambda: calls.append("late"))
+    assert calls == ["first", "second", "late"]
+
+
+def test_concurrent_cancel_runs_callbacks_once():
+    token = CancellationToken()
+    calls = []
+    token.add_callback(lambda: calls.append(1))
+    threads = [threading.Thread(target=token.cancel) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+
+
+def test_registry_cancels_session_tokens():
+    registry = CancellationRegistry()
+    first, second, other = CancellationToken(), CancellationToken(), CancellationToken()
+    with registry.track("s1", first), registry.track("s1", second), registry.track("s2", other):
+        assert registry.in_flight() == 3
+        assert registry.cancel("s1") == 2
+    assert first.cancelled and second.cancelled
+    assert not other.cancelled
+    # 请求结束后登记自动移除
+    assert registry.in_flight() == 0
+    assert registry.cancel("s1") == 0
+    assert registry.cancel(None) == 0
+
+
+def test_backend_stops_at_decode_step():
+    backend = StubModelManager("stub", prefill_seconds=0.0, seconds_per_token=0.01)
+    token = CancellationToken()
+    generated = []
+    for chunk in backend.generate_stream(MESSAGES, format_choice="七言律诗", cancel_token=token):
+        if chunk["type"] == "delta":
+            generated.append(chunk["text"])
+            if len(generated) == 3:
+                token.cancel()
+        else:
+            done = chunk
+    # 已生成的内容保留，停止原因记入用量
+    assert done["text"] == "".join(generated)
+    assert len(generated) == 3
+    assert done["usage"]["stop_reason"] == STOP_CANCELLED
+
+
+def test_backend_reports_deadline():
+    clock = FakeClock()
+    token = CancellationToken(timeout=10, clock=clock)
+    clock.now += 10
+    backend = StubModelManager("stub", prefill_seconds=0.0, seconds_per_token=0.0)
+    poem, usage = backend.generate(MESSAGES, cancel_token=token)
+    assert poem == ""
+    assert usage["stop_reason"] == STOP_DEADLINE
@@ -0,0 +1,107 @@
+"""
+过载降级测试：档位升降的滞后、各档生成参数与按观测值限制生成长度
+"""
+from src.models.usage import UsageTracker
+from src.serving.degradation import DegradationController, capped_tokens
+from src.serving.scheduler import JobCostEstimator
+
+TIERS = [
+    {"name": "精简长度", "queue_depth": 3, "cap_tokens": True},
+    {"name": "贪心解码", "queue_depth": 5, "cap_tokens": True, "greedy": True},
+    {"name": "精简历史", "queue_depth": 7, "cap_tokens": True, "greedy": True, "history_turns": 1},
+    {"name": "备用模型", "queue_depth": 9, "cap_tokens": True, "greedy": True, "fallback": True},
+]
+
+
+def make_controller(fallback=None, **kwargs) -> DegradationController:
+    options = dict(tiers=TIERS, fallback=fallback, enabled=True, hysteresis=2, depth_source=lambda: 0, clock=lambda: 0.0)
+    options.update(kwargs)
+    return DegradationController(**options)
+
+
+def test_rises_immediately_and_falls_with_hysteresis():
+    controller = make_controller()
+    depths = [0, 3, 6, 4, 3, 2, 1, 8, 5, 4, 0]
+    tiers = [controller.plan("五言绝句", 512, queue_depth=depth).tier for depth in depths]
+    # 升档立即生效；回落需低于当前档位阈值 2 个任务（贪心解码档阈值5：深度4、3仍保持，2才回落；
+    # 精简长度档阈值3：深度1仍保持）
+    assert tiers == [0, 1, 2, 2, 2, 1, 1, 3, 3, 2, 0]
+
+
+def test_target_can_drop_several_tiers_at_once():
+    controller = make_controller()
+    controller.plan(None, 512, queue_depth=7)
+    assert controller.current == 3
+    assert controller._target(0) == 0
+    # 介于档位之间时落到仍满足滞后条件的最高档
+    assert controller._target(4) == 2
+    assert controller._target(6) == 3
+
+
+def test_transitions_and_request_counts():
+    controller = make_controller()
+    for depth in (0, 3, 3, 0):
+        controller.plan("七言律诗", 512, queue_depth=depth)
+    stats = controller.stats()
+    assert stats["requests"] == {"正常": 2, "精简长度": 2}
+    assert stats["transitions"] == {"0->1": 1, "1->0": 1}
+    assert [event["to_name"] for event in stats["recent_events"]] == ["精简长度", "正常"]
+
+
+def test_fallback_tier_skipped_without_fallback_model():
+    controller = make_controller()
+    assert [tier["name"] for tier in controller.tiers] == ["精简长度", "贪心解码", "精简历史"]
+    plan = controller.plan("七言律诗", 512, queue_depth=20)
+    assert plan.tier == 3 and not plan.fallback
+
+    fallback = object()
+    controller = make_controller(fallback=fallback)
+    plan = controller.plan("七言律诗", 512, queue_depth=20)
+    assert plan.fallback
+    assert controller.backend_for(plan, model_manager="primary") is fallback
+
+
+def test_plan_parameters():
+    controller = make_controller()
+    normal = controller.plan("七言律诗", 512, queue_depth=0)
+    assert (normal.max_new_tokens, normal.do_sample, normal.history_turns) == (512, True, None)
+
+    plan = controller.plan("七言律诗", 512, queue_depth=7)
+    assert plan.max_new_tokens == capped_tokens("七言律诗", 512)
+    assert not plan.do_sample
+    assert plan.trim_history([("一", "1"), ("二", "2")]) == [("二", "2")]
+
+
+def test_disabled_controller_never_degrades():
+    controller = make_controller(enabled=False)
+    assert controller.plan("七言律诗", 512, queue_depth=50).tier == 0
+
+
+def test_capped_tokens_has_minimum():
+    assert capped_tokens("五言绝句", 512) == 96
+    # 不超过请求的上限
+    assert capped_tokens("五言绝句", 64) == 64
+    assert capped_tokens("五言绝句", 512, minimum=0) < 96
+
+
+def test_capped_tokens_prefers_observed():
+    assert capped_tokens("五言绝句", 512, headroom=1.25, observed=160) == 200
+    assert capped_tokens("五言绝句", 150, headroom=1.25, observed=160) == 150
+
+
+def test_plan_caps_with_observed_percentile():
+    tracker = UsageTracker(log_path=None)
+    estimator = JobCostEstimator(tracker)
+    controller = make_controller(token_source=lambda format_choice: estimator.token_percentile(format_choice, 95))
+    # 样本不足时按字数估计
+    assert controller.plan("五言绝句", 512, queue_depth=3).max_new_tokens == 96
+
+    for generated in range(100, 200, 5):
+        tracker.record({"format": "五言绝句", "generated_tokens": generated, "max_new_tokens": 512})
+    # 被截断或取消的生成不计入
+    tracker.record({"format": "五言绝句", "generated_tokens": 512, "max_new_tokens": 512})
+    tracker.record({"format": "五言绝句", "generated_tokens": 400, "max_new_tokens": 512, "stop_reason": "cancelled"})
+    assert estimator.token_percentile("五言绝句", 95) == 190
+    assert controller.plan("五言绝句", 512, queue_depth=3).max_new_tokens == 238
+    # 其他格式仍无样本
+    assert estimator.token_percentile("七言律诗", 95) is None
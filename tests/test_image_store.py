@@ -0,0 +1,126 @@
+"""
+图片库测试：内容寻址去重、像素缓存的内存映射与按最近访问时间回收
+"""
+import hashlib
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.utils.image_processor import ImageValidationError
+from src.utils.image_store import ImageStore
+
+
+def jpeg_bytes(color: str = "teal", size=(64, 48)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def make_store(tmp_path, max_bytes: int = 10 ** 9) -> ImageStore:
+    return ImageStore(tmp_path / "images", max_bytes=max_bytes, gc_target=0.8, touch_interval=0)
+
+
+def files(store: ImageStore):
+    return sorted(path.name for path in store.root.glob("*/*/*"))
+
+
+def test_put_is_content_addressed(tmp_path):
+    store = make_store(tmp_path)
+    data = jpeg_bytes()
+    digest = store.put(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert store.path(digest).relative_to(store.root).parts[:2] == (digest[:2], digest[2:4])
+    assert store.original(digest) == data
+
+    # 相同内容（字节或文件）只存一份
+    source = tmp_path / "upload.jpg"
+    source.write_bytes(data)
+    assert store.put(source) == digest
+    assert files(store) == [f"{digest}.orig"]
+    assert store.stats()["bytes"] == len(data)
+
+
+def test_put_rejects_invalid_image(tmp_path):
+    store = make_store(tmp_path)
+    with pytest.raises(ImageValidationError):
+        store.put(b"not an image")
+    assert files(store) == []
+
+
+def test_raster_is_cached_and_memory_mapped(tmp_path):
+    store = make_store(tmp_path)
+    digest = store.put(jpeg_bytes(size=(400, 300)))
+
+    pixels = store.raster(digest)
+    assert isinstance(pixels, np.memmap)
+    assert pixels.shape == (300, 400, 3) and pixels.dtype == np.uint8
+    assert not pixels.flags.writeable
+    again = store.raster(digest)
+    assert np.array_equal(pixels, again)
+    assert (store.hits, store.misses) == (1, 1)
+
+    # 不同长边上限各缓存一份
+    assert store.image(digest, max_side=100).size == (100, 75)
+    assert f"{digest}.rgb100.npy" in files(store)
+
+
+def test_unknown_digest(tmp_path):
+    store = make_store(tmp_path)
+    with pytest.raises(KeyError):
+        store.raster("0" * 64)
+
+
+def test_gc_removes_least_recently_used(tmp_path):
+    data = [jpeg_bytes(color) for color in ("red", "green", "blue")]
+    store = make_store(tmp_path, max_bytes=sum(map(len, data)) * 10)
+    digests = [store.put(item) for item in data]
+    store.raster(digests[1])
+    for age, digest in zip((300, 200, 100), digests):
+        stamp = os.stat(store.path(digest)).st_mtime - age
+        os.utime(store.path(digest), (stamp, stamp))
+    # 访问会刷新最近访问时间：red 成为最新，green 最久未访问
+    store.original(digests[0])
+
+    # 收紧上限到略小于现有总量：删除最久未访问的 green 后即降至 max_bytes × gc_target 以下
+    store.max_bytes = store.stats()["bytes"] - 1
+    assert store.gc() == 1
+    assert digests[0] in store and digests[2] in store
+    assert digests[1] not in store
+    assert store.stats()["evicted"] == 1
+    # 像素缓存随原始文件一同删除
+    assert files(store) == sorted([f"{digests[0]}.orig", f"{digests[2]}.orig"])
+
+
+def test_put_over_budget_triggers_gc(tmp_path):
+    first, second = jpeg_bytes("red"), jpeg_bytes("green")
+    store = make_store(tmp_path, max_bytes=len(first) + len(second) - 1)
+    old = store.put(first)
+    stamp = os.stat(store.path(old)).st_mtime - 100
+    os.utime(store.path(old), (stamp, stamp))
+    new = store.put(second)
+    assert old not in store
+    assert new in store
+
+
+def test_load_recovers_from_gc_between_put_and_read(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    data = jpeg_bytes()
+    put = store.put
+    calls = []
+
+    def put_then_collect(source):
+        digest = put(source)
+        calls.append(digest)
+        if len(calls) == 1:
+            # 模拟其他线程的回收恰好发生在存入之后、读取之前
+            store.path(digest).unlink()
+        return digest
+
+    monkeypatch.setattr(store, "put", put_then_collect)
+    digest, image = store.load(data)
+    assert len(calls) == 2
+    assert image.size == (64, 48)
+    assert digest in store
@@ -0,0 +1,93 @@
+"""
+上传图片校验测试：只读取文件头即拒绝解压炸弹、超大文件与过小图片，不解码像素
+"""
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image, ImageFile
+
+from src.utils import image_processor
+from src.utils.image_processor import ImageValidationError, check_image_info, decode_image, probe_image
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def png_header(width: int, height: int) -> bytes:
+    """声明任意尺寸、不含像素数据的PNG（只有文件头与空的 IDAT 块）"""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", ihdr) + png_chunk(b"IDAT", b"") + png_chunk(b"IEND", b"")
+
+
+def jpeg_bytes(size=(64, 48)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "teal").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def no_pixel_decode(monkeypatch):
+    """校验阶段一旦解码像素即失败"""
+    def load(self):
+        raise AssertionError("校验阶段不应解码像素")
+    monkeypatch.setattr(ImageFile.ImageFile, "load", load)
+
+
+def test_probe_reads_dimensions_from_header(no_pixel_decode):
+    info = probe_image(png_header(640, 480))
+    assert (info["width"], info["height"], info["format"]) == (640, 480, "PNG")
+    assert info["decoded_bytes"] == 640 * 480 * 3
+
+
+def test_decompression_bomb_rejected_from_header(no_pixel_decode):
+    # 超出PIL自身的炸弹阈值，打开文件头即报错
+    with pytest.raises(ImageValidationError, match="像素过多"):
+        probe_image(png_header(30000, 30000))
+
+
+def test_too_many_pixels_rejected_before_decode(no_pixel_decode):
+    # 低于PIL的阈值但超出 IMAGE_MAX_PIXELS
+    with pytest.raises(ImageValidationError, match="分辨率过高"):
+        decode_image(png_header(8000, 6000))
+
+
+def test_oversize_file_rejected_before_decode(no_pixel_decode, monkeypatch):
+    monkeypatch.setattr(image_processor, "UPLOAD_MAX_BYTES", 4096)
+    data = jpeg_bytes() + b"\0" * 4096
+    with pytest.raises(ImageValidationError, match="文件过大"):
+        decode_image(data)
+
+
+def test_too_small_rejected_before_decode(no_pixel_decode):
+    with pytest.raises(ImageValidationError, match="尺寸过小"):
+        decode_image(png_header(16, 400))
+
+
+def test_unsupported_mode_rejected():
+    info = probe_image(png_header(64, 64))
+    with pytest.raises(ImageValidationError, match="像素模式"):
+        check_image_info({**info, "mode": "F"})
+
+
+def test_garbage_rejected():
+    with pytest.raises(ImageValidationError, match="无法识别"):
+        probe_image(b"not an image at all")
+
+
+def test_valid_image_decodes():
+    image = decode_image(jpeg_bytes((64, 48)))
+    assert image.mode == "RGB"
+    assert image.size == (64, 48)
+
+
+def test_exif_orientation_swaps_probed_size():
+    exif = Image.Exif()
+    exif[image_processor.EXIF_ORIENTATION_TAG] = 6
+    buffer = io.BytesIO()
+    Image.new("RGB", (80, 40), "white").save(buffer, format="JPEG", exif=exif.tobytes())
+    info = probe_image(buffer.getvalue())
+    assert (info["width"], info["height"], info["orientation"]) == (40, 80, 6)
+    assert decode_image(buffer.getvalue()).size == (40, 80)
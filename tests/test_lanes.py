@@ -0,0 +1,113 @@
+"""
+通道调度测试：短任务优先、等待时间老化与先到先服务
+"""
+import threading
+import time
+
+import pytest
+
+from src.serving.lanes import Lane, select_next
+
+
+class FakeClock:
+    """可手动推进的时钟，用于控制任务的已等待时间"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.005)
+
+
+def test_shortest_job_first():
+    waiting = {0: (30.0, 0.0), 1: (5.0, 0.0), 2: (12.0, 0.0)}
+    assert select_next(waiting, now=0.0, aging_rate=0.0) == 1
+
+
+def test_ties_break_by_arrival():
+    waiting = {3: (5.0, 0.0), 1: (5.0, 0.0), 2: (5.0, 0.0)}
+    assert select_next(waiting, now=10.0, aging_rate=0.1) == 1
+
+
+def test_aging_promotes_long_waiting_job():
+    # 有效耗时随等待同步下降，长任务领先的等待时间抵消耗时差（(30 − 5) / 0.1 = 250秒）后不再被插队
+    assert select_next({0: (30.0, 0.0), 1: (5.0, 240.0)}, now=240.0, aging_rate=0.1) == 1
+    assert select_next({0: (30.0, 0.0), 1: (5.0, 260.0)}, now=260.0, aging_rate=0.1) == 0
+    # 没有老化时长任务会一直被新到的短任务插队
+    assert select_next({0: (30.0, 0.0), 1: (5.0, 1e6)}, now=1e6, aging_rate=0.0) == 1
+
+
+def run_in_order(lane: Lane, clock: FakeClock, jobs):
+    """
+    占住通道唯一的名额，按 jobs 依次入队 (名称, 预计耗时, 入队时刻)，
+    返回执行顺序（放行后才填入）、放行事件与线程
+    """
+    order = []
+    release = threading.Event()
+
+    def blocker():
+        with lane.slot(0.0):
+            release.wait(5)
+
+    def job(name, cost):
+        with lane.slot(cost):
+            order.append(name)
+
+    threads = [threading.Thread(target=blocker, daemon=True)]
+    threads[0].start()
+    wait_until(lambda: lane.running == 1)
+    for name, cost, at in jobs:
+        clock.now = at
+        thread = threading.Thread(target=job, args=(name, cost), daemon=True)
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: lane.waiting == len(threads) - 1)
+    return order, release, threads
+
+
+@pytest.mark.parametrize(
+    "arrival, expected",
+    [
+        # 短任务紧随长任务到达：短任务优先
+        (0.5, ["short", "medium", "long"]),
+        # 长任务已等待足够久：老化后排在新到的短任务之前
+        (400.0, ["long", "short", "medium"]),
+    ],
+)
+def test_lane_dispatch_order(arrival, expected):
+    clock = FakeClock()
+    lane = Lane("generation", concurrency=1, policy="sjf", aging_rate=0.1, clock=clock)
+    order, release, threads = run_in_order(
+        lane, clock, [("long", 40.0, 0.0), ("medium", 12.0, arrival), ("short", 2.0, arrival)]
+    )
+    clock.now = arrival + 1.0
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert order == expected
+    assert lane.stats()["completed"] == 4
+
+
+def test_fifo_ignores_cost():
+    clock = FakeClock()
+    lane = Lane("analysis", concurrency=1, policy="fifo", clock=clock)
+    order, release, threads = run_in_order(
+        lane, clock, [("long", 40.0, 0.0), ("medium", 12.0, 0.5), ("short", 2.0, 0.5)]
+    )
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert order == ["long", "medium", "short"]
+
+
+def test_rejects_unknown_policy():
+    with pytest.raises(ValueError, match="未知的调度策略"):
+        Lane("generation", concurrency=1, policy="lifo")
@@ -0,0 +1,168 @@
+"""
+模型注册表测试：按需加载、最久未使用淘汰、固定模型与内存预算
+"""
+import itertools
+import os
+
+import pytest
+
+from src.models.registry import ModelRegistry
+from src.models.stub_backend import StubModelManager
+
+GB = 1024 ** 3
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "大漠孤烟直"}]}]
+SPECS = {name: {"path": f"/nonexistent/{name}", "memory_gb": 6} for name in ("a", "b", "c")}
+
+
+def stub_factory(name, spec):
+    backend = StubModelManager(
+        name,
+        prefill_seconds=0.0,
+        seconds_per_token=0.0,
+        memory_bytes=int(spec["memory_gb"] * GB),
+    )
+    # 与真实模型一致：首次请求时才加载
+    backend.is_loaded = False
+    return backend
+
+
+def make_registry(budget_gb, pin_default=False, factory=stub_factory):
+    counter = itertools.count()
+    return ModelRegistry(
+        SPECS,
+        default="a",
+        factory=factory,
+        budget_bytes=int(budget_gb * GB),
+        pin_default=pin_default,
+        clock=lambda: float(next(counter)),
+    )
+
+
+def loaded(registry):
+    return [item["name"] for item in registry.models() if item["loaded"]]
+
+
+def test_loads_on_first_request():
+    registry = make_registry(budget_gb=20)
+    registry.load_model()
+    assert loaded(registry) == ["a"]
+    poem, usage = registry.generate(MESSAGES, model="b")
+    assert poem
+    assert loaded(registry) == ["a", "b"]
+    assert {item["name"]: item["loads"] for item in registry.models()} == {"a": 1, "b": 1, "c": 0}
+
+
+def test_evicts_least_recently_used():
+    registry = make_registry(budget_gb=13)
+    registry.load_model()
+    registry.generate(MESSAGES, model="b")
+    # 再次使用 a，b 成为最久未使用的模型
+    registry.generate(MESSAGES, model="a")
+    registry.generate(MESSAGES, model="c")
+    assert loaded(registry) == ["a", "c"]
+    by_name = {item["name"]: item for item in registry.models()}
+    assert by_name["b"]["evictions"] == 1
+    assert registry.stats()["used_mb"] <= 13 * 1024
+
+
+def test_pinned_model_is_not_evicted():
+    registry = make_registry(budget_gb=13, pin_default=True)
+    registry.load_model()
+    registry.generate(MESSAGES, model="b")
+    registry.generate(MESSAGES, model="b")
+    # a 最久未使用但已固定，只能卸载 b
+    registry.generate(MESSAGES, model="c")
+    assert loaded(registry) == ["a", "c"]
+
+    registry.pin("a", False)
+    registry.generate(MESSAGES, model="b")
+    assert loaded(registry) == ["b", "c"]
+
+
+def test_budget_error_when_nothing_can_be_evicted():
+    registry = make_registry(budget_gb=10, pin_default=True)
+    registry.load_model()
+    with pytest.raises(RuntimeError, match="内存预算不足"):
+        registry.generate(MESSAGES, model="b")
+    assert loaded(registry) == ["a"]
+
+
+def test_model_in_use_is_not_evicted():
+    registry = make_registry(budget_gb=13)
+    registry.load_model()
+    with registry.acquire("b"), registry.acquire("c"):
+        # a 空闲被卸载；b、c 都在使用中，无法再为 a 腾出空间
+        assert loaded(registry) == ["b", "c"]
+        with pytest.raises(RuntimeError, match="内存预算不足"):
+            registry.generate(MESSAGES, model="a")
+
+
+def test_load_failure_is_wrapped():
+    def factory(name, spec):
+        backend = stub_factory(name, spec)
+        if name == "b":
+            def fail():
+                raise OSError("权重文件不存在")
+            backend.load_model = fail
+        return backend
+
+    registry = make_registry(budget_gb=20, factory=factory)
+    with pytest.raises(RuntimeError, match="模型 b 加载失败.*权重文件不存在"):
+        registry.generate(MESSAGES, model="b")
+    # 加载失败不占用预算
+    assert registry.stats()["used_mb"] == 0
+
+
+def test_unknown_model():
+    registry = make_registry(budget_gb=20)
+    with pytest.raises(ValueError, match="未知模型"):
+        registry.generate(MESSAGES, model="d")
+
+
+# 真实检查点：设置 TINY_VL_MODEL_PATH 指向一个极小的视觉语言模型目录（CPU即可加载）
+TINY_MODEL_PATH = os.getenv("TINY_VL_MODEL_PATH")
+
+
+@pytest.mark.skipif(not TINY_MODEL_PATH or not os.path.isdir(TINY_MODEL_PATH), reason="未设置 TINY_VL_MODEL_PATH")
+def test_real_checkpoint_eviction_uses_measured_memory():
+    pytest.importorskip("transformers")
+    from src.models.model_manager import ModelManager
+    from src.models.usage import UsageTracker
+
+    tracker = UsageTracker(log_path=None)
+
+    def factory(name, spec):
+        return ModelManager(
+            model_path=spec["path"],
+            device_map="cpu",
+            usage_tracker=tracker,
+            adapter_dir=None,
+            compile_decode=False,
+        )
+
+    specs = {name: {"path": TINY_MODEL_PATH} for name in ("a", "b")}
+    probe = ModelRegistry(specs, default="a", factory=factory, budget_bytes=None)
+    probe.load_model()
+    measured = probe._entries["a"].backend.memory_bytes()
+    assert measured > 0
+    assert probe.stats()["used_mb"] == round(measured / 1024 ** 2, 1)
+
+    # 预算只容得下一个模型：加载 b 时卸载 a 并真正释放其权重
+    counter = itertools.count()
+    registry = ModelRegistry(
+        specs,
+        default="a",
+        factory=factory,
+        budget_bytes=int(measured * 1.5),
+        pin_default=False,
+        clock=lambda: float(next(counter)),
+    )
+    registry.load_model()
+    first = registry._entries["a"].backend
+    with registry.acquire("b") as backend:
+        assert backend.is_loaded
+    assert loaded(registry) == ["b"]
+    assert first.model is None and first.memory_bytes() == 0
+    by_name = {item["name"]: item for item in registry.models()}
+    assert by_name["a"]["evictions"] == 1
+    assert registry._entries["b"].loaded_bytes == measured
@@ -0,0 +1,120 @@
+"""
+副本池测试：最少在途工作量分发与副本健康状态切换
+"""
+import pytest
+
+from src.models.replica_pool import ReplicaPool
+from src.models.stub_backend import StubModelManager
+
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "春眠不觉晓"}]}]
+
+
+class FakeClock:
+    """可手动推进的时钟，用于验证冷却期"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_backend(name: str, fail: bool = False) -> StubModelManager:
+    return StubModelManager(name, prefill_seconds=0.0, seconds_per_token=0.0, fail=fail)
+
+
+def make_pool(*backends, clock=None, threshold: int = 2) -> ReplicaPool:
+    return ReplicaPool(
+        list(backends),
+        names=[backend.model_path for backend in backends],
+        failure_threshold=threshold,
+        recovery_seconds=10.0,
+        clock=clock or FakeClock(),
+    )
+
+
+def test_dispatches_to_least_outstanding_work():
+    pool = make_pool(make_backend("a"), make_backend("b"), make_backend("c"))
+    with pool.acquire(work=300) as first, pool.acquire(work=100) as second:
+        assert first.model_path == "a"
+        assert second.model_path == "b"
+        # 空闲副本优先，其次选择在途工作量较小的副本
+        with pool.acquire(work=50) as third:
+            assert third.model_path == "c"
+        _, usage = pool.generate(MESSAGES, max_new_tokens=20)
+        with pool.acquire(work=1) as fourth:
+            assert fourth.model_path == "c"
+    by_name = {item["name"]: item for item in pool.health()}
+    assert by_name["c"]["total_requests"] == 3
+    assert all(item["outstanding_work"] == 0 for item in pool.health())
+
+
+def test_work_released_after_request():
+    pool = make_pool(make_backend("a"), make_backend("b"))
+    with pool.acquire(work=100):
+        assert [item["outstanding_work"] for item in pool.health()] == [100, 0]
+    assert [item["outstanding_requests"] for item in pool.health()] == [0, 0]
+
+
+def test_failing_replica_becomes_unhealthy_and_recovers():
+    clock = FakeClock()
+    broken = make_backend("a", fail=True)
+    pool = make_pool(make_backend("b"), broken, clock=clock, threshold=2)
+
+    # 副本 b 有长请求在途，请求都分发到 a，连续失败两次
+    with pool.acquire(work=1000):
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="推理失败"):
+                pool.generate(MESSAGES, max_new_tokens=1)
+    state = {item["name"]: item for item in pool.health()}
+    assert not state["a"]["healthy"]
+    assert not state["a"]["available"]
+    assert "推理失败" in state["a"]["last_error"]
+
+    # 冷却期内全部请求分发到健康副本
+    for _ in range(3):
+        with pool.acquire(work=1) as backend:
+            assert backend.model_path == "b"
+
+    # 冷却结束后放行一次试探请求，成功即恢复健康
+    clock.now += 10.0
+    assert {item["name"]: item for item in pool.health()}["a"]["available"]
+    broken.fail = False
+    with pool.acquire(work=1) as backend:
+        assert backend is broken
+        backend.generate(MESSAGES)
+    assert all(item["healthy"] for item in pool.health())
+
+
+def test_failed_probe_restarts_cooldown():
+    clock = FakeClock()
+    pool = make_pool(make_backend("a", fail=True), clock=clock, threshold=1)
+    with pytest.raises(RuntimeError, match="推理失败"):
+        pool.generate(MESSAGES)
+    assert not pool.health()[0]["available"]
+
+    clock.now += 10.0
+    with pytest.raises(RuntimeError, match="推理失败"):
+        pool.generate(MESSAGES)
+    # 试探失败后重新进入冷却，此时没有可用副本
+    with pytest.raises(RuntimeError, match="所有模型副本均不可用"):
+        pool.generate(MESSAGES)
+
+
+class RequestErrorBackend(StubModelManager):
+    """请求本身有问题（如提示过长）时抛出普通 RuntimeError 的后端"""
+
+    def generate_batch(self, conversations, **kwargs):
+        raise RuntimeError("提示长度超出模型上下文")
+
+
+def test_request_errors_do_not_pause_replica():
+    backend = RequestErrorBackend("a", prefill_seconds=0.0, seconds_per_token=0.0)
+    pool = make_pool(backend, threshold=2)
+    for _ in range(5):
+        with pytest.raises(RuntimeError, match="超出模型上下文"):
+            pool.generate(MESSAGES)
+    state = pool.health()[0]
+    assert state["healthy"] and state["available"]
+    assert state["total_failures"] == 0
+    assert state["total_requests"] == 5
@@ -0,0 +1,114 @@
+"""
+会话内存测试：轮次驻留、超出预算时的淘汰顺序与闲置会话回收
+"""
+from src.serving.sessions import SessionMemory, SessionStore
+
+IMAGE_URI = "data:image/jpeg;base64," + "A" * 2000
+
+
+class FakeClock:
+    """可手动推进的时钟，用于验证闲置回收"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def poem(index: int) -> str:
+    return f"第{index}首" + "山光悦鸟性，潭影空人心。" * 8
+
+
+def test_identical_turns_are_stored_once():
+    session = SessionMemory("s", max_bytes=10 ** 6)
+    session.append_turn("写秋景", poem(1))
+    session.append_turn("写秋景", poem(1))
+    assert len(session.history) == 2
+    assert session.snapshot(0)["turns"] == 1
+
+    session.add_recent({"prompt": "写秋景"}, "digest", IMAGE_URI)
+    session.add_recent({"prompt": "再写一首"}, "digest", IMAGE_URI)
+    # 同一图片的缩略图只存一份
+    assert session.snapshot(0)["images"] == 1
+
+
+def test_budget_evicts_recent_entries_before_turns():
+    session = SessionMemory("s", max_bytes=10 ** 6)
+    for index in range(3):
+        session.append_turn(f"第{index}轮", poem(index))
+        session.add_recent({"prompt": f"第{index}轮"}, f"image-{index}", IMAGE_URI + str(index))
+    full = session.nbytes
+
+    # 收紧预算（超过一张缩略图）：先淘汰最旧的创作记录，只剩最新一条后才淘汰最旧的对话轮次
+    session.max_bytes = full - 3000
+    session.append_turn("第3轮", poem(3))
+    assert session.nbytes <= session.max_bytes
+    assert len(session.recent) == 1
+    assert session.recent[0]["prompt"] == "第2轮"
+    assert session.evicted_entries == 2
+    assert len(session.history) == 4
+    assert session.evicted_turns == 0
+
+    session.max_bytes = session.nbytes - 100
+    session.append_turn("第4轮", poem(4))
+    assert session.nbytes <= session.max_bytes
+    assert session.evicted_turns > 0
+    # 最新一轮始终保留
+    assert session.history_turns()[-1] == ("第4轮", poem(4))
+
+
+def test_budget_keeps_latest_turn_when_entries_are_gone():
+    session = SessionMemory("s", max_bytes=1)
+    history = session.append_turn("只有一轮", poem(0))
+    # 单轮就超出预算：淘汰全部创作记录，但保留最新的一轮对话
+    assert history == [("只有一轮", poem(0))]
+    assert session.recent == []
+
+
+def test_reset_history_releases_unreferenced_turns():
+    session = SessionMemory("s", max_bytes=10 ** 6)
+    session.append_turn("第0轮", poem(0))
+    session.add_recent({"prompt": "第0轮"}, "image", IMAGE_URI)
+    session.append_turn("第1轮", poem(1))
+    before = session.nbytes
+
+    session.reset_history()
+    # 创作记录仍引用的轮次保留，其余释放
+    assert session.history == []
+    assert session.snapshot(0)["turns"] == 1
+    assert session.recent_entries()[0]["history"] == [("第0轮", poem(0))]
+    assert session.nbytes < before
+
+
+def test_reap_idle_sessions():
+    clock = FakeClock()
+    store = SessionStore(max_bytes=10 ** 6, idle_seconds=600, clock=clock)
+    store.get("idle").append_turn("问", poem(0))
+    clock.now = 300.0
+    store.get("active")
+
+    clock.now = 700.0
+    assert store.reap() == 1
+    assert store.stats()["sessions"] == 1
+    assert store.stats()["reaped"] == 1
+    # 访问会刷新活跃时间
+    store.get("active")
+    clock.now = 1200.0
+    assert store.reap() == 0
+
+    # 被回收的会话再次访问时从空会话开始
+    assert store.get("idle").history_turns() == []
+
+
+def test_drop_and_stats():
+    store = SessionStore(max_bytes=10 ** 6, idle_seconds=600, clock=FakeClock())
+    store.get("a").append_turn("问", poem(0))
+    store.get("b").append_turn("问", poem(0) * 3)
+    stats = store.stats(top=1)
+    assert stats["sessions"] == 2
+    assert stats["largest"][0]["session"] == "b"
+    assert stats["total_bytes"] == stats["max_session_bytes"] + store.get("a").nbytes
+
+    store.drop("b")
+    assert store.stats()["sessions"] == 1
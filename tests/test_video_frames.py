@@ -0,0 +1,84 @@
+"""
+视频/动图关键帧测试：场景变化分数与从动图中挑选镜头切换处的关键帧
+"""
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from src.utils.image_processor import ImageValidationError
+from src.utils.video_frames import extract_keyframes, is_clip, scene_change_scores
+
+SCENES = ("red", "blue", "green")
+FRAMES_PER_SCENE = 3
+FRAME_MS = 500
+
+
+def make_gif(path, scenes=SCENES, size=(96, 64)):
+    """每个场景 FRAMES_PER_SCENE 帧纯色画面，场景内有一个小方块移动（避免相同帧被合并）"""
+    frames = []
+    for color in scenes:
+        for step in range(FRAMES_PER_SCENE):
+            frame = Image.new("RGB", size, color)
+            ImageDraw.Draw(frame).rectangle([step * 6, 4, step * 6 + 5, 9], fill="white")
+            frames.append(frame)
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=FRAME_MS, loop=0)
+    return path
+
+
+def solid(color, size=(64, 64)) -> np.ndarray:
+    return np.asarray(Image.new("RGB", size, color))
+
+
+def test_scene_change_scores_range():
+    black, white = solid("black"), solid("white")
+    assert scene_change_scores(black, black) == 0.0
+    assert scene_change_scores(black, white) == pytest.approx(1.0)
+    # 小幅运动的分数远低于镜头切换
+    moved = black.copy()
+    moved[:8, :8] = 255
+    assert scene_change_scores(black, moved) < 0.05
+    assert scene_change_scores(solid("red"), solid("blue")) > 0.5
+
+
+def test_scene_change_scores_batched():
+    thumbs = np.stack([solid("black"), solid("black"), solid("white"), solid("white")])
+    scores = scene_change_scores(thumbs[:-1], thumbs[1:])
+    assert scores.shape == (3,)
+    assert scores.argmax() == 1
+    assert scores[0] == scores[2] == 0.0
+
+
+def test_is_clip(tmp_path):
+    assert is_clip(make_gif(tmp_path / "clip.gif"))
+    still = tmp_path / "still.gif"
+    Image.new("RGB", (64, 64), "red").save(still)
+    assert not is_clip(still)
+    assert is_clip(tmp_path / "missing.mp4")
+
+
+def test_keyframes_at_scene_changes(tmp_path):
+    frames, info = extract_keyframes(make_gif(tmp_path / "clip.gif"), k=3)
+    # 开场画面与两次镜头切换
+    assert info["times"] == [0.0, 1.5, 3.0]
+    assert info["scores"][0] == 1.0
+    assert info["decoded"] == info["candidates"] == len(SCENES) * FRAMES_PER_SCENE
+    assert info["duration"] == pytest.approx(len(SCENES) * FRAMES_PER_SCENE * FRAME_MS / 1000)
+    assert not info["truncated"]
+    centers = [frame.getpixel((frame.width // 2, frame.height // 2)) for frame in frames]
+    assert centers == [(255, 0, 0), (0, 0, 255), (0, 128, 0)]
+
+
+def test_fewer_candidates_than_k(tmp_path):
+    frames, info = extract_keyframes(make_gif(tmp_path / "clip.gif", scenes=("red",)), k=5)
+    assert len(frames) == FRAMES_PER_SCENE
+    assert info["times"] == sorted(info["times"])
+
+
+def test_time_limit_without_frames(tmp_path):
+    with pytest.raises(ImageValidationError, match="未能从文件中解码出画面"):
+        extract_keyframes(make_gif(tmp_path / "clip.gif"), time_limit=-1)
+
+
+def test_rejects_tiny_clip(tmp_path):
+    with pytest.raises(ImageValidationError, match="画面尺寸过小"):
+        extract_keyframes(make_gif(tmp_path / "clip.gif", size=(16, 16)))
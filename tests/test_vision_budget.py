@@ -0,0 +1,107 @@
+"""
+视觉token预算测试：按负载与格式选择上限、多图分配与缩放对齐
+"""
+import pytest
+from PIL import Image
+
+from src.models.vision_budget import VisionBudget, VisionBudgetPolicy, fit_to_budget, split_budget
+
+SIDE = 32
+
+
+def make_policy(**kwargs) -> VisionBudgetPolicy:
+    options = dict(
+        enabled=True,
+        token_side=SIDE,
+        max_tokens=1000,
+        floor_tokens=200,
+        min_tokens=4,
+        half_depth=4,
+        format_scale={"五言绝句": 0.5},
+        multi_image_scale=2.0,
+        multi_image_floor_tokens=50,
+        depth_source=lambda: 0,
+    )
+    options.update(kwargs)
+    return VisionBudgetPolicy(**options)
+
+
+def tokens(budget: VisionBudget) -> int:
+    return budget.max_pixels // SIDE ** 2
+
+
+def test_split_budget_water_filling():
+    # 小图保持原尺寸，省下的预算由大图平分
+    assert split_budget([100, 1000, 1000], total_pixels=900, floor_pixels=10) == [100, 400, 400]
+    # 顺序与输入一致
+    assert split_budget([1000, 100, 1000], total_pixels=900, floor_pixels=10) == [400, 100, 400]
+
+
+def test_split_budget_all_fit():
+    assert split_budget([100, 200], total_pixels=1000, floor_pixels=10) == [100, 200]
+
+
+@pytest.mark.parametrize("areas", [[500, 800, 2000, 5000], [10, 10, 10], [3000] * 5, [1, 7000]])
+def test_split_budget_stays_within_total(areas):
+    shares = split_budget(areas, total_pixels=6000, floor_pixels=0)
+    assert sum(shares) <= 6000
+    assert all(share <= area for share, area in zip(shares, areas))
+
+
+def test_split_budget_floor():
+    # 预算不足时每张仍保留下限（总量可超出）
+    assert split_budget([1000, 1000, 1000], total_pixels=90, floor_pixels=50) == [50, 50, 50]
+
+
+def test_select_scales_with_load_and_format():
+    policy = make_policy()
+    assert tokens(policy.select("七言律诗", queue_depth=0)) == 1000
+    # 排队深度达到 half_depth 时减半
+    assert tokens(policy.select("七言律诗", queue_depth=4)) == 500
+    assert tokens(policy.select("五言绝句", queue_depth=0)) == 500
+    # 高负载时不低于 floor
+    assert tokens(policy.select("五言绝句", queue_depth=100)) == 200
+    assert policy.select(None, queue_depth=3).queue_depth == 3
+
+
+def test_select_reads_queue_depth_by_default():
+    policy = make_policy(depth_source=lambda: 12)
+    budget = policy.select("七言律诗")
+    assert budget.queue_depth == 12
+    assert tokens(budget) == 250
+
+
+def test_disabled_policy_does_not_resize():
+    policy = make_policy(enabled=False)
+    image = Image.new("RGB", (4000, 3000))
+    messages = [{"role": "user", "content": [{"type": "image", "image": image}]}]
+    _, pixels, count = policy.apply(messages, policy.select("五言绝句", queue_depth=50))
+    assert (pixels, count) == (4000 * 3000, 1)
+
+
+def test_fit_to_budget_aligns_to_token_side():
+    budget = VisionBudget(min_pixels=4 * SIDE ** 2, max_pixels=500 * SIDE ** 2, queue_depth=0)
+    width, height = fit_to_budget(4000, 3000, budget, SIDE)
+    assert width % SIDE == 0 and height % SIDE == 0
+    assert width * height <= budget.max_pixels
+    # 保持宽高比
+    assert width / height == pytest.approx(4 / 3, rel=0.05)
+    # 过小的图片放大到下限
+    width, height = fit_to_budget(20, 20, budget, SIDE)
+    assert width * height >= budget.min_pixels
+
+
+def test_multiple_images_share_budget():
+    policy = make_policy()
+    budget = policy.select("七言律诗", queue_depth=0)
+    images = [Image.new("RGB", (4000, 3000)), Image.new("RGB", (4000, 3000)), Image.new("RGB", (64, 64))]
+    messages = [{"role": "user", "content": [{"type": "image", "image": image} for image in images]}]
+    prepared, pixels, count = policy.apply(messages, budget)
+    assert count == 3
+    # 总量不超过单张上限 × multi_image_scale，小图保持原尺寸
+    assert pixels <= budget.max_pixels * 2
+    sizes = [item["image"].size for item in prepared[0]["content"]]
+    assert sizes[2] == (64, 64)
+    assert sizes[0] == sizes[1]
+    # 不修改传入的消息
+    assert messages[0]["content"][0]["image"].size == (4000, 3000)